@@ -0,0 +1 @@
+"""Benchmarks for dl-geo-bot. Run as modules, e.g. ``python -m benchmarks.bench_sharding``."""
@@ -0,0 +1,76 @@
+"""Batch geo queries vs. the scalar ``haversine_m`` loop at 1k and 100k points.
+
+    python -m benchmarks.bench_geo --sizes 1000 100000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+from shiftbot.geo import GeoArray, Geofence, PointsGeo, _np, haversine_m
+
+ORIGIN = (56.628495, 47.894357)
+
+
+def random_points(count: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": idx,
+            "geo_lat": ORIGIN[0] + rnd.uniform(-0.5, 0.5),
+            "geo_lon": ORIGIN[1] + rnd.uniform(-0.5, 0.5),
+            "geo_radius_m": 120,
+        }
+        for idx in range(count)
+    ]
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fix_lat, fix_lon = ORIGIN
+    for size in args.sizes:
+        points = random_points(size)
+        lats = [p["geo_lat"] for p in points]
+        lons = [p["geo_lon"] for p in points]
+
+        scalar = best_of(args.repeat, lambda: [haversine_m(fix_lat, fix_lon, a, b) for a, b in zip(lats, lons)])
+        rows = [("scalar haversine_m loop", scalar)]
+
+        pure = GeoArray(lats, lons, use_numpy=False)
+        rows.append(("GeoArray pure python", best_of(args.repeat, lambda: pure.distances_m(fix_lat, fix_lon))))
+        if _np is not None:
+            vec = GeoArray(lats, lons, use_numpy=True)
+            rows.append(("GeoArray numpy", best_of(args.repeat, lambda: vec.distances_m(fix_lat, fix_lon))))
+
+        catalog = PointsGeo(points, default_radius_m=120)
+        rows.append(("PointsGeo.nearest k=3", best_of(args.repeat, lambda: catalog.nearest(fix_lat, fix_lon, 3))))
+        rows.append(("PointsGeo.within_radius", best_of(args.repeat, lambda: catalog.within_radius(fix_lat, fix_lon))))
+
+        print(f"points={size}")
+        for name, elapsed in rows:
+            print(f"  {name:<28} {elapsed * 1000:9.3f} ms  x{scalar / elapsed:6.1f}")
+
+    fixes = [(p["geo_lat"], p["geo_lon"]) for p in random_points(100000, seed=2)]
+    fence = Geofence(fix_lat, fix_lon, 120)
+    scalar = best_of(args.repeat, lambda: [haversine_m(a, b, fix_lat, fix_lon) <= 120 for a, b in fixes])
+    fenced = best_of(args.repeat, lambda: [fence.contains(a, b) for a, b in fixes])
+    print("geofence classification, 100000 fixes")
+    print(f"  {'haversine_m <= radius':<28} {scalar * 1000:9.3f} ms  x{1.0:6.1f}")
+    print(f"  {'Geofence.contains':<28} {fenced * 1000:9.3f} ms  x{scalar / fenced:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
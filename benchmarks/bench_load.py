@@ -0,0 +1,196 @@
+"""Load generator: N couriers sending live-location edits through the real handlers.
+
+Each courier sends its edits one after another (PTB never runs two updates of one user
+at once), couriers run concurrently up to ``--concurrency`` updates in flight. The real
+``OpenCartClient`` talks to ``FakeOpenCart`` either through ``httpx.MockTransport``
+(``--mode mock``) or over a localhost socket (``--mode http``). Reports pings/sec, handler
+latency percentiles and OpenCart calls per ping, including retries during 502/503 bursts.
+
+    python -m benchmarks.bench_load --couriers 500 --edits 20 --latency-ms 5
+    python -m benchmarks.bench_load --mode http --error-rate 0.02 --burst-every 5 --burst-len 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks.fake_opencart import POINT, FakeOpenCart, FaultProfile
+from shiftbot.call_budget import TARGET_OPENCART, capture_calls
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.opencart_client import OpenCartClient
+from shiftbot.request_context import with_request_context
+from shiftbot.request_stats import LatencyHistogram
+from shiftbot.session_store import SessionStore
+
+COURIER_ID_BASE = 1000
+
+
+class CountingBot:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+class CountingMessage:
+    def __init__(self, bot: CountingBot, chat_id: int, lat: float, lon: float, acc: float) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.location = SimpleNamespace(latitude=lat, longitude=lon, horizontal_accuracy=acc)
+
+    async def reply_text(self, text, **kwargs):
+        self.bot.sent += 1
+
+    async def edit_text(self, text, **kwargs):
+        self.bot.sent += 1
+
+
+def make_edit(bot: CountingBot, update_id: int, user_id: int, lat: float, lon: float, acc: float):
+    message = CountingMessage(bot, user_id, lat, lon, acc)
+    return SimpleNamespace(
+        update_id=update_id,
+        message=None,
+        edited_message=message,
+        effective_message=message,
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
+
+
+def courier_track(rnd: random.Random, edits: int, out_share: float) -> list[tuple[float, float, float]]:
+    """Fixes around the point; ``out_share`` of couriers wander ~500 m away mid-shift."""
+    wanders = rnd.random() < out_share
+    track = []
+    for idx in range(edits):
+        away = wanders and edits // 3 <= idx < 2 * edits // 3
+        offset = 0.005 if away else 0.0003
+        track.append(
+            (
+                POINT["point_lat"] + rnd.uniform(-offset, offset) + (0.004 if away else 0.0),
+                POINT["point_lon"] + rnd.uniform(-offset, offset),
+                round(rnd.uniform(5, 30), 1),
+            )
+        )
+    return track
+
+
+async def run(args) -> dict:
+    logger = logging.getLogger("bench")
+    faults = FaultProfile(
+        latency_sec=args.latency_ms / 1000.0,
+        jitter_sec=args.jitter_ms / 1000.0,
+        error_rate=args.error_rate,
+        burst_every_sec=args.burst_every,
+        burst_len_sec=args.burst_len,
+    )
+    fake = FakeOpenCart(faults, seed=args.seed)
+    server = None
+    if args.mode == "http":
+        server = await fake.serve()
+        port = server.sockets[0].getsockname()[1]
+        oc_client = OpenCartClient(f"http://127.0.0.1:{port}", "bench", logger)
+    else:
+        oc_client = OpenCartClient("http://opencart.local", "bench", logger, transport=fake.transport())
+
+    detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+    handlers = build_location_handlers(SessionStore(), None, oc_client, detector, logger)
+    handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_location_message")
+    handle_location = with_request_context(handler).callback
+    bot = CountingBot()
+    context = SimpleNamespace(bot=bot, application=SimpleNamespace(bot_data={"admin_chat_ids": []}))
+
+    rnd = random.Random(args.seed)
+    tracks = {COURIER_ID_BASE + idx: courier_track(rnd, args.edits, args.out_share) for idx in range(args.couriers)}
+    latency = LatencyHistogram()
+    slots = asyncio.Semaphore(args.concurrency)
+    failures = 0
+    update_ids = iter(range(1, 1 + args.couriers * args.edits))
+
+    async def courier(user_id: int) -> None:
+        nonlocal failures
+        for lat, lon, acc in tracks[user_id]:
+            update = make_edit(bot, next(update_ids), user_id, lat, lon, acc)
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    await handle_location(update, context)
+                except Exception:
+                    failures += 1
+                latency.observe(time.perf_counter() - started)
+            if args.interval_ms > 0:
+                await asyncio.sleep(args.interval_ms / 1000.0)
+
+    with capture_calls() as calls:
+        started = time.perf_counter()
+        await asyncio.gather(*(courier(user_id) for user_id in tracks))
+        elapsed = time.perf_counter() - started
+
+    await oc_client.aclose()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    pings = sum(fake.pings.values())
+    requests = sum(fake.calls.values())
+    hist = latency.as_dict()
+    # bucket bounds overshoot on small runs; the observed max is the tighter bound
+    quantile_ms = {key: min(hist[key], hist["max_sec"]) * 1000 for key in ("p50_sec", "p99_sec")}
+    return {
+        "mode": args.mode,
+        "updates": latency.count,
+        "elapsed_sec": elapsed,
+        "pings": pings,
+        "pings_per_sec": pings / elapsed if elapsed else 0.0,
+        "handler_p50_ms": quantile_ms["p50_sec"],
+        "handler_p99_ms": quantile_ms["p99_sec"],
+        "handler_max_ms": hist["max_sec"] * 1000,
+        # client-level calls (one per method call) vs HTTP requests that reached the fake (with retries)
+        "api_calls_per_ping": calls.count(TARGET_OPENCART) / pings if pings else 0.0,
+        "http_requests_per_ping": requests / pings if pings else 0.0,
+        "failed_updates": failures,
+        "telegram_sends": bot.sent,
+        "fake": fake.snapshot(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--couriers", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=20, help="live-location edits per courier")
+    parser.add_argument("--interval-ms", type=float, default=0.0, help="pause between edits of one courier")
+    parser.add_argument("--concurrency", type=int, default=256, help="updates in flight, like CONCURRENT_UPDATES")
+    parser.add_argument("--mode", choices=["mock", "http"], default="mock")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--burst-every", type=float, default=0.0, help="seconds between 502 bursts, 0 — none")
+    parser.add_argument("--burst-len", type=float, default=0.0, help="length of a 502 burst in seconds")
+    parser.add_argument("--out-share", type=float, default=0.1, help="share of couriers leaving the point")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    result = asyncio.run(run(args))
+    print(
+        f"mode={result['mode']} updates={result['updates']} pings={result['pings']} "
+        f"elapsed={result['elapsed_sec']:.2f}s throughput={result['pings_per_sec']:.0f} pings/s"
+    )
+    print(
+        f"handler p50={result['handler_p50_ms']:.1f}ms p99={result['handler_p99_ms']:.1f}ms "
+        f"max={result['handler_max_ms']:.1f}ms failed={result['failed_updates']}"
+    )
+    print(
+        f"api_calls/ping={result['api_calls_per_ping']:.2f} http_requests/ping={result['http_requests_per_ping']:.2f} "
+        f"telegram_sends={result['telegram_sends']}"
+    )
+    print(f"fake={result['fake']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Ping journal: append rate per fsync batch size, disk footprint and replay throughput.
+
+    python -m benchmarks.bench_ping_journal --records 20000 --latency-ms 2
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+
+from benchmarks.mock_opencart import POINT, build_mock_transport
+from shiftbot.opencart_client import OpenCartClient
+from shiftbot.ping_journal import PingJournal, PingJournalReplayer, ping_record
+
+
+def make_records(count: int) -> list[dict]:
+    rnd = random.Random(1)
+    now = time.time()
+    return [
+        ping_record(
+            shift_id=100000 + idx % 50,
+            staff_id=idx % 50,
+            lat=POINT["point_lat"] + rnd.uniform(-0.001, 0.001),
+            lon=POINT["point_lon"] + rnd.uniform(-0.001, 0.001),
+            acc=round(rnd.uniform(3, 40), 1),
+            ts=now + idx,
+        )
+        for idx in range(count)
+    ]
+
+
+def bench_append(records: list[dict], fsync_every: int) -> tuple[float, int]:
+    with tempfile.TemporaryDirectory() as directory:
+        journal = PingJournal(directory, fsync_every=fsync_every, fsync_interval_sec=3600)
+        started = time.perf_counter()
+        for record in records:
+            journal.append(record)
+        journal.flush()
+        elapsed = time.perf_counter() - started
+        size = journal.disk_bytes()
+        journal.close()
+    return elapsed, size
+
+
+async def bench_replay(records: list[dict], latency_sec: float, rate: float) -> float:
+    logger = logging.getLogger("bench")
+    logger.disabled = True
+    oc_client = OpenCartClient("http://opencart.local", "bench", logger, transport=build_mock_transport(latency_sec))
+    with tempfile.TemporaryDirectory() as directory:
+        journal = PingJournal(directory, segment_max_bytes=256 * 1024)
+        for record in records:
+            journal.append(record)
+        journal.flush()
+        replayer = PingJournalReplayer(
+            journal, oc_client, logger, time_field="ping_ts", rate_per_sec=rate, batch_size=200
+        )
+        started = time.perf_counter()
+        sent = await replayer.drain()
+        elapsed = time.perf_counter() - started
+        assert sent == len(records) and not journal.has_pending()
+        journal.close()
+    await oc_client.aclose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--rate", type=float, default=0.0, help="replay rate limit, 0 = unlimited")
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    print(f"append, {args.records} records")
+    for fsync_every in (1, 32, 256):
+        elapsed, size = bench_append(records, fsync_every)
+        print(
+            f"  fsync_every={fsync_every:<4} {args.records / elapsed:10.0f} rec/s"
+            f"  disk={size / 1024:8.1f} KiB  {size / args.records:5.1f} B/rec"
+        )
+
+    replay_count = min(args.records, 2000)
+    elapsed = asyncio.run(bench_replay(records[:replay_count], args.latency_ms / 1000.0, args.rate))
+    print(f"replay, {replay_count} records, mock latency {args.latency_ms} ms")
+    print(f"  {replay_count / elapsed:10.0f} rec/s  ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
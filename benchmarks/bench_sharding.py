@@ -0,0 +1,133 @@
+"""Throughput of the shard supervisor routing at 1, 2 and 4 worker processes.
+
+The parent process plays the poller: it builds raw update payloads, routes them with
+``shard_for_update`` and feeds each worker's queue. Workers run the real location handlers
+against a mock OpenCart served through ``httpx.MockTransport``, processing their share
+sequentially as a default PTB application would.
+
+    python -m benchmarks.bench_sharding --updates 4000 --couriers 400 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+from benchmarks.mock_opencart import POINT, build_mock_transport
+from shiftbot.sharding import shard_for_update
+
+
+def location_payload(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "edited_message": {
+            "message_id": 1,
+            "date": 1700000000,
+            "edit_date": 1700000000 + update_id,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Courier"},
+            "location": {
+                # unique per courier so the dead-soul detector stays quiet
+                "latitude": POINT["point_lat"] + user_id * 1e-7,
+                "longitude": POINT["point_lon"],
+                "horizontal_accuracy": 10.0,
+                "live_period": 86400,
+            },
+        },
+    }
+
+
+class CountingBot:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+async def _consume(source_queue, result_queue, latency_sec: float) -> int:
+    from telegram import Update
+
+    from shiftbot.dead_soul_detector import DeadSoulDetector
+    from shiftbot.handlers_location import build_location_handlers
+    from shiftbot.opencart_client import OpenCartClient
+    from shiftbot.session_store import SessionStore
+
+    logger = logging.getLogger("bench")
+    oc_client = OpenCartClient("http://opencart.local", "bench", logger, transport=build_mock_transport(latency_sec))
+    detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+    handlers = build_location_handlers(SessionStore(), None, oc_client, detector, logger)
+    context = SimpleNamespace(bot=CountingBot(), application=SimpleNamespace(bot_data={"admin_chat_ids": []}))
+
+    loop = asyncio.get_running_loop()
+    result_queue.put("ready")
+    processed = 0
+    while True:
+        payload = await loop.run_in_executor(None, source_queue.get)
+        if payload is None:
+            break
+        update = Update.de_json(payload, None)
+        for handler in handlers:
+            if handler.check_update(update):
+                await handler.callback(update, context)
+                break
+        processed += 1
+    await oc_client.aclose()
+    return processed
+
+
+def _worker(source_queue, result_queue, latency_sec: float, log_level: str) -> None:
+    logging.basicConfig(level=log_level)
+    started = time.perf_counter()
+    processed = asyncio.run(_consume(source_queue, result_queue, latency_sec))
+    result_queue.put((processed, time.perf_counter() - started))
+
+
+def run(shard_count: int, updates: int, couriers: int, latency_sec: float, log_level: str) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(shard_count)]
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(source_queue, results, latency_sec, log_level))
+        for source_queue in queues
+    ]
+    for process in workers:
+        process.start()
+    for _ in workers:
+        results.get()
+
+    started = time.perf_counter()
+    for update_id in range(updates):
+        payload = location_payload(update_id, 1000 + update_id % couriers)
+        queues[shard_for_update(payload, shard_count)].put(payload)
+    for source_queue in queues:
+        source_queue.put(None)
+
+    processed = sum(results.get()[0] for _ in workers)
+    elapsed = time.perf_counter() - started
+    for process in workers:
+        process.join()
+    return {"workers": shard_count, "processed": processed, "elapsed_sec": elapsed, "updates_per_sec": processed / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--couriers", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    for shard_count in args.workers:
+        result = run(shard_count, args.updates, args.couriers, args.latency_ms / 1000.0, args.log_level)
+        print(
+            f"workers={result['workers']} processed={result['processed']} "
+            f"elapsed={result['elapsed_sec']:.2f}s throughput={result['updates_per_sec']:.0f} upd/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""In-process fake of the OpenCart ``dl/geo_api`` for benchmarks and load tests.
+
+Every route the bot calls is served from in-memory state: staff, points, shifts and
+ping decisions (IN/OUT by distance to the point, with an out streak). ``FaultProfile``
+adds latency with jitter, random errors and periodic 502/503 bursts.
+
+The same core answers four front ends:
+
+- ``fake.transport()`` — ``httpx.MockTransport``, no sockets at all;
+- ``fake.asgi`` — ASGI app for any ASGI server;
+- ``await fake.serve()`` — minimal HTTP/1.1 server on localhost, to include the real
+  connection pool and sockets in the measurement;
+- ``fake.direct_client()`` — the ``OpenCartClient`` methods the handlers and jobs use,
+  answered without HTTP, latency or faults (for long virtual-time simulations).
+"""
+
+import asyncio
+import collections
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from shiftbot.geo import haversine_m
+
+POINT = {"point_id": 1, "point_name": "ДЛ 1", "point_lat": 56.628495, "point_lon": 47.894357, "point_radius": 120}
+
+SHIFT_ID_BASE = 100000
+PREFIX = "dl/geo_api/"
+
+
+@dataclass
+class FaultProfile:
+    latency_sec: float = 0.005
+    jitter_sec: float = 0.0
+    # share of requests answered with error_status, 0..1
+    error_rate: float = 0.0
+    error_status: int = 503
+    # every burst_every_sec seconds all requests fail with burst_status for burst_len_sec
+    burst_every_sec: float = 0.0
+    burst_len_sec: float = 0.0
+    burst_status: int = 502
+
+
+class FakeOpenCart:
+    """OpenCart stand-in. Unknown couriers get a staff record and a shift on first lookup."""
+
+    def __init__(
+        self,
+        faults: FaultProfile | None = None,
+        *,
+        points: list[dict] | None = None,
+        admin_chat_ids: list[int] | None = None,
+        auto_staff: bool = True,
+        auto_shifts: bool = True,
+        seed: int = 0,
+        clock=time.monotonic,
+    ) -> None:
+        self.faults = faults or FaultProfile()
+        self.points = {int(point["point_id"]): dict(point) for point in (points or [POINT])}
+        self.admin_chat_ids = list(admin_chat_ids or [])
+        self.auto_staff = auto_staff
+        self.auto_shifts = auto_shifts
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.started_at = clock()
+
+        self.staff: dict[int, dict] = {}
+        self.staff_by_tg: dict[int, int] = {}
+        self.shifts: dict[int, dict] = {}
+        self.active_by_staff: dict[int, int] = {}
+
+        # route (without the dl/geo_api/ prefix) -> requests, and HTTP status -> responses
+        self.calls: collections.Counter = collections.Counter()
+        self.statuses: collections.Counter = collections.Counter()
+        self.pings: collections.Counter = collections.Counter()
+
+        self._routes = {
+            "staff_by_telegram": self._staff_by_telegram,
+            "staff_by_phone": self._staff_by_phone,
+            "points": self._points,
+            "active_shift_by_staff": self._active_shift_by_staff,
+            "active_shifts_by_point": self._active_shifts_by_point,
+            "active_shifts_bulk": self._active_shifts_bulk,
+            "admin_chat_ids": self._admin_chat_ids,
+            "shift_start": self._shift_start,
+            "shift_end": self._shift_end,
+            "ping_add": self._ping_add,
+            "violation_tick": self._violation_tick,
+            "violation_tick_many": self._violation_tick_many,
+            "rebind_telegram": self._rebind_telegram,
+            "register": self._register,
+        }
+
+    # --- state -----------------------------------------------------------------
+
+    def add_staff(self, staff_id: int, telegram_user_id: int | None = None, **fields) -> dict:
+        staff = {
+            "staff_id": staff_id,
+            "telegram_user_id": telegram_user_id,
+            "telegram_chat_id": telegram_user_id,
+            "full_name": f"Courier {staff_id}",
+            "phone": f"+7900{staff_id:07d}",
+            "is_active": 1,
+            **fields,
+        }
+        self.staff[staff_id] = staff
+        if telegram_user_id is not None:
+            self.staff_by_tg[int(telegram_user_id)] = staff_id
+        return staff
+
+    def start_shift(self, staff_id: int, point_id: int | None = None, role: str = "courier") -> dict:
+        point = self.points.get(point_id) if point_id is not None else next(iter(self.points.values()))
+        shift_id = SHIFT_ID_BASE + staff_id
+        while shift_id in self.shifts:
+            shift_id += 1_000_000
+        staff = self.staff.get(staff_id, {})
+        shift = {
+            "shift_id": shift_id,
+            "staff_id": staff_id,
+            "full_name": staff.get("full_name"),
+            "role": role,
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ended_at": None,
+            "out_streak": 0,
+            **point,
+        }
+        self.shifts[shift_id] = shift
+        self.active_by_staff[staff_id] = shift_id
+        return shift
+
+    def active_shift(self, staff_id: int) -> dict | None:
+        shift_id = self.active_by_staff.get(staff_id)
+        if shift_id is None and self.auto_shifts and staff_id in self.staff:
+            return self.start_shift(staff_id)
+        return self.shifts.get(shift_id) if shift_id is not None else None
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "statuses": dict(self.statuses),
+            "pings": dict(self.pings),
+            "active_shifts": len(self.active_by_staff),
+        }
+
+    # --- faults ----------------------------------------------------------------
+
+    def _fault_status(self) -> int | None:
+        faults = self.faults
+        if faults.burst_every_sec > 0 and faults.burst_len_sec > 0:
+            phase = (self.clock() - self.started_at) % faults.burst_every_sec
+            if phase >= faults.burst_every_sec - faults.burst_len_sec:
+                return faults.burst_status
+        if faults.error_rate > 0 and self.rng.random() < faults.error_rate:
+            return faults.error_status
+        return None
+
+    async def _delay(self) -> None:
+        delay = self.faults.latency_sec
+        if self.faults.jitter_sec > 0:
+            delay += self.rng.uniform(0, self.faults.jitter_sec)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # --- core ------------------------------------------------------------------
+
+    async def respond(self, method: str, query: str, body: bytes, headers: dict) -> tuple[int, dict, bytes]:
+        """Answer one request; returns ``(status, headers, body)``."""
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        route = params.get("route", "")
+        name = route.removeprefix(PREFIX) if route != "dl/geo_api" else "health"
+        self.calls[name] += 1
+        await self._delay()
+
+        status = self._fault_status()
+        if status is not None:
+            self.statuses[status] += 1
+            return status, {"content-type": "text/html"}, b"<html>Bad Gateway</html>"
+
+        if name == "health":
+            status, payload, extra = 200, {"ok": True, "action": params.get("action")}, {}
+        else:
+            handler = self._routes.get(name)
+            if handler is None:
+                status, payload, extra = 404, {"ok": False, "error": "unknown_route"}, {}
+            else:
+                form = self._parse_body(body, headers)
+                status, payload, extra = handler(method.upper(), params, form, headers)
+        self.statuses[status] += 1
+        response_headers = {"content-type": "application/json", **extra}
+        content = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+        return status, response_headers, content
+
+    @staticmethod
+    def _parse_body(body: bytes, headers: dict) -> dict:
+        if not body:
+            return {}
+        content_type = headers.get("content-type", "")
+        if "json" in content_type:
+            try:
+                parsed = json.loads(body)
+            except ValueError:
+                return {}
+            return parsed if isinstance(parsed, dict) else {}
+        return {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+
+    # --- routes ----------------------------------------------------------------
+
+    def _staff_by_telegram(self, method, params, form, headers):
+        telegram_user_id = int(params.get("telegram_user_id") or 0)
+        staff_id = self.staff_by_tg.get(telegram_user_id)
+        if staff_id is None and self.auto_staff and telegram_user_id:
+            staff_id = self.add_staff(telegram_user_id, telegram_user_id)["staff_id"]
+        return 200, {"ok": True, "staff": self.staff.get(staff_id)}, {}
+
+    def _staff_by_phone(self, method, params, form, headers):
+        phone = str(params.get("phone") or "")
+        digits = "".join(ch for ch in phone if ch.isdigit())[-10:]
+        found = next(
+            (staff for staff in self.staff.values() if digits and str(staff.get("phone", "")).endswith(digits)),
+            None,
+        )
+        return 200, {"ok": True, "staff": found}, {}
+
+    def _points(self, method, params, form, headers):
+        points = [
+            {
+                "point_id": point["point_id"],
+                "short_name": point.get("point_name"),
+                "address": point.get("address", ""),
+                "geo_lat": point["point_lat"],
+                "geo_lon": point["point_lon"],
+                "geo_radius_m": point["point_radius"],
+            }
+            for point in self.points.values()
+        ]
+        return 200, {"ok": True, "points": points}, {}
+
+    def _active_shift_by_staff(self, method, params, form, headers):
+        return 200, {"ok": True, "shift": self.active_shift(int(params.get("staff_id") or 0))}, {}
+
+    def _active_shifts_by_point(self, method, params, form, headers):
+        point_id = int(params.get("point_id") or 0)
+        shifts = [
+            self.shifts[shift_id]
+            for shift_id in self.active_by_staff.values()
+            if self.shifts[shift_id]["point_id"] == point_id
+        ]
+        return 200, {"ok": True, "shifts": shifts}, {}
+
+    def _active_shifts_bulk(self, method, params, form, headers):
+        shifts = {str(staff_id): self.active_shift(int(staff_id)) for staff_id in form.get("staff_ids") or []}
+        return 200, {"ok": True, "shifts": shifts}, {}
+
+    def _admin_chat_ids(self, method, params, form, headers):
+        etag = '"%s"' % ",".join(str(chat_id) for chat_id in self.admin_chat_ids)
+        if headers.get("if-none-match") == etag:
+            return 304, None, {"etag": etag}
+        return 200, {"ok": True, "chat_ids": self.admin_chat_ids}, {"etag": etag}
+
+    def _shift_start(self, method, params, form, headers):
+        staff_id = int(form.get("staff_id") or 0)
+        if staff_id not in self.staff:
+            return 200, {"ok": False, "error": "staff_not_found"}, {}
+        current = self.active_by_staff.get(staff_id)
+        if current is not None:
+            return 200, {"ok": False, "error": "shift_already_active", "shift": self.shifts[current]}, {}
+        point_id = int(form.get("point_id") or 0)
+        if point_id not in self.points:
+            return 200, {"ok": False, "error": "point_not_found"}, {}
+        shift = self.start_shift(staff_id, point_id, form.get("role") or "courier")
+        return 200, {"ok": True, "shift_id": shift["shift_id"], "shift": shift}, {}
+
+    def _shift_end(self, method, params, form, headers):
+        shift = self.shifts.get(int(form.get("shift_id") or 0))
+        if shift is None or shift["ended_at"] is not None:
+            return 200, {"ok": False, "error": "shift_not_active"}, {}
+        shift["ended_at"] = form.get("end_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        shift["end_reason"] = form.get("end_reason") or "manual"
+        self.active_by_staff.pop(shift["staff_id"], None)
+        return 200, {"ok": True, "shift_id": shift["shift_id"]}, {}
+
+    def _ping_add(self, method, params, form, headers):
+        shift = self.shifts.get(int(form.get("shift_id") or 0))
+        if shift is None or shift["ended_at"] is not None:
+            self.pings["shift_not_active"] += 1
+            return 200, {"ok": False, "error": "shift_not_active"}, {}
+        dist_m = haversine_m(float(form["lat"]), float(form["lon"]), shift["point_lat"], shift["point_lon"])
+        status = "IN" if dist_m <= shift["point_radius"] else "OUT"
+        shift["out_streak"] = shift["out_streak"] + 1 if status == "OUT" else 0
+        self.pings[status] += 1
+        return (
+            200,
+            {
+                "ok": True,
+                "status": status,
+                "out_streak": shift["out_streak"],
+                "dist_m": round(dist_m),
+                "radius_m": shift["point_radius"],
+            },
+            {},
+        )
+
+    def _tick(self, shift_id: int) -> dict:
+        shift = self.shifts.get(shift_id)
+        if shift is None or shift["ended_at"] is not None:
+            return {"ok": False, "error": "shift_not_active", "decisions": {}}
+        decisions = {"staff_warn": True} if shift["out_streak"] >= 3 else {}
+        return {"ok": True, "shift_id": shift_id, "decisions": decisions, "admin_chat_ids": self.admin_chat_ids}
+
+    def _violation_tick(self, method, params, form, headers):
+        return 200, self._tick(int(form.get("shift_id") or 0)), {}
+
+    def _violation_tick_many(self, method, params, form, headers):
+        results = {str(shift_id): self._tick(int(shift_id)) for shift_id in form.get("shift_ids") or []}
+        return 200, {"ok": True, "results": results}, {}
+
+    def _rebind_telegram(self, method, params, form, headers):
+        staff = self.staff.get(int(form.get("staff_id") or 0))
+        if staff is None:
+            return 200, {"ok": False, "error": "staff_not_found"}, {}
+        self.staff_by_tg.pop(int(staff.get("telegram_user_id") or 0), None)
+        staff["telegram_user_id"] = int(form.get("telegram_user_id") or 0)
+        staff["telegram_chat_id"] = int(form.get("telegram_chat_id") or 0)
+        self.staff_by_tg[staff["telegram_user_id"]] = staff["staff_id"]
+        return 200, {"ok": True, "staff": staff}, {}
+
+    def _register(self, method, params, form, headers):
+        telegram_user_id = int(form.get("telegram_user_id") or 0)
+        if telegram_user_id in self.staff_by_tg:
+            return 200, {"ok": False, "error": "already_registered"}, {}
+        staff_id = max(self.staff, default=0) + 1
+        staff = self.add_staff(
+            staff_id,
+            telegram_user_id,
+            full_name=form.get("full_name") or f"Courier {staff_id}",
+            phone=form.get("phone") or "",
+            employment_type=form.get("employment_type"),
+        )
+        return 200, {"ok": True, "staff_id": staff_id, "staff": staff}, {}
+
+    # --- front ends ------------------------------------------------------------
+
+    def direct_client(self) -> "DirectClient":
+        return DirectClient(self)
+
+    def transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            headers = {key.lower(): value for key, value in request.headers.items()}
+            status, response_headers, content = await self.respond(
+                request.method, request.url.query.decode(), request.content, headers
+            )
+            return httpx.Response(status, headers=response_headers, content=content)
+
+        return httpx.MockTransport(handler)
+
+    async def asgi(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        status, response_headers, content = await self.respond(
+            scope["method"], scope.get("query_string", b"").decode(), body, headers
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(key.encode(), value.encode()) for key, value in response_headers.items()],
+            }
+        )
+        await send({"type": "http.response.body", "body": content})
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """Start a keep-alive HTTP/1.1 server; the bound port is ``server.sockets[0].getsockname()[1]``."""
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                status, response_headers, content = await self.respond(method, urlsplit(target).query, body, headers)
+                head = [f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}", f"content-length: {len(content)}"]
+                head += [f"{key}: {value}" for key, value in response_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class DirectClient:
+    """Subset of ``OpenCartClient`` calling the fake's routes in-process."""
+
+    def __init__(self, fake: FakeOpenCart) -> None:
+        self.fake = fake
+
+    def _call(self, name: str, params: dict | None = None, form: dict | None = None) -> dict:
+        self.fake.calls[name] += 1
+        status, payload, _ = self.fake._routes[name]("POST" if form is not None else "GET", params or {}, form or {}, {})
+        self.fake.statuses[status] += 1
+        return payload or {}
+
+    async def get_staff_by_telegram(self, telegram_user_id: int) -> dict | None:
+        return self._call("staff_by_telegram", {"telegram_user_id": str(telegram_user_id)}).get("staff")
+
+    get_staff = get_staff_by_telegram
+
+    async def get_active_shift_by_staff(self, staff_id: int) -> dict | None:
+        return self._call("active_shift_by_staff", {"staff_id": str(staff_id)}).get("shift")
+
+    async def get_active_shifts_bulk(self, staff_ids: list[int]) -> dict[int, dict | None]:
+        shifts = self._call("active_shifts_bulk", form={"staff_ids": list(staff_ids)})["shifts"]
+        return {int(staff_id): shift for staff_id, shift in shifts.items()}
+
+    async def get_active_shifts_by_point(self, point_id: int) -> list[dict]:
+        return self._call("active_shifts_by_point", {"point_id": str(point_id)})["shifts"]
+
+    async def get_admin_chat_ids(self) -> list[int]:
+        return list(self.fake.admin_chat_ids)
+
+    async def ping_add(self, *, shift_id: int, lat: float, lon: float, status_fields=None, **fields) -> dict:
+        return self._call("ping_add", form={"shift_id": shift_id, "lat": lat, "lon": lon, **fields})
+
+    async def shift_start(self, payload: dict) -> dict:
+        return self._call("shift_start", form=dict(payload))
+
+    async def shift_end(self, payload: dict) -> dict:
+        return self._call("shift_end", form=dict(payload))
+
+    async def violation_tick(self, shift_id: int) -> dict:
+        return self._call("violation_tick", form={"shift_id": shift_id})
+
+    async def violation_tick_many(self, shift_ids: list[int]) -> dict[int, dict]:
+        results = self._call("violation_tick_many", form={"shift_ids": list(shift_ids)})["results"]
+        return {int(shift_id): response for shift_id, response in results.items()}
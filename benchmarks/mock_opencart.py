@@ -0,0 +1,10 @@
+import httpx
+
+from benchmarks.fake_opencart import POINT, FakeOpenCart, FaultProfile
+
+__all__ = ["POINT", "build_mock_transport"]
+
+
+def build_mock_transport(latency_sec: float = 0.005) -> httpx.MockTransport:
+    """OpenCart stand-in for the steady-state ping path, see ``FakeOpenCart``."""
+    return FakeOpenCart(FaultProfile(latency_sec=latency_sec)).transport()
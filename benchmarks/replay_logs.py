@@ -0,0 +1,370 @@
+"""Replay production location traffic from bot logs.
+
+``parse`` turns text or JSON logs into a compact event file: one JSON line per
+``LOCATION_UPDATE``, joined with the ``PING_ADD ... -> status=...`` decision OpenCart
+returned for it (updates that never reached ``ping_add`` keep ``st: null``).
+
+``replay`` feeds the events through the real location handler and ``OpenCartClient``
+at the recorded pace (``--speed 1``), faster (``--speed 10``) or as fast as possible
+(``--speed max``). ``RecordedOpenCart`` answers every ping with the recorded decision,
+so warnings and alerts follow the production run. Reports throughput, handler latency
+and scheduling lag (how late updates started against the recorded timeline).
+
+    python -m benchmarks.replay_logs parse bot.log -o events.jsonl.gz
+    python -m benchmarks.replay_logs replay events.jsonl.gz --speed 10
+"""
+
+import argparse
+import asyncio
+import collections
+import gzip
+import json
+import logging
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.fake_opencart import POINT, SHIFT_ID_BASE, FakeOpenCart, FaultProfile
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.opencart_client import OpenCartClient
+from shiftbot.request_context import with_request_context
+from shiftbot.request_stats import LatencyHistogram
+from shiftbot.session_store import SessionStore
+
+TEXT_TS_RE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3})")
+LOCATION_RE = re.compile(r"LOCATION_UPDATE tg=(\d+) is_edited=(\w+) lat=(\S+) lon=(\S+) acc=(\S+)")
+# tg= is absent in logs written before it was added to PING_ADD
+PING_RE = re.compile(
+    r"PING_ADD shift_id=(\S+) staff_id=(\S+)(?: tg=(\d+))? -> status=(\S*) reason=(\S*) out_streak=(\S+) rounds=(\S+)"
+)
+# the update ended before ping_add: no staff, no shift, ignored in the current mode
+NO_SHIFT_RE = re.compile(r"LOCATION_UPDATE no active shift staff_id=(\d+)")
+DROPPED_RE = re.compile(r"LOCATION_UPDATE(?:_IGNORED mode=\S+| staff_not_found) tg=(\d+)")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_line(line: str) -> tuple[float | None, str]:
+    """``(unix ts, message)`` of a text (``TEXT_FORMAT``) or JSON log line."""
+    if line.startswith("{"):
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            return None, ""
+        try:
+            ts = datetime.fromisoformat(str(payload.get("ts"))).timestamp()
+        except ValueError:
+            ts = None
+        return ts, str(payload.get("message") or "")
+    match = TEXT_TS_RE.match(line)
+    if match is None:
+        return None, line
+    ts = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp() + int(match.group(2)) / 1000.0
+    return ts, line
+
+
+def parse_log_lines(lines) -> tuple[list[dict], dict]:
+    """Events in update order plus parse stats.
+
+    ``PING_ADD`` lines carry the courier's ``tg``. Older logs have only ``staff_id``: the
+    first decision of a staff member is then joined with the latest pending update of a
+    not yet mapped courier (exact for sequential processing), after that the staff → tg
+    mapping is known.
+    """
+    events: list[dict] = []
+    pending: dict[int, dict] = {}
+    tg_by_staff: dict[int, int] = {}
+    mapped_tgs: set[int] = set()
+    stats = collections.Counter()
+    for line in lines:
+        ts, message = _split_line(line.rstrip("\n"))
+        if ts is None or "LOCATION_UPDATE" not in message and "PING_ADD " not in message:
+            continue
+        match = LOCATION_RE.search(message)
+        if match:
+            tg = int(match.group(1))
+            event = {
+                "ts": ts,
+                "tg": tg,
+                "ed": int(match.group(2) == "True"),
+                "lat": float(match.group(3)),
+                "lon": float(match.group(4)),
+                "acc": _float(match.group(5)),
+                "st": None,
+            }
+            pending.pop(tg, None)
+            pending[tg] = event
+            events.append(event)
+            stats["updates"] += 1
+            continue
+        match = PING_RE.search(message)
+        if match:
+            staff_id = _int(match.group(2))
+            tg = _int(match.group(3)) or tg_by_staff.get(staff_id)
+            if tg is None:
+                tg = next((tg for tg in reversed(pending) if tg not in mapped_tgs), None)
+            event = pending.pop(tg, None) if tg is not None else None
+            if event is None:
+                stats["orphan_decisions"] += 1
+                continue
+            if staff_id is not None and staff_id not in tg_by_staff:
+                tg_by_staff[staff_id] = tg
+                mapped_tgs.add(tg)
+            event.update(
+                shift=_int(match.group(1)),
+                staff=staff_id,
+                st=match.group(4) or None,
+                r=match.group(5) or "",
+                os=_int(match.group(6)) or 0,
+                rounds=_int(match.group(7)) or 0,
+            )
+            stats["decisions"] += 1
+            continue
+        match = NO_SHIFT_RE.search(message)
+        if match:
+            tg = tg_by_staff.get(int(match.group(1)))
+            if tg is not None:
+                pending.pop(tg, None)
+            continue
+        match = DROPPED_RE.search(message)
+        if match:
+            pending.pop(int(match.group(1)), None)
+    return events, dict(stats)
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+def write_events(path: str, events: list[dict]) -> None:
+    """Timestamps become offsets in ms from the first event; keys are kept short."""
+    start = events[0]["ts"] if events else 0.0
+    with _open(path, "w") as out:
+        out.write(json.dumps({"v": 1, "start_ts": start, "events": len(events)}) + "\n")
+        for event in events:
+            item = {key: value for key, value in event.items() if key != "ts" and value not in (None, "", 0)}
+            item["t"] = round((event["ts"] - start) * 1000)
+            out.write(json.dumps(item, separators=(",", ":")) + "\n")
+
+
+def read_events(path: str) -> list[dict]:
+    with _open(path, "r") as source:
+        header = json.loads(source.readline())
+        if header.get("v") != 1:
+            raise ValueError(f"unsupported event file version: {header.get('v')}")
+        return [json.loads(line) for line in source if line.strip()]
+
+
+class RecordedOpenCart(FakeOpenCart):
+    """Answers ``active_shift_by_staff`` and ``ping_add`` from the recorded events.
+
+    Each courier's updates are replayed in order, and each update makes exactly one
+    active shift lookup (memoized per update), so the lookups walk the courier's events:
+    an event with a decision has a shift and gets that decision from ``ping_add``, an
+    event without one had no active shift.
+    """
+
+    def __init__(self, events: list[dict], faults: FaultProfile | None = None) -> None:
+        super().__init__(faults, auto_staff=False, auto_shifts=False)
+        self._expected: dict[int, collections.deque] = collections.defaultdict(collections.deque)
+        self._decisions: dict[int, dict] = {}
+        staff_by_tg = {event["tg"]: event["staff"] for event in events if event.get("staff") is not None}
+        for event in events:
+            staff_id = staff_by_tg.get(event["tg"], event["tg"])
+            if staff_id not in self.staff:
+                self.add_staff(staff_id, event["tg"])
+            self._expected[staff_id].append(event)
+
+    def _active_shift_by_staff(self, method, params, form, headers):
+        staff_id = int(params.get("staff_id") or 0)
+        queue = self._expected.get(staff_id)
+        event = queue.popleft() if queue else None
+        if event is None or not event.get("st"):
+            return 200, {"ok": True, "shift": None}, {}
+        shift_id = event.get("shift") or SHIFT_ID_BASE + staff_id
+        self._decisions[shift_id] = event
+        shift = {"shift_id": shift_id, "staff_id": staff_id, "ended_at": None, **POINT}
+        return 200, {"ok": True, "shift": shift}, {}
+
+    def _ping_add(self, method, params, form, headers):
+        event = self._decisions.pop(int(form.get("shift_id") or 0), None)
+        if event is None:
+            self.pings["unexpected"] += 1
+            return 200, {"ok": False, "error": "shift_not_active"}, {}
+        self.pings[event["st"]] += 1
+        return (
+            200,
+            {
+                "ok": True,
+                "status": event["st"],
+                "reason": event.get("r", ""),
+                "out_streak": event.get("os", 0),
+                "out_violation_rounds": event.get("rounds", 0),
+            },
+            {},
+        )
+
+
+class CountingBot:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+class ReplayMessage:
+    def __init__(self, bot: CountingBot, event: dict) -> None:
+        self.bot = bot
+        self.chat_id = event["tg"]
+        self.location = SimpleNamespace(latitude=event["lat"], longitude=event["lon"], horizontal_accuracy=event.get("acc"))
+
+    async def reply_text(self, text, **kwargs):
+        self.bot.sent += 1
+
+    async def edit_text(self, text, **kwargs):
+        self.bot.sent += 1
+
+
+async def replay(events: list[dict], *, speed: float | None, latency_sec: float, concurrency: int) -> dict:
+    """Replay ``events``; ``speed=None`` means as fast as possible."""
+    logger = logging.getLogger("replay")
+    fake = RecordedOpenCart(events, FaultProfile(latency_sec=latency_sec))
+    oc_client = OpenCartClient("http://opencart.local", "replay", logger, transport=fake.transport())
+    detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+    handlers = build_location_handlers(SessionStore(), None, oc_client, detector, logger)
+    handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_location_message")
+    handle_location = with_request_context(handler).callback
+    bot = CountingBot()
+    context = SimpleNamespace(bot=bot, application=SimpleNamespace(bot_data={"admin_chat_ids": []}))
+
+    latency = LatencyHistogram()
+    lag = LatencyHistogram()
+    slots = asyncio.Semaphore(concurrency)
+    last_by_user: dict[int, asyncio.Task] = {}
+    failures = 0
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def run_one(update_id: int, event: dict, due: float, previous: asyncio.Task | None) -> None:
+        nonlocal failures
+        if previous is not None:
+            # updates of one courier never overlap, as in PTB
+            await asyncio.wait([previous])
+        async with slots:
+            begin = loop.time()
+            lag.observe(max(begin - due, 0.0))
+            message = ReplayMessage(bot, event)
+            update = SimpleNamespace(
+                update_id=update_id,
+                message=None if event.get("ed") else message,
+                edited_message=message if event.get("ed") else None,
+                effective_message=message,
+                effective_user=SimpleNamespace(id=event["tg"]),
+                effective_chat=SimpleNamespace(id=event["tg"]),
+            )
+            try:
+                await handle_location(update, context)
+            except Exception:
+                failures += 1
+            latency.observe(loop.time() - begin)
+
+    for update_id, event in enumerate(events, 1):
+        due = started + (event.get("t", 0) / 1000.0 / speed if speed else 0.0)
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tg = event["tg"]
+        last_by_user[tg] = asyncio.create_task(run_one(update_id, event, due, last_by_user.get(tg)))
+    if last_by_user:
+        await asyncio.wait(list(last_by_user.values()))
+    elapsed = loop.time() - started
+    await oc_client.aclose()
+
+    hist = latency.as_dict()
+    lag_hist = lag.as_dict()
+    recorded_sec = events[-1].get("t", 0) / 1000.0 if events else 0.0
+    return {
+        "events": len(events),
+        "recorded_sec": recorded_sec,
+        "elapsed_sec": elapsed,
+        "updates_per_sec": len(events) / elapsed if elapsed else 0.0,
+        "handler_p50_ms": min(hist["p50_sec"], hist["max_sec"]) * 1000,
+        "handler_p99_ms": min(hist["p99_sec"], hist["max_sec"]) * 1000,
+        "handler_max_ms": hist["max_sec"] * 1000,
+        "lag_p99_ms": min(lag_hist["p99_sec"], lag_hist["max_sec"]) * 1000,
+        "lag_max_ms": lag_hist["max_sec"] * 1000,
+        "failed_updates": failures,
+        "telegram_sends": bot.sent,
+        "pings": dict(fake.pings),
+        "opencart_calls": dict(fake.calls),
+    }
+
+
+def _speed(value: str) -> float | None:
+    if value == "max":
+        return None
+    speed = float(value.rstrip("x×"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    parse_cmd = commands.add_parser("parse", help="logs -> event file")
+    parse_cmd.add_argument("logs", nargs="+")
+    parse_cmd.add_argument("-o", "--output", required=True, help="event file, .gz to compress")
+    replay_cmd = commands.add_parser("replay", help="event file -> real handlers")
+    replay_cmd.add_argument("events")
+    replay_cmd.add_argument("--speed", type=_speed, default=1.0, help="1, 10, ... or max")
+    replay_cmd.add_argument("--latency-ms", type=float, default=5.0)
+    replay_cmd.add_argument("--concurrency", type=int, default=256, help="updates in flight, like CONCURRENT_UPDATES")
+    replay_cmd.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    if args.command == "parse":
+        events: list[dict] = []
+        totals = collections.Counter()
+        for path in args.logs:
+            with _open(path, "r") as source:
+                parsed, stats = parse_log_lines(source)
+            events.extend(parsed)
+            totals.update(stats)
+        events.sort(key=lambda event: event["ts"])
+        write_events(args.output, events)
+        print(f"events={len(events)} {' '.join(f'{key}={value}' for key, value in sorted(totals.items()))}")
+        return
+
+    logging.basicConfig(level=args.log_level)
+    result = asyncio.run(
+        replay(read_events(args.events), speed=args.speed, latency_sec=args.latency_ms / 1000.0, concurrency=args.concurrency)
+    )
+    print(
+        f"events={result['events']} recorded={result['recorded_sec']:.1f}s elapsed={result['elapsed_sec']:.1f}s "
+        f"throughput={result['updates_per_sec']:.0f} upd/s"
+    )
+    print(
+        f"handler p50={result['handler_p50_ms']:.1f}ms p99={result['handler_p99_ms']:.1f}ms "
+        f"max={result['handler_max_ms']:.1f}ms lag p99={result['lag_p99_ms']:.1f}ms max={result['lag_max_ms']:.1f}ms "
+        f"failed={result['failed_updates']}"
+    )
+    print(f"pings={result['pings']} telegram_sends={result['telegram_sends']} opencart_calls={result['opencart_calls']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Discrete-event simulation of a fleet of shifts in virtual time.
+
+Couriers send live-location pings through the real location handler and
+``job_check_stale`` runs on its schedule, all against ``FakeOpenCart`` under a
+``VirtualClock``: hours of a working day take seconds of wall time. A share of couriers
+goes dark for a while, another share leaves the point. Reports stale warnings, admin
+alerts, auto-stopped shifts, false alarms and the wall time of every stale check.
+
+    python -m benchmarks.simulate_shifts --shifts 1000 --hours 2
+    python -m benchmarks.simulate_shifts --backend mock --shifts 200 --hours 1
+"""
+
+import argparse
+import asyncio
+import heapq
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from benchmarks.fake_opencart import POINT, FakeOpenCart, FaultProfile
+from shiftbot import clock, config
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.jobs import build_job_check_stale
+from shiftbot.opencart_client import OpenCartClient
+from shiftbot.request_context import with_request_context
+from shiftbot.request_stats import LatencyHistogram
+from shiftbot.session_store import SessionStore
+
+ADMIN_CHAT_ID = 1
+COURIER_ID_BASE = 1000
+PING = "ping"
+STALE_CHECK = "stale_check"
+
+
+@dataclass
+class Courier:
+    user_id: int
+    staff_id: int
+    shift_id: int
+    point: dict
+    # [from, until) windows in virtual seconds since the start of the simulation
+    dark: tuple[float, float] = (math.inf, math.inf)
+    away: tuple[float, float] = (math.inf, math.inf)
+
+
+class RecordingBot:
+    def __init__(self) -> None:
+        self.sent: dict[int, int] = {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent[chat_id] = self.sent.get(chat_id, 0) + 1
+
+
+class RecordingMessage:
+    def __init__(self, bot: RecordingBot, chat_id: int, lat: float, lon: float) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.location = SimpleNamespace(latitude=lat, longitude=lon, horizontal_accuracy=10.0)
+
+    async def reply_text(self, text, **kwargs):
+        await self.bot.send_message(self.chat_id, text)
+
+    async def edit_text(self, text, **kwargs):
+        await self.bot.send_message(self.chat_id, text)
+
+
+class Simulation:
+    def __init__(
+        self,
+        *,
+        shifts: int,
+        hours: float,
+        couriers_per_point: int = 5,
+        ping_every_sec: float = 30.0,
+        dark_share: float = 0.05,
+        dark_mean_sec: float = 600.0,
+        away_share: float = 0.05,
+        backend: str = "direct",
+        seed: int = 1,
+    ) -> None:
+        self.duration_sec = hours * 3600.0
+        self.ping_every_sec = ping_every_sec
+        self.rng = random.Random(seed)
+        self.clock = clock.VirtualClock()
+        self.start_ts = self.clock.ts
+        # points on a ~0.01° grid around POINT, couriers_per_point shifts on each
+        points = [
+            {
+                **POINT,
+                "point_id": idx + 1,
+                "point_name": f"ДЛ {idx + 1}",
+                "point_lat": POINT["point_lat"] + (idx // 50) * 0.01,
+                "point_lon": POINT["point_lon"] + (idx % 50) * 0.01,
+            }
+            for idx in range(max(1, math.ceil(shifts / couriers_per_point)))
+        ]
+        self.fake = FakeOpenCart(
+            FaultProfile(latency_sec=0.0),
+            points=points,
+            admin_chat_ids=[ADMIN_CHAT_ID],
+            auto_shifts=False,
+            seed=seed,
+            clock=self.clock,
+        )
+        self.backend = backend
+        if backend == "mock":
+            self.oc_client = OpenCartClient(
+                "http://opencart.local", "sim", logging.getLogger("sim"), transport=self.fake.transport()
+            )
+        else:
+            self.oc_client = self.fake.direct_client()
+
+        self.session_store = SessionStore()
+        self.couriers: dict[int, Courier] = {}
+        for idx in range(shifts):
+            user_id = COURIER_ID_BASE + idx
+            staff = self.fake.add_staff(user_id, user_id)
+            point = points[idx % len(points)]
+            shift = self.fake.start_shift(staff["staff_id"], point["point_id"])
+            courier = Courier(user_id, staff["staff_id"], shift["shift_id"], point)
+            if self.rng.random() < dark_share:
+                start = self.rng.uniform(0, self.duration_sec)
+                courier.dark = (start, start + self.rng.expovariate(1.0 / dark_mean_sec))
+            if self.rng.random() < away_share:
+                start = self.rng.uniform(0, self.duration_sec)
+                courier.away = (start, start + self.rng.uniform(300, 1800))
+            self.couriers[user_id] = courier
+            session = self.session_store.get_or_create(user_id, user_id)
+            session.active = True
+            session.staff_id = courier.staff_id
+            session.active_shift_id = courier.shift_id
+            session.active_point_id = point["point_id"]
+            session.active_point_lat = point["point_lat"]
+            session.active_point_lon = point["point_lon"]
+            session.active_point_radius = point["point_radius"]
+
+        logger = logging.getLogger("sim")
+        detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+        handlers = build_location_handlers(self.session_store, None, self.oc_client, detector, logger)
+        handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_location_message")
+        self.handle_location = with_request_context(handler).callback
+        self.check_stale = build_job_check_stale(self.session_store, self.oc_client, logger)
+        self.bot = RecordingBot()
+        self.context = SimpleNamespace(
+            bot=self.bot, application=SimpleNamespace(bot_data={"admin_chat_ids": [ADMIN_CHAT_ID]})
+        )
+
+        self._queue: list = []
+        self._seq = 0
+        self.events = 0
+        self.pings = 0
+        self.stale_check_wall = LatencyHistogram()
+        self.ping_wall = LatencyHistogram()
+
+    def schedule(self, offset_sec: float, kind: str, user_id: int = 0) -> None:
+        if offset_sec <= self.duration_sec:
+            self._seq += 1
+            heapq.heappush(self._queue, (offset_sec, self._seq, kind, user_id))
+
+    def _shift_active(self, courier: Courier) -> bool:
+        return self.fake.active_by_staff.get(courier.staff_id) == courier.shift_id
+
+    async def _ping(self, offset_sec: float, courier: Courier) -> None:
+        if not self._shift_active(courier):
+            return
+        dark_from, dark_until = courier.dark
+        if dark_from <= offset_sec < dark_until:
+            self.schedule(dark_until, PING, courier.user_id)
+            return
+        away_from, away_until = courier.away
+        # ~20 m of GPS noise; away couriers are ~550 m north of the point
+        lat = courier.point["point_lat"] + self.rng.uniform(-2e-4, 2e-4)
+        if away_from <= offset_sec < away_until:
+            lat += 0.005
+        lon = courier.point["point_lon"] + self.rng.uniform(-2e-4, 2e-4)
+        message = RecordingMessage(self.bot, courier.user_id, lat, lon)
+        update = SimpleNamespace(
+            update_id=self.events,
+            message=None,
+            edited_message=message,
+            effective_message=message,
+            effective_user=SimpleNamespace(id=courier.user_id),
+            effective_chat=SimpleNamespace(id=courier.user_id),
+        )
+        started = time.perf_counter()
+        await self.handle_location(update, self.context)
+        self.ping_wall.observe(time.perf_counter() - started)
+        self.pings += 1
+        self.schedule(offset_sec + self.ping_every_sec * self.rng.uniform(0.8, 1.2), PING, courier.user_id)
+
+    async def run(self) -> dict:
+        for courier in self.couriers.values():
+            self.schedule(self.rng.uniform(0, self.ping_every_sec), PING, courier.user_id)
+        self.schedule(config.STALE_CHECK_EVERY_SEC, STALE_CHECK)
+
+        started = time.perf_counter()
+        with clock.use_clock(self.clock):
+            while self._queue:
+                offset_sec, _, kind, user_id = heapq.heappop(self._queue)
+                self.clock.advance_to(self.start_ts + offset_sec)
+                self.events += 1
+                if kind == PING:
+                    await self._ping(offset_sec, self.couriers[user_id])
+                else:
+                    check_started = time.perf_counter()
+                    await self.check_stale(self.context)
+                    self.stale_check_wall.observe(time.perf_counter() - check_started)
+                    self.schedule(offset_sec + config.STALE_CHECK_EVERY_SEC, STALE_CHECK)
+        wall_sec = time.perf_counter() - started
+        if self.backend == "mock":
+            await self.oc_client.aclose()
+        return self.report(wall_sec)
+
+    def report(self, wall_sec: float) -> dict:
+        stopped = {
+            shift["staff_id"]
+            for shift in self.fake.shifts.values()
+            if str(shift.get("end_reason") or "").startswith("auto_")
+        }
+        dark = {courier.staff_id for courier in self.couriers.values() if courier.dark[0] < self.duration_sec}
+        warned = {chat_id for chat_id, count in self.bot.sent.items() if chat_id != ADMIN_CHAT_ID and count}
+        return {
+            "shifts": len(self.couriers),
+            "virtual_hours": self.duration_sec / 3600.0,
+            "wall_sec": wall_sec,
+            "speedup": self.duration_sec / wall_sec if wall_sec else 0.0,
+            "events": self.events,
+            "pings": self.pings,
+            "ping_wall": self.ping_wall.as_dict(),
+            "stale_checks": self.stale_check_wall.count,
+            "stale_check_wall": self.stale_check_wall.as_dict(),
+            "couriers_messaged": len(warned),
+            "admin_messages": self.bot.sent.get(ADMIN_CHAT_ID, 0),
+            "went_dark": len(dark),
+            "auto_stopped": len(stopped),
+            # stopped although the courier never went dark
+            "false_stops": len(stopped - dark),
+            "opencart_calls": dict(self.fake.calls),
+        }
+
+
+def _ms(hist: dict, key: str) -> float:
+    return min(hist[key], hist["max_sec"]) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shifts", type=int, default=1000)
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--couriers-per-point", type=int, default=5)
+    parser.add_argument("--ping-every", type=float, default=30.0, help="seconds between live-location edits")
+    parser.add_argument("--dark-share", type=float, default=0.05)
+    parser.add_argument("--dark-mean", type=float, default=600.0, help="mean length of a dark period, seconds")
+    parser.add_argument("--away-share", type=float, default=0.05)
+    parser.add_argument("--backend", choices=["direct", "mock"], default="direct")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    simulation = Simulation(
+        shifts=args.shifts,
+        hours=args.hours,
+        couriers_per_point=args.couriers_per_point,
+        ping_every_sec=args.ping_every,
+        dark_share=args.dark_share,
+        dark_mean_sec=args.dark_mean,
+        away_share=args.away_share,
+        backend=args.backend,
+        seed=args.seed,
+    )
+    result = asyncio.run(simulation.run())
+    print(
+        f"shifts={result['shifts']} virtual={result['virtual_hours']:.1f}h wall={result['wall_sec']:.1f}s "
+        f"speedup={result['speedup']:.0f}x events={result['events']} pings={result['pings']}"
+    )
+    print(
+        f"ping p50={_ms(result['ping_wall'], 'p50_sec'):.2f}ms p99={_ms(result['ping_wall'], 'p99_sec'):.2f}ms; "
+        f"stale_check runs={result['stale_checks']} p50={_ms(result['stale_check_wall'], 'p50_sec'):.1f}ms "
+        f"p99={_ms(result['stale_check_wall'], 'p99_sec'):.1f}ms max={result['stale_check_wall']['max_sec'] * 1000:.1f}ms"
+    )
+    print(
+        f"went_dark={result['went_dark']} auto_stopped={result['auto_stopped']} false_stops={result['false_stops']} "
+        f"couriers_messaged={result['couriers_messaged']} admin_messages={result['admin_messages']}"
+    )
+    print(f"opencart_calls={result['opencart_calls']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from shiftbot.request_stats import LatencyHistogram
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window toward a backend.
+
+    Every completed request is a signal: a failure (5xx, timeout, network error) or a
+    latency above ``latency_target_sec`` multiplies the window by ``backoff`` — at most
+    once per ``latency_target_sec`` so one burst of slow replies counts as one event —
+    otherwise the window grows by ``1 / limit`` (about +1 per window's worth of requests).
+    Waiters are served by priority, then arrival order, so interactive calls jump the
+    queue when the window is small.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int,
+        latency_target_sec: float,
+        backoff: float = 0.7,
+        clock=time.monotonic,
+    ) -> None:
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= initial <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_sec = latency_target_sec
+        self.backoff = backoff
+        self.clock = clock
+        self._limit = float(initial)
+        self.in_flight = 0
+        self.decreases = 0
+        self.queue_wait = LatencyHistogram()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._last_decrease = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int = 0) -> None:
+        started = time.perf_counter()
+        if self.in_flight < self.limit and not self.waiting:
+            self.in_flight += 1
+            self.queue_wait.observe(0.0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over right before cancellation; give it back
+                self.in_flight -= 1
+                self._wake()
+            raise
+        self.queue_wait.observe(time.perf_counter() - started)
+
+    def release(self, *, latency_sec: float | None, failed: bool = False) -> None:
+        """Return a slot; ``latency_sec=None`` releases without adjusting the window."""
+        self.in_flight -= 1
+        if latency_sec is not None:
+            if failed or latency_sec > self.latency_target_sec:
+                now = self.clock()
+                if now - self._last_decrease >= self.latency_target_sec:
+                    self._last_decrease = now
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff)
+                    self.decreases += 1
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "decreases": self.decreases,
+            "queue_wait": self.queue_wait.as_dict(),
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from shiftbot.deadline import spawn_detached
+from shiftbot.metrics import REGISTRY
+
+ADMIN_DIRECTORY_REFRESH_TOTAL = REGISTRY.counter(
+    "shiftbot_admin_directory_refresh_total", "Admin chat id refreshes by result.", ("result",)
+)
+
+
+class AdminDirectory:
+    """Admin chat ids served from memory and refreshed in the background.
+
+    ``get()`` does not wait for the network while there is anything to serve: a stale
+    value is returned as is and one refresh is started alongside it. Refreshes send the
+    last ETag as ``If-None-Match``, a 304 only extends freshness. Every change is published
+    to ``bot_data["admin_chat_ids"]`` as a new list, so a reader holding the old one keeps
+    a consistent snapshot.
+    """
+
+    def __init__(
+        self,
+        oc_client,
+        logger,
+        *,
+        ttl_sec: float,
+        retry_sec: float,
+        fallback: list[int] | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        self.oc_client = oc_client
+        self.logger = logger
+        self.ttl_sec = ttl_sec
+        self.retry_sec = min(retry_sec, ttl_sec)
+        self.fallback = list(fallback or [])
+        self.clock = clock
+        self.chat_ids: list[int] = []
+        self.etag: str | None = None
+        self._refresh_at = float("-inf")
+        self._bot_data: dict | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    def attach(self, bot_data: dict) -> None:
+        self._bot_data = bot_data
+        bot_data["admin_chat_ids"] = self.chat_ids
+
+    def publish(self, chat_ids: list[int]) -> None:
+        self.chat_ids = list(chat_ids)
+        if self._bot_data is not None:
+            self._bot_data["admin_chat_ids"] = self.chat_ids
+
+    def is_stale(self) -> bool:
+        return self.clock() >= self._refresh_at
+
+    async def get(self) -> list[int]:
+        if self.is_stale():
+            if self.chat_ids:
+                self.refresh_in_background()
+            else:
+                # nothing to serve yet — the only case that waits for the API
+                await self.refresh()
+        return list(self.chat_ids)
+
+    def refresh_in_background(self) -> asyncio.Task:
+        """Start a refresh unless one is already running (single flight)."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = spawn_detached(self._refresh(), name="admin_directory_refresh")
+        return self._refresh_task
+
+    async def refresh(self) -> bool:
+        # shield: a caller running out of its own budget must not cancel the shared refresh
+        return await asyncio.shield(self.refresh_in_background())
+
+    async def _refresh(self) -> bool:
+        try:
+            result = await self.oc_client.fetch_admin_chat_ids(etag=self.etag)
+        except Exception as exc:
+            return self._refresh_failed("request_error", exc)
+
+        if result.get("status") == 304:
+            ADMIN_DIRECTORY_REFRESH_TOTAL.inc(result="not_modified")
+            self._refresh_at = self.clock() + self.ttl_sec
+            self.logger.debug("ADMIN_DIRECTORY_NOT_MODIFIED etag=%s", self.etag)
+            return True
+
+        if result.get("chat_ids") is None:
+            return self._refresh_failed("invalid_response", result.get("status"))
+
+        ADMIN_DIRECTORY_REFRESH_TOTAL.inc(result="ok")
+        self.etag = result.get("etag")
+        self._refresh_at = self.clock() + self.ttl_sec
+        chat_ids = sorted(set(result["chat_ids"]))
+        if not chat_ids:
+            # a valid empty list: the server has no admins, serve only the forced ones
+            self.logger.warning("ADMIN_DIRECTORY_EMPTY etag=%s serving=%s", self.etag, self.fallback)
+            chat_ids = sorted(set(self.fallback))
+        if chat_ids != self.chat_ids:
+            self.publish(chat_ids)
+            self.logger.info("ADMIN_DIRECTORY_UPDATED chat_ids=%s etag=%s", chat_ids, self.etag)
+        return True
+
+    def _refresh_failed(self, reason: str, detail) -> bool:
+        ADMIN_DIRECTORY_REFRESH_TOTAL.inc(result="failed")
+        self._refresh_at = self.clock() + self.retry_sec
+        if not self.chat_ids and self.fallback:
+            self.publish(self.fallback)
+        self.logger.warning(
+            "ADMIN_DIRECTORY_REFRESH_FAILED reason=%s detail=%s serving=%s retry_in_sec=%s",
+            reason,
+            detail,
+            self.chat_ids,
+            self.retry_sec,
+        )
+        return False
@@ -1,9 +1,8 @@
 import asyncio
 import logging
-import time
 from datetime import datetime, timezone
 
-from shiftbot import config
+from shiftbot import clock, config
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +29,7 @@ async def notify_admins(
     # Cooldown check
     if cooldown_key is not None:
         cooldowns = app.bot_data.setdefault(NOTIFY_ADMINS_COOLDOWN_KEY, {})
-        now = time.time()
+        now = clock.now()
         ck = (str(shift_id) if shift_id is not None else "", cooldown_key)
         last_sent = cooldowns.get(ck)
         if isinstance(last_sent, float) and (now - last_sent) < config.ADMIN_NOTIFY_COOLDOWN_SEC:
@@ -43,14 +42,18 @@ async def notify_admins(
             return False
 
     # Resolve admin chat IDs via API (with cache + fallback)
+    directory = app.bot_data.get("admin_directory")
     configured_chat_ids = app.bot_data.get("admin_chat_ids")
+    if directory is not None:
+        # a stale list is served as is; the directory refreshes it in the background
+        configured_chat_ids = await directory.get()
     if isinstance(configured_chat_ids, list) and configured_chat_ids:
         chat_ids = [int(v) for v in configured_chat_ids if str(v).isdigit() and int(v) > 0]
     else:
         chat_ids = []
 
     oc_client = app.bot_data.get("oc_client")
-    if oc_client is not None and not chat_ids:
+    if oc_client is not None and directory is None and not chat_ids:
         try:
             chat_ids = await oc_client.get_admin_chat_ids()
         except Exception as exc:
@@ -86,7 +89,7 @@ async def notify_admins(
     if sent_any and cooldown_key is not None:
         cooldowns = app.bot_data.setdefault(NOTIFY_ADMINS_COOLDOWN_KEY, {})
         ck = (str(shift_id) if shift_id is not None else "", cooldown_key)
-        cooldowns[ck] = time.time()
+        cooldowns[ck] = clock.now()
 
     return sent_any
 
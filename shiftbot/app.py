@@ -1,51 +1,174 @@
+import asyncio
+import os
+
 from telegram import MenuButtonDefault, Update
 from telegram.ext import Application
 
 from shiftbot import config
+from shiftbot.adaptive_limit import AdaptiveLimiter
+from shiftbot.call_budget import ACCOUNTING, InstrumentedRequest
+from shiftbot.admin_directory import AdminDirectory
 from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.deadline import spawn_detached, with_deadline
 from shiftbot.guards import StaffService
 from shiftbot.handlers_location import build_location_handlers
-from shiftbot.handlers_shift import build_shift_handlers
-from shiftbot.jobs import build_job_check_stale
+from shiftbot.handlers_shift import build_shift_handlers, prepare_points
+from shiftbot.jobs import (
+    build_job_check_stale,
+    build_job_memory_report,
+    build_job_refresh_admin_directory,
+    build_job_replay_ping_journal,
+)
+from shiftbot.live_registry import LIVE_REGISTRY
+from shiftbot.loop_monitor import LOOP_MONITOR
+from shiftbot.memory_report import MemoryGroup, MemoryInspector
+from shiftbot.metrics import (
+    DEAD_SOUL_TRACKERS,
+    QUEUE_DEPTH,
+    REGISTRY,
+    SESSIONS,
+    MetricsServer,
+    export_call_accounting,
+    export_limiter_stats,
+    export_request_stats,
+    instrument_handler,
+)
 from shiftbot.opencart_client import OpenCartClient
+from shiftbot.ping_journal import PingJournal, PingJournalReplayer
+from shiftbot.point_index import PointsCatalog
 from shiftbot.registration import build_cancel_handler, build_registration_handler
+from shiftbot.request_context import with_request_context
 from shiftbot.session_store import SessionStore
+from shiftbot.shared_state import SHARED_COOLDOWNS_KEY, is_shared_proxy
+from shiftbot.side_effects import SideEffectExecutor
 from shiftbot.staff_cache import StaffCache
+from shiftbot.update_processor import PerUserUpdateProcessor
 from shiftbot.violation_alerts import ADMIN_NOTIFY_COOLDOWN_KEY
 
 
 class ShiftBotApp:
-    def __init__(self, logger) -> None:
+    def __init__(self, logger, *, shared_state=None, shard_index: int | None = None) -> None:
         self.logger = logger
+        self.shared_state = shared_state
         self.session_store = SessionStore()
         self.oc_client = OpenCartClient(
             config.OC_API_BASE,
             config.OC_API_KEY,
             logger,
             admin_base_url=config.OC_API_ADMIN_BASE,
+            lane_limits={
+                "interactive": config.OC_LANE_INTERACTIVE,
+                "ping": config.OC_LANE_PING,
+                "bulk": config.OC_LANE_BULK,
+            },
+            limiter=(
+                AdaptiveLimiter(
+                    initial=config.OC_LIMIT_INITIAL,
+                    min_limit=config.OC_LIMIT_MIN,
+                    max_limit=config.OC_LIMIT_MAX,
+                    latency_target_sec=config.OC_LIMIT_LATENCY_TARGET_SEC,
+                )
+                if config.OC_LIMIT_MAX > 0
+                else None
+            ),
         )
+        self.fleet_oc_client = self._build_fleet_oc_client(logger)
         self.staff_cache = StaffCache(ttl_sec=config.STAFF_CACHE_TTL_SEC)
         self.staff_service = StaffService(self.oc_client, self.staff_cache)
-        self.dead_soul_detector = DeadSoulDetector(
-            bucket_sec=config.DEAD_SOUL_BUCKET_SEC,
-            window_sec=config.DEAD_SOUL_WINDOW_SEC,
-            streak_threshold=config.DEAD_SOUL_STREAK,
-            alert_cooldown_sec=config.ALERT_COOLDOWN_DEAD_SEC,
+        self.points_catalog = PointsCatalog(
+            self.oc_client,
+            ttl_sec=config.POINTS_CACHE_TTL_SEC,
+            default_radius_m=config.DEFAULT_RADIUS_M,
+            prepare=prepare_points,
+        )
+        if shared_state is not None and shared_state.dead_soul_detector is not None:
+            self.dead_soul_detector = shared_state.dead_soul_detector
+        else:
+            self.dead_soul_detector = DeadSoulDetector(
+                bucket_sec=config.DEAD_SOUL_BUCKET_SEC,
+                window_sec=config.DEAD_SOUL_WINDOW_SEC,
+                streak_threshold=config.DEAD_SOUL_STREAK,
+                alert_cooldown_sec=config.ALERT_COOLDOWN_DEAD_SEC,
+            )
+        self.ping_journal: PingJournal | None = None
+        self.ping_replayer: PingJournalReplayer | None = None
+        if config.PING_JOURNAL_DIR:
+            journal_dir = config.PING_JOURNAL_DIR
+            if shard_index is not None:
+                # each shard worker owns its own journal directory
+                journal_dir = os.path.join(journal_dir, f"shard-{shard_index}")
+            self.ping_journal = PingJournal(
+                journal_dir,
+                segment_max_bytes=config.PING_JOURNAL_SEGMENT_MAX_BYTES,
+                fsync_every=config.PING_JOURNAL_FSYNC_EVERY,
+            )
+            if config.PING_JOURNAL_TIME_FIELD:
+                self.ping_replayer = PingJournalReplayer(
+                    self.ping_journal,
+                    self.oc_client,
+                    logger,
+                    time_field=config.PING_JOURNAL_TIME_FIELD,
+                    rate_per_sec=config.PING_JOURNAL_REPLAY_RATE,
+                )
+            else:
+                logger.warning("PING_JOURNAL_REPLAY_DISABLED reason=no_time_field dir=%s", journal_dir)
+        self.loop_monitor_task: asyncio.Task | None = None
+        self.side_effects: SideEffectExecutor | None = None
+        self.side_effects_task: asyncio.Task | None = None
+        if config.SIDE_EFFECTS_CONCURRENCY > 0:
+            self.side_effects = SideEffectExecutor(
+                logger,
+                max_concurrency=config.SIDE_EFFECTS_CONCURRENCY,
+                timeout_sec=config.SIDE_EFFECTS_TIMEOUT_SEC,
+                max_pending=config.SIDE_EFFECTS_MAX_PENDING,
+            )
+        self.metrics_server: MetricsServer | None = None
+        if config.METRICS_PORT > 0:
+            self.metrics_server = MetricsServer(
+                REGISTRY,
+                config.METRICS_HOST,
+                config.METRICS_PORT + (shard_index or 0),
+                logger,
+            )
+        self.memory_inspector = MemoryInspector(
+            max_objects=config.MEMORY_REPORT_MAX_OBJECTS,
+            trace_frames=config.MEMORY_TRACE_FRAMES,
         )
         self.admin_chat_ids: list[int] = []
+        self.admin_directory = AdminDirectory(
+            self.oc_client,
+            logger,
+            ttl_sec=config.ADMIN_CHAT_IDS_TTL_SEC,
+            retry_sec=config.ADMIN_CHAT_IDS_RETRY_SEC,
+            fallback=config.ADMIN_FORCE_CHAT_IDS,
+        )
 
         if not config.BOT_TOKEN:
             raise RuntimeError("BOT_TOKEN пуст.")
         if not config.OC_API_BASE or not config.OC_API_KEY:
             raise RuntimeError("OC_API_BASE и OC_API_KEY обязательны.")
 
-        self.application = (
+        builder = (
             Application.builder()
             .token(config.BOT_TOKEN)
+            # PTB's default pool size for bot requests; the subclass only adds call accounting
+            .request(InstrumentedRequest(connection_pool_size=256))
             .post_init(self._post_init)
+            .post_stop(self._post_stop)
             .post_shutdown(self._post_shutdown)
-            .build()
         )
+        if shared_state is not None:
+            # updates arrive from the shard supervisor, not from our own poller
+            builder = builder.updater(None)
+        self.update_processor: PerUserUpdateProcessor | None = None
+        if config.CONCURRENT_UPDATES > 0:
+            self.update_processor = PerUserUpdateProcessor(
+                config.CONCURRENT_UPDATES,
+                max_pending=config.CONCURRENT_UPDATES_MAX_PENDING,
+            )
+            builder = builder.concurrent_updates(self.update_processor)
+        self.application = builder.build()
+        self._add_memory_sources()
 
     @staticmethod
     def _normalize_admin_phone(phone_raw: str) -> str | None:
@@ -111,19 +234,120 @@ class ShiftBotApp:
         except Exception as exc:
             self.logger.warning("OC_API_HEALTH_CHECK_FAILED error=%s", exc)
 
-        self.admin_chat_ids = await self.oc_client.get_admin_chat_ids()
+        if self.shared_state is not None:
+            app.bot_data[SHARED_COOLDOWNS_KEY] = self.shared_state.cooldowns
+            # resolved once by the supervisor; the directory refreshes it from here on
+            self.admin_directory.publish(self.shared_state.admin_chat_ids)
+        else:
+            await self.admin_directory.refresh()
+        self.admin_chat_ids = self.admin_directory.chat_ids
         if not self.admin_chat_ids:
             self.logger.warning("ADMIN_CHAT_IDS_EMPTY")
-        app.bot_data["admin_chat_ids"] = self.admin_chat_ids
+        self.admin_directory.attach(app.bot_data)
+        app.bot_data["admin_directory"] = self.admin_directory
         app.bot_data["oc_client"] = self.oc_client
+        app.bot_data["memory_inspector"] = self.memory_inspector
         app.bot_data.setdefault(ADMIN_NOTIFY_COOLDOWN_KEY, {})
 
+        if LOOP_MONITOR.interval_sec > 0 and self.loop_monitor_task is None:
+            self.loop_monitor_task = spawn_detached(LOOP_MONITOR.run(), name="loop_monitor")
+        if self.side_effects is not None and self.side_effects_task is None:
+            self.side_effects_task = spawn_detached(self.side_effects.run(), name="side_effects")
+
+        if self.metrics_server is not None:
+            # the registry is process-wide; the collector lives only as long as this app runs
+            REGISTRY.add_collector(self._collect_metrics)
+            try:
+                await self.metrics_server.start()
+            except OSError as exc:
+                self.logger.warning("METRICS_SERVER_START_FAILED error=%s", exc)
+
+    def _add_memory_sources(self) -> None:
+        # the structures that grow with couriers and shifts; internals are read as-is on purpose
+        inspector = self.memory_inspector
+        # shared objects count toward the first source that reaches them: sessions hold
+        # references to the catalog's point list, so the catalog goes first
+        inspector.add_source("points_catalog", lambda: self.points_catalog.points)
+        inspector.add_source("staff_cache", lambda: self.staff_cache._cache)
+        inspector.add_source("sessions", lambda: list(self.session_store.values()))
+        if not is_shared_proxy(self.dead_soul_detector):
+            # a shared detector lives in the manager process: its memory is not ours to walk
+            inspector.add_source(
+                "dead_soul",
+                lambda: MemoryGroup(
+                    {
+                        "point_trackers": self.dead_soul_detector._point_trackers,
+                        "shift_to_staff": self.dead_soul_detector._shift_to_staff,
+                    }
+                ),
+            )
+        inspector.add_source(
+            "live_registry",
+            lambda: MemoryGroup({"shifts": LIVE_REGISTRY._shifts, "pair_states": LIVE_REGISTRY._pair_states}),
+        )
+        inspector.add_source("bot_data", lambda: MemoryGroup(dict(self.application.bot_data)))
+
+    def _collect_metrics(self) -> None:
+        sessions = list(self.session_store.values())
+        SESSIONS.set(len(sessions), state="total")
+        SESSIONS.set(sum(1 for session in sessions if session.active), state="active_shift")
+        if not is_shared_proxy(self.dead_soul_detector):
+            # a shared detector lives in the manager process; reading it here is blocking IPC
+            for kind, count in self.dead_soul_detector.tracker_counts().items():
+                DEAD_SOUL_TRACKERS.set(count, kind=kind)
+        QUEUE_DEPTH.set(self.application.update_queue.qsize(), queue="updates")
+        if self.update_processor is not None:
+            snapshot = self.update_processor.snapshot()
+            QUEUE_DEPTH.set(snapshot["pending"], queue="update_processor_pending")
+        if self.ping_journal is not None:
+            QUEUE_DEPTH.set(self.ping_journal.pending_bytes(), queue="ping_journal_bytes")
+        if self.side_effects is not None:
+            QUEUE_DEPTH.set(self.side_effects.pending, queue="side_effects")
+        export_request_stats(self.oc_client.stats)
+        export_call_accounting(ACCOUNTING)
+        if self.oc_client.limiter is not None:
+            export_limiter_stats(self.oc_client.limiter)
+
+    async def _post_stop(self, app: Application) -> None:
+        # runs before Application.shutdown(): the bot's HTTP client is still open for the last alerts
+        if self.side_effects_task is not None:
+            # let queued alerts go out, but do not hang the shutdown on them
+            self.side_effects.stop()
+            try:
+                await asyncio.wait_for(self.side_effects_task, timeout=config.SIDE_EFFECTS_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                self.logger.warning("SIDE_EFFECTS_SHUTDOWN_TIMEOUT pending=%s", self.side_effects.pending)
+            self.side_effects_task = None
+
     async def _post_shutdown(self, app: Application) -> None:
+        if self.loop_monitor_task is not None:
+            self.loop_monitor_task.cancel()
+            self.loop_monitor_task = None
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+            REGISTRY.remove_collector(self._collect_metrics)
+        if self.ping_journal is not None:
+            self.ping_journal.close()
         await self.oc_client.aclose()
+        if self.fleet_oc_client is not None:
+            await self.fleet_oc_client.aclose()
+
+    @staticmethod
+    def _build_fleet_oc_client(logger) -> OpenCartClient | None:
+        base_url = OpenCartClient._normalize_base_url(config.TEST_FLEET_OC_API_BASE)
+        if not base_url:
+            return None
+        if base_url == OpenCartClient._normalize_base_url(config.OC_API_BASE):
+            logger.warning("TEST_FLEET_DISABLED reason=staging_base_url_is_production base_url=%s", base_url)
+            return None
+        return OpenCartClient(base_url, config.TEST_FLEET_OC_API_KEY, logger)
+
+    def _with_budget(self, handler):
+        return with_deadline(handler, config.HANDLER_BUDGET_SEC, self.logger)
 
     def register_handlers(self, app: Application) -> None:
         app.add_handler(build_registration_handler(self.staff_service, self.oc_client, self.logger))
-        app.add_handler(build_cancel_handler())
+        app.add_handler(instrument_handler(build_cancel_handler()))
 
         for handler in build_shift_handlers(
             self.session_store,
@@ -131,8 +355,10 @@ class ShiftBotApp:
             self.oc_client,
             self.dead_soul_detector,
             self.logger,
+            points_catalog=self.points_catalog,
+            fleet_oc_client=self.fleet_oc_client,
         ):
-            app.add_handler(handler)
+            app.add_handler(instrument_handler(self._with_budget(with_request_context(handler))))
 
         for handler in build_location_handlers(
             self.session_store,
@@ -140,8 +366,32 @@ class ShiftBotApp:
             self.oc_client,
             self.dead_soul_detector,
             self.logger,
+            points_catalog=self.points_catalog,
+            ping_journal=self.ping_journal,
+            side_effects=self.side_effects,
         ):
-            app.add_handler(handler)
+            app.add_handler(instrument_handler(self._with_budget(with_request_context(handler))))
+
+        if self.ping_replayer is not None and app.job_queue is not None:
+            app.job_queue.run_repeating(
+                build_job_replay_ping_journal(self.ping_replayer, self.logger),
+                interval=config.PING_JOURNAL_REPLAY_EVERY_SEC,
+                first=config.PING_JOURNAL_REPLAY_EVERY_SEC,
+            )
+
+        if app.job_queue is not None:
+            app.job_queue.run_repeating(
+                build_job_refresh_admin_directory(self.admin_directory, self.logger),
+                interval=config.ADMIN_CHAT_IDS_RETRY_SEC,
+                first=config.ADMIN_CHAT_IDS_RETRY_SEC,
+            )
+
+        if app.job_queue is not None and config.MEMORY_REPORT_EVERY_SEC > 0:
+            app.job_queue.run_repeating(
+                build_job_memory_report(self.memory_inspector, self.logger),
+                interval=config.MEMORY_REPORT_EVERY_SEC,
+                first=config.MEMORY_REPORT_EVERY_SEC,
+            )
 
         if config.ENABLE_STALE_CHECK:
             if app.job_queue is None:
@@ -155,6 +405,25 @@ class ShiftBotApp:
                 first=config.STALE_CHECK_EVERY_SEC,
             )
 
+    async def serve_queue(self, source_queue) -> None:
+        """Process updates handed over by the shard supervisor until it sends ``None``."""
+        app = self.application
+        self.register_handlers(app)
+        loop = asyncio.get_running_loop()
+        async with app:
+            await self._post_init(app)
+            await app.start()
+            try:
+                while True:
+                    payload = await loop.run_in_executor(None, source_queue.get)
+                    if payload is None:
+                        break
+                    await app.update_queue.put(Update.de_json(payload, app.bot))
+            finally:
+                await app.stop()
+                await self._post_stop(app)
+                await self._post_shutdown(app)
+
     def run(self) -> None:
         self.register_handlers(self.application)
         print("Bot started (polling). Ctrl+C to stop.")
@@ -0,0 +1,201 @@
+"""Outbound call accounting: which handler made which OpenCart / Telegram calls.
+
+Every call is tagged with the handler and update_id of the current ``RequestContext``
+(``"background"`` for jobs and detached tasks). ``ACCOUNTING`` keeps per-handler counts,
+calls per update and latency; ``capture_calls`` and ``track_calls`` let tests assert
+budgets such as "a live-location edit makes at most N OpenCart calls".
+"""
+
+import contextlib
+import inspect
+import time
+from dataclasses import dataclass
+
+from telegram.request import HTTPXRequest
+
+from shiftbot import request_context
+from shiftbot.request_stats import LatencyHistogram
+
+TARGET_OPENCART = "opencart"
+TARGET_TELEGRAM = "telegram"
+BACKGROUND = "background"
+
+
+@dataclass(frozen=True)
+class CallRecord:
+    handler: str
+    update_id: int | None
+    target: str
+    op: str
+    latency_sec: float
+
+
+class TargetStats:
+    __slots__ = ("calls", "updates_with_calls", "max_per_update", "ops")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.updates_with_calls = 0
+        self.max_per_update = 0
+        self.ops: dict[str, LatencyHistogram] = {}
+
+
+class HandlerStats:
+    __slots__ = ("updates", "targets")
+
+    def __init__(self) -> None:
+        self.updates = 0
+        self.targets: dict[str, TargetStats] = {}
+
+    def target(self, name: str) -> TargetStats:
+        stats = self.targets.get(name)
+        if stats is None:
+            stats = self.targets[name] = TargetStats()
+        return stats
+
+
+class CallAccounting:
+    def __init__(self) -> None:
+        self.handlers: dict[str, HandlerStats] = {}
+        self._listeners: list = []
+
+    def handler(self, name: str) -> HandlerStats:
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        return stats
+
+    def observe(self, record: CallRecord) -> None:
+        target = self.handler(record.handler).target(record.target)
+        target.calls += 1
+        hist = target.ops.get(record.op)
+        if hist is None:
+            hist = target.ops[record.op] = LatencyHistogram()
+        hist.observe(record.latency_sec)
+        for listener in self._listeners:
+            listener(record)
+
+    def finish_update(self, context: request_context.RequestContext) -> None:
+        if context.handler is None:
+            return
+        stats = self.handler(context.handler)
+        stats.updates += 1
+        for name, count in context.calls.items():
+            target = stats.target(name)
+            target.updates_with_calls += 1
+            target.max_per_update = max(target.max_per_update, count)
+
+    def snapshot(self) -> dict:
+        result = {}
+        for name, stats in sorted(self.handlers.items()):
+            result[name] = {
+                "updates": stats.updates,
+                "targets": {
+                    target_name: {
+                        "calls": target.calls,
+                        "per_update_avg": target.calls / stats.updates if stats.updates else 0.0,
+                        "per_update_max": target.max_per_update,
+                        "ops": {op: hist.as_dict() for op, hist in sorted(target.ops.items())},
+                    }
+                    for target_name, target in sorted(stats.targets.items())
+                },
+            }
+        return result
+
+
+ACCOUNTING = CallAccounting()
+request_context.add_finish_hook(ACCOUNTING.finish_update)
+
+
+def record_call(target: str, op: str, latency_sec: float) -> None:
+    context = request_context.current()
+    if context is not None:
+        context.calls[target] = context.calls.get(target, 0) + 1
+        handler = context.handler or BACKGROUND
+        update_id = context.update_id
+    else:
+        handler = BACKGROUND
+        update_id = None
+    ACCOUNTING.observe(CallRecord(handler, update_id, target, op, latency_sec))
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """PTB request backend that records every Bot API call (send_message, edit_message_text, ...)."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            record_call(TARGET_TELEGRAM, url.rsplit("/", 1)[-1], time.perf_counter() - started)
+
+
+def format_call_accounting(snapshot: dict) -> str:
+    lines = ["Вызовы по обработчикам:"]
+    for handler, stats in snapshot.items():
+        parts = []
+        for target, target_stats in stats["targets"].items():
+            slowest = max(target_stats["ops"].items(), key=lambda item: item[1]["p95_sec"], default=None)
+            part = (
+                f"{target} {target_stats['calls']} "
+                f"(на апдейт ср {target_stats['per_update_avg']:.1f}, макс {target_stats['per_update_max']})"
+            )
+            if slowest is not None:
+                part += f", медленнее всех {slowest[0]} p95≤{slowest[1]['p95_sec'] * 1000:.0f}мс"
+            parts.append(part)
+        lines.append(f"{handler}: {stats['updates']} апд; " + ("; ".join(parts) or "без вызовов"))
+    return "\n".join(lines)
+
+
+class CallLog:
+    def __init__(self) -> None:
+        self.records: list[CallRecord] = []
+
+    def count(self, target: str | None = None, *, handler: str | None = None, update_id=None) -> int:
+        return sum(
+            1
+            for record in self.records
+            if (target is None or record.target == target)
+            and (handler is None or record.handler == handler)
+            and (update_id is None or record.update_id == update_id)
+        )
+
+    def ops(self, target: str | None = None) -> list[str]:
+        return [record.op for record in self.records if target is None or record.target == target]
+
+
+@contextlib.contextmanager
+def capture_calls():
+    """Collect every ``CallRecord`` made inside the block."""
+    log = CallLog()
+    listener = log.records.append
+    ACCOUNTING._listeners.append(listener)
+    try:
+        yield log
+    finally:
+        ACCOUNTING._listeners.remove(listener)
+
+
+def track_calls(obj, target: str, *methods: str):
+    """Make a test double report its coroutine methods via ``record_call``.
+
+    Without ``methods`` every public coroutine method is tracked. Returns ``obj``.
+    """
+    names = methods or [
+        name for name in dir(obj) if not name.startswith("_") and inspect.iscoroutinefunction(getattr(obj, name))
+    ]
+    for name in names:
+        setattr(obj, name, _tracked(getattr(obj, name), target, name))
+    return obj
+
+
+def _tracked(method, target: str, op: str):
+    async def tracked(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            record_call(target, op, time.perf_counter() - started)
+
+    tracked.__name__ = op
+    return tracked
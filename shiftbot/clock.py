@@ -0,0 +1,53 @@
+"""Wall clock shared by jobs, handlers, caches and alert cooldowns.
+
+Code that stores or compares timestamps calls ``clock.now()`` instead of ``time.time()``.
+Tests and the virtual-time simulator swap the source with ``use_clock(VirtualClock())``,
+so stale detection and cooldowns can be driven through hours without real sleeps.
+"""
+
+import contextlib
+import time
+
+_source = time.time
+
+
+def now() -> float:
+    return _source()
+
+
+def set_clock(source) -> object:
+    """Install ``source`` (a callable returning epoch seconds); returns the previous one."""
+    global _source
+    previous = _source
+    _source = source
+    return previous
+
+
+@contextlib.contextmanager
+def use_clock(source):
+    previous = set_clock(source)
+    try:
+        yield source
+    finally:
+        set_clock(previous)
+
+
+class VirtualClock:
+    """Clock that only moves when told to."""
+
+    __slots__ = ("ts",)
+
+    def __init__(self, start_ts: float = 1_700_000_000.0) -> None:
+        self.ts = float(start_ts)
+
+    def __call__(self) -> float:
+        return self.ts
+
+    def advance(self, seconds: float) -> float:
+        self.ts += seconds
+        return self.ts
+
+    def advance_to(self, ts: float) -> float:
+        if ts > self.ts:
+            self.ts = ts
+        return self.ts
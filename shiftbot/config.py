@@ -52,11 +52,28 @@ def _parse_admin_chat_ids(raw: str) -> list[int]:
     return sorted(set(chat_ids))
 
 
+def _parse_event_rates(raw: str) -> dict[str, float]:
+    rates: dict[str, float] = {}
+    for item in raw.split(","):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            rates[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return rates
+
+
 ADMIN_PHONE = os.getenv("ADMIN_PHONE", "89033262408")
 ADMIN_PHONES = _parse_admin_phones(os.getenv("ADMIN_PHONES", ADMIN_PHONE))
 ADMIN_CHAT_IDS = _parse_admin_chat_ids(os.getenv("ADMIN_CHAT_IDS", ""))
 # Жёсткий админ для теста
 ADMIN_FORCE_CHAT_IDS = _parse_admin_chat_ids(os.getenv("ADMIN_FORCE_CHAT_IDS", "783143356"))
+# Список админов из API: раз в ADMIN_CHAT_IDS_TTL_SEC фоновое обновление (ETag/304),
+# после ошибки — повтор через ADMIN_CHAT_IDS_RETRY_SEC; уведомления не ждут обновления.
+ADMIN_CHAT_IDS_TTL_SEC = int(os.getenv("ADMIN_CHAT_IDS_TTL_SEC", "600"))
+ADMIN_CHAT_IDS_RETRY_SEC = int(os.getenv("ADMIN_CHAT_IDS_RETRY_SEC", "30"))
 # Подозрение на "мёртвые души": админ-алерт только после 5 подряд совпадений.
 DEAD_SOUL_STREAK = int(os.getenv("DEAD_SOUL_STREAK", "5"))
 DEAD_SOUL_BUCKET_SEC = int(os.getenv("DEAD_SOUL_BUCKET_SEC", "10"))
@@ -83,10 +100,88 @@ ENABLE_STALE_CHECK = os.getenv("ENABLE_STALE_CHECK", "1") not in {"0", "false",
 STALE_CHECK_EVERY_SEC = int(os.getenv("STALE_CHECK_EVERY_SEC", "30"))
 STALE_AFTER_SEC = int(os.getenv("STALE_AFTER_SEC", "90"))
 STALE_NOTIFY_COOLDOWN_SEC = int(os.getenv("STALE_NOTIFY_COOLDOWN_SEC", "180"))
+# 1 — все пропавшие за тик смены уходят в один запрос violation_tick_many (с откатом на поштучные).
+VIOLATION_TICK_BATCH = os.getenv("VIOLATION_TICK_BATCH", "1") not in {"0", "false", "False"}
 ADMIN_NOTIFY_COOLDOWN_SEC = int(os.getenv("ADMIN_NOTIFY_COOLDOWN_SEC", "300"))
 PING_NOTIFY_EVERY_SEC = int(os.getenv("PING_NOTIFY_EVERY_SEC", "15"))
 
 STAFF_CACHE_TTL_SEC = int(os.getenv("STAFF_CACHE_TTL_SEC", "30"))
+POINTS_CACHE_TTL_SEC = int(os.getenv("POINTS_CACHE_TTL_SEC", "300"))
+POINT_SUGGESTIONS = int(os.getenv("POINT_SUGGESTIONS", "3"))
+POINT_SUGGEST_LOCATION_MAX_AGE_SEC = int(os.getenv("POINT_SUGGEST_LOCATION_MAX_AGE_SEC", "120"))
+
+# 0 — обработка апдейтов строго последовательно (как раньше).
+# >0 — апдейты разных пользователей параллельно, одного пользователя — по очереди.
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "0"))
+CONCURRENT_UPDATES_MAX_PENDING = int(os.getenv("CONCURRENT_UPDATES_MAX_PENDING", "512"))
+
+# >1 — supervisor-режим: один поллер и N процессов-воркеров, апдейты по user_id % N.
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "1"))
+SHARD_POLL_TIMEOUT_SEC = int(os.getenv("SHARD_POLL_TIMEOUT_SEC", "30"))
+# Сколько раз перезапускать упавший воркер шарда, прежде чем остановить supervisor.
+SHARD_WORKER_MAX_RESTARTS = int(os.getenv("SHARD_WORKER_MAX_RESTARTS", "5"))
+
+# Журнал пингов, не доставленных в OpenCart (API недоступен); пустое значение — журнал выключен.
+PING_JOURNAL_DIR = os.getenv("PING_JOURNAL_DIR", "")
+PING_JOURNAL_SEGMENT_MAX_BYTES = int(os.getenv("PING_JOURNAL_SEGMENT_MAX_BYTES", str(4 * 1024 * 1024)))
+PING_JOURNAL_FSYNC_EVERY = int(os.getenv("PING_JOURNAL_FSYNC_EVERY", "32"))
+PING_JOURNAL_REPLAY_EVERY_SEC = int(os.getenv("PING_JOURNAL_REPLAY_EVERY_SEC", "30"))
+PING_JOURNAL_REPLAY_RATE = float(os.getenv("PING_JOURNAL_REPLAY_RATE", "5"))
+# Поле ping_add, из которого сервер берёт время пинга (unix-секунды). Без него досылка выключена:
+# иначе сервер проставит старым координатам время досылки и испортит трек.
+PING_JOURNAL_TIME_FIELD = os.getenv("PING_JOURNAL_TIME_FIELD", "")
+# Prometheus /metrics; 0 — выключено. В supervisor-режиме воркер i слушает METRICS_PORT + i.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Логи: text или json. Прореживание INFO/DEBUG по имени события:
+# LOG_SAMPLE="LOCATION_UPDATE=0.1,API_REQUEST=0.05" — доля сохраняемых строк,
+# LOG_RATE_LIMIT="DEAD_SOUL_CHECK=5" — не больше N строк в секунду. WARNING и выше не режутся.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE = _parse_event_rates(os.getenv("LOG_SAMPLE", ""))
+LOG_RATE_LIMIT = _parse_event_rates(os.getenv("LOG_RATE_LIMIT", ""))
+# Бюджет времени на обработку одного апдейта (с запросами к API); 0 — без ограничения.
+HANDLER_BUDGET_SEC = float(os.getenv("HANDLER_BUDGET_SEC", "25"))
+# Отдельные пулы соединений к OpenCart: interactive (смены, регистрация), ping, bulk (stale-джоба, служебное).
+OC_LANE_INTERACTIVE = int(os.getenv("OC_LANE_INTERACTIVE", "10"))
+OC_LANE_PING = int(os.getenv("OC_LANE_PING", "20"))
+OC_LANE_BULK = int(os.getenv("OC_LANE_BULK", "5"))
+# Адаптивное окно одновременных запросов к OpenCart (AIMD); OC_LIMIT_MAX=0 — выключено.
+OC_LIMIT_INITIAL = int(os.getenv("OC_LIMIT_INITIAL", "16"))
+OC_LIMIT_MIN = int(os.getenv("OC_LIMIT_MIN", "2"))
+OC_LIMIT_MAX = int(os.getenv("OC_LIMIT_MAX", "35"))
+OC_LIMIT_LATENCY_TARGET_SEC = float(os.getenv("OC_LIMIT_LATENCY_TARGET_SEC", "1.5"))
 HTTP_TIMEOUT_SEC = int(os.getenv("HTTP_TIMEOUT_SEC", "10"))
+# /test_ping_start fleet: потолок числа виртуальных смен, общий лимит пингов в секунду, период сводки в чат.
+TEST_FLEET_MAX_SHIFTS = int(os.getenv("TEST_FLEET_MAX_SHIFTS", "2000"))
+TEST_FLEET_RATE_PER_SEC = float(os.getenv("TEST_FLEET_RATE_PER_SEC", "20"))
+TEST_FLEET_REPORT_EVERY_SEC = int(os.getenv("TEST_FLEET_REPORT_EVERY_SEC", "60"))
+# Флот шлёт пинги только в отдельный стенд OpenCart; пока TEST_FLEET_OC_API_BASE не задан
+# (или совпадает с OC_API_BASE), команда отключена. Ключ по умолчанию — OC_API_KEY.
+TEST_FLEET_OC_API_BASE = os.getenv("TEST_FLEET_OC_API_BASE", "")
+TEST_FLEET_OC_API_KEY = os.getenv("TEST_FLEET_OC_API_KEY", "") or OC_API_KEY
+# Лаг event loop: замер раз в LOOP_LAG_SAMPLE_SEC. При лаге от LOOP_LAG_SHED_SEC бот перестаёт делать
+# необязательную работу (уведомления коллег, доп. запрос для алерта «мёртвых душ», DEBUG-логи),
+# пока лаг не опустится до LOOP_LAG_RECOVER_SEC. LOOP_LAG_SHED_SEC=0 — только замер, без сброса нагрузки.
+LOOP_LAG_SAMPLE_SEC = float(os.getenv("LOOP_LAG_SAMPLE_SEC", "0.5"))
+LOOP_LAG_SHED_SEC = float(os.getenv("LOOP_LAG_SHED_SEC", "0.5"))
+LOOP_LAG_RECOVER_SEC = float(os.getenv("LOOP_LAG_RECOVER_SEC", "0.1"))
+# Алерты после пинга (сообщения курьеру и админам) уходят в фон: не больше SIDE_EFFECTS_CONCURRENCY задач
+# одновременно, каждая не дольше SIDE_EFFECTS_TIMEOUT_SEC. Если в очереди уже SIDE_EFFECTS_MAX_PENDING задач,
+# новая выполняется прямо в обработчике. SIDE_EFFECTS_CONCURRENCY=0 — всё в обработчике, как раньше.
+SIDE_EFFECTS_CONCURRENCY = int(os.getenv("SIDE_EFFECTS_CONCURRENCY", "16"))
+SIDE_EFFECTS_TIMEOUT_SEC = float(os.getenv("SIDE_EFFECTS_TIMEOUT_SEC", "30"))
+SIDE_EFFECTS_MAX_PENDING = int(os.getenv("SIDE_EFFECTS_MAX_PENDING", "1000"))
+# /profile <сек>: встроенный сэмплирующий профайлер; файлы collapsed-stack пишутся в PROFILE_DIR.
+# Сэмпл обходит все asyncio-задачи (~1 мс на 300 задач), поэтому интервал по умолчанию 20 мс.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SEC = int(os.getenv("PROFILE_MAX_SEC", "120"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "20"))
+# Отчёт о памяти по структурам (сессии, трекеры, кэши, bot_data) раз в MEMORY_REPORT_EVERY_SEC; 0 — выключено
+# (по умолчанию: обход идёт в event loop). /memory работает всегда.
+# Весь отчёт ограничен MEMORY_REPORT_MAX_OBJECTS объектами. MEMORY_TRACE_FRAMES — глубина стека tracemalloc.
+MEMORY_REPORT_EVERY_SEC = int(os.getenv("MEMORY_REPORT_EVERY_SEC", "0"))
+MEMORY_REPORT_MAX_OBJECTS = int(os.getenv("MEMORY_REPORT_MAX_OBJECTS", "50000"))
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
 
 REG_NAME, REG_CONTACT, REG_TYPE = range(3)
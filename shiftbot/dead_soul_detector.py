@@ -28,6 +28,13 @@ class DeadSoulDetector:
         self._point_trackers: dict[int, PointTracker] = {}
         self._shift_to_staff: dict[int, int] = {}
 
+    def tracker_counts(self) -> dict[str, int]:
+        return {
+            "points": len(self._point_trackers),
+            "pairs": sum(len(tracker.pairs) for tracker in self._point_trackers.values()),
+            "shifts": len(self._shift_to_staff),
+        }
+
     @staticmethod
     def pair_key(staff_a: int, staff_b: int) -> tuple[int, int]:
         left, right = sorted((int(staff_a), int(staff_b)))
@@ -0,0 +1,122 @@
+"""Time budget of the current unit of work, carried in a ContextVar.
+
+A handler sets its budget on entry; ``OpenCartClient._request`` reads ``remaining()`` to
+trim timeouts and to skip retries that cannot finish in time. Tasks that must outlive the
+handler (e.g. the test ping loop) are started with ``spawn_detached`` so they do not
+inherit its deadline, nor its request context: their calls are accounted as background.
+Calls that commit state on the server (``shift_start``, ``shift_end``) run inside
+``committing()``, which takes them out of the budget.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+
+from shiftbot import request_context
+from shiftbot.metrics import REGISTRY
+
+DEADLINE_EXCEEDED_TOTAL = REGISTRY.counter(
+    "shiftbot_deadline_exceeded_total", "Work stopped because its time budget ran out.", ("scope",)
+)
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("shiftbot_deadline", default=None)
+_handler_timeout: contextvars.ContextVar[asyncio.Timeout | None] = contextvars.ContextVar(
+    "shiftbot_handler_timeout", default=None
+)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget, or ``None`` when no budget is set."""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return None
+    return deadline_at - time.monotonic()
+
+
+@contextlib.contextmanager
+def budget(seconds: float):
+    """Narrow the current deadline to at most ``seconds`` from now."""
+    deadline_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and current < deadline_at:
+        deadline_at = current
+    token = _deadline.set(deadline_at)
+    try:
+        yield deadline_at
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def committing():
+    """Run a call whose effect must not be cut in half outside the handler's budget.
+
+    Once ``shift_start``/``shift_end`` may have committed on the server, the handler has to
+    see the reply and update the session. Inside the block the request uses its plain
+    timeouts and the handler's timeout is suspended. A budget that ran out meanwhile
+    cancels the handler at its first await after the block.
+    """
+    timeout_cm = _handler_timeout.get()
+    when = timeout_cm.when() if timeout_cm is not None else None
+    if when is not None:
+        timeout_cm.reschedule(None)
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+        if when is not None:
+            timeout_cm.reschedule(when)
+
+
+def detached_context() -> contextvars.Context:
+    """Copy of the caller's context with the deadline and the request context cleared."""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    context.run(_handler_timeout.set, None)
+    context.run(request_context.clear)
+    return context
+
+
+def spawn_detached(coro, **kwargs) -> asyncio.Task:
+    """``asyncio.create_task`` without the caller's deadline."""
+    return asyncio.create_task(coro, context=detached_context(), **kwargs)
+
+
+def _is_interactive(update) -> bool:
+    # live-location edits arrive as edited_message every few seconds; nobody is waiting for a reply
+    return getattr(update, "message", None) is not None or getattr(update, "callback_query", None) is not None
+
+
+def with_deadline(handler, budget_sec: float, logger):
+    """Run a PTB handler's callback under a time budget; overrunning work is cancelled."""
+    callback = getattr(handler, "callback", None)
+    if callback is None or budget_sec <= 0:
+        return handler
+    name = getattr(callback, "__name__", "callback")
+
+    async def callback_with_deadline(update, context):
+        with budget(budget_sec):
+            timeout_cm = asyncio.timeout(budget_sec)
+            token = _handler_timeout.set(timeout_cm)
+            try:
+                async with timeout_cm:
+                    return await callback(update, context)
+            except TimeoutError:
+                if not timeout_cm.expired():
+                    # raised by the callback itself, not by our budget
+                    raise
+                DEADLINE_EXCEEDED_TOTAL.inc(scope=f"handler:{name}")
+                logger.warning("HANDLER_DEADLINE_EXCEEDED handler=%s budget_sec=%s", name, budget_sec)
+                message = getattr(update, "effective_message", None)
+                if message is not None and _is_interactive(update):
+                    with contextlib.suppress(Exception):
+                        await message.reply_text("Временная ошибка связи.")
+                return None
+            finally:
+                _handler_timeout.reset(token)
+
+    callback_with_deadline.__name__ = name
+    handler.callback = callback_with_deadline
+    return handler
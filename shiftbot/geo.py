@@ -1,8 +1,16 @@
+import heapq
 import math
 
+try:
+    import numpy as _np
+except ImportError:  # pragma: no cover - numpy is optional
+    _np = None
+
+EARTH_RADIUS_M = 6371000.0
+
 
 def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    radius = 6371000.0
+    radius = EARTH_RADIUS_M
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
@@ -14,3 +22,200 @@ def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     )
     c = 2.0 * math.atan2(math.sqrt(a), math.sqrt(1.0 - a))
     return radius * c
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class GeoArray:
+    """Points prepared once for repeated distance queries.
+
+    Radians and cos(lat) of every point are computed at construction. With NumPy the
+    distances of one fix to all points are a single vectorized haversine, otherwise a
+    tight loop over the precomputed values.
+    """
+
+    def __init__(self, lats, lons, *, use_numpy: bool | None = None) -> None:
+        if len(lats) != len(lons):
+            raise ValueError("lats and lons must have the same length")
+        self.use_numpy = (_np is not None) if use_numpy is None else (use_numpy and _np is not None)
+        if self.use_numpy:
+            self._phi = _np.radians(_np.asarray(lats, dtype=float))
+            self._lam = _np.radians(_np.asarray(lons, dtype=float))
+            self._cos_phi = _np.cos(self._phi)
+        else:
+            self._phi = [math.radians(lat) for lat in lats]
+            self._lam = [math.radians(lon) for lon in lons]
+            self._cos_phi = [math.cos(phi) for phi in self._phi]
+
+    def __len__(self) -> int:
+        return len(self._phi)
+
+    def distances_m(self, lat: float, lon: float) -> list[float]:
+        distances = self._distances(lat, lon)
+        return distances.tolist() if self.use_numpy else distances
+
+    def _distances(self, lat: float, lon: float):
+        phi = math.radians(lat)
+        lam = math.radians(lon)
+        cos_phi = math.cos(phi)
+        if self.use_numpy:
+            a = _np.sin((self._phi - phi) / 2.0) ** 2 + cos_phi * self._cos_phi * _np.sin((self._lam - lam) / 2.0) ** 2
+            return 2.0 * EARTH_RADIUS_M * _np.arcsin(_np.sqrt(_np.minimum(a, 1.0)))
+
+        sin = math.sin
+        result = []
+        for phi2, lam2, cos_phi2 in zip(self._phi, self._lam, self._cos_phi):
+            a = sin((phi2 - phi) / 2.0) ** 2 + cos_phi * cos_phi2 * sin((lam2 - lam) / 2.0) ** 2
+            result.append(2.0 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0))))
+        return result
+
+    def distance_matrix_m(self, fixes: list[tuple[float, float]]) -> list[list[float]]:
+        """Distances of many fixes to all points: one row per fix."""
+        return [self.distances_m(lat, lon) for lat, lon in fixes]
+
+
+def haversine_many_m(lat: float, lon: float, lats, lons) -> list[float]:
+    return GeoArray(lats, lons).distances_m(lat, lon)
+
+
+class PointsGeo:
+    """Nearest-k and within-radius queries over the points catalog.
+
+    Points without usable ``geo_lat``/``geo_lon`` are skipped; ``geo_radius_m`` falls back
+    to ``default_radius_m``.
+    """
+
+    def __init__(self, points: list[dict], *, default_radius_m: float, use_numpy: bool | None = None) -> None:
+        self.points: list[dict] = []
+        self.radii: list[float] = []
+        lats: list[float] = []
+        lons: list[float] = []
+        for point in points:
+            lat = _as_float(point.get("geo_lat"))
+            lon = _as_float(point.get("geo_lon"))
+            if lat is None or lon is None:
+                continue
+            self.points.append(point)
+            lats.append(lat)
+            lons.append(lon)
+            self.radii.append(_as_float(point.get("geo_radius_m")) or float(default_radius_m))
+        self.array = GeoArray(lats, lons, use_numpy=use_numpy)
+        if self.array.use_numpy:
+            self.radii = _np.asarray(self.radii, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple[dict, float]]:
+        if k <= 0 or not self.points:
+            return []
+        distances = self.array._distances(lat, lon)
+        if self.array.use_numpy:
+            if k < len(distances):
+                best = _np.argpartition(distances, k)[:k]
+                best = best[_np.argsort(distances[best])]
+            else:
+                best = _np.argsort(distances)
+            return [(self.points[idx], float(distances[idx])) for idx in best.tolist()]
+        best = heapq.nsmallest(k, range(len(distances)), key=distances.__getitem__)
+        return [(self.points[idx], distances[idx]) for idx in best]
+
+    def within_radius(self, lat: float, lon: float, radius_m: float | None = None) -> list[tuple[dict, float]]:
+        """Points whose zone contains the fix (or within ``radius_m`` if given), nearest first."""
+        distances = self.array._distances(lat, lon)
+        if self.array.use_numpy:
+            limit = radius_m if radius_m is not None else self.radii
+            idx = _np.nonzero(distances <= limit)[0]
+            idx = idx[_np.argsort(distances[idx])]
+            return [(self.points[i], float(distances[i])) for i in idx.tolist()]
+        hits = [
+            (self.points[idx], dist)
+            for idx, dist in enumerate(distances)
+            if dist <= (radius_m if radius_m is not None else self.radii[idx])
+        ]
+        hits.sort(key=lambda item: item[1])
+        return hits
+
+
+METERS_PER_DEG = EARTH_RADIUS_M * math.pi / 180.0
+GEOFENCE_APPROX_MAX_M = 5000.0
+
+
+class Geofence:
+    """A point's zone prepared for cheap per-ping checks.
+
+    Distances use the equirectangular projection around the zone centre with cos(lat)
+    computed once. Against haversine on the same sphere, for a fix at distance ``d`` the
+    absolute error is bounded by ``d * (tan|lat0| * d / R + (d / R) ** 2)``; for d up to
+    twice the radius that is the ``boundary_band_m`` below (millimetres for city-sized
+    zones, floored at 0.5 m). Fixes outside the bounding box are OUT without any
+    arithmetic beyond two comparisons; only fixes inside the band around the boundary are
+    re-checked with full haversine.
+    """
+
+    __slots__ = (
+        "lat",
+        "lon",
+        "radius_m",
+        "m_per_deg_lon",
+        "min_lat",
+        "max_lat",
+        "min_lon",
+        "max_lon",
+        "boundary_band_m",
+    )
+
+    def __init__(self, lat: float, lon: float, radius_m: float) -> None:
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.radius_m = float(radius_m)
+        cos_lat = math.cos(math.radians(self.lat))
+        self.m_per_deg_lon = METERS_PER_DEG * cos_lat
+
+        reach_m = 2.0 * self.radius_m
+        ratio = reach_m / EARTH_RADIUS_M
+        tan_lat = abs(math.tan(math.radians(self.lat)))
+        self.boundary_band_m = max(reach_m * (tan_lat * ratio + ratio * ratio), 0.5)
+
+        box_m = self.radius_m + self.boundary_band_m
+        d_lat = box_m / METERS_PER_DEG
+        d_lon = box_m / max(self.m_per_deg_lon, 1e-6)
+        self.min_lat = self.lat - d_lat
+        self.max_lat = self.lat + d_lat
+        self.min_lon = self.lon - d_lon
+        self.max_lon = self.lon + d_lon
+
+    def matches(self, lat: float, lon: float, radius_m: float) -> bool:
+        return self.lat == lat and self.lon == lon and self.radius_m == radius_m
+
+    def approx_distance_m(self, lat: float, lon: float) -> float:
+        dy = (lat - self.lat) * METERS_PER_DEG
+        dx = (lon - self.lon) * self.m_per_deg_lon
+        return math.sqrt(dx * dx + dy * dy)
+
+    def distance_m(self, lat: float, lon: float) -> float:
+        """Equirectangular distance, switching to haversine when the fix is far from the zone."""
+        dist = self.approx_distance_m(lat, lon)
+        if dist > GEOFENCE_APPROX_MAX_M:
+            return haversine_m(lat, lon, self.lat, self.lon)
+        return dist
+
+    def measure(self, lat: float, lon: float) -> tuple[float, bool]:
+        """``(distance_m, inside)`` from one distance computation, for callers that need both."""
+        dist = self.approx_distance_m(lat, lon)
+        if dist > GEOFENCE_APPROX_MAX_M or abs(dist - self.radius_m) <= self.boundary_band_m:
+            dist = haversine_m(lat, lon, self.lat, self.lon)
+        return dist, dist <= self.radius_m
+
+    def contains(self, lat: float, lon: float) -> bool:
+        if lat < self.min_lat or lat > self.max_lat or lon < self.min_lon or lon > self.max_lon:
+            return False
+        dist = self.approx_distance_m(lat, lon)
+        if abs(dist - self.radius_m) <= self.boundary_band_m:
+            return haversine_m(lat, lon, self.lat, self.lon) <= self.radius_m
+        return dist <= self.radius_m
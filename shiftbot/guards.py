@@ -1,6 +1,9 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from shiftbot import request_context
+from shiftbot.metrics import CACHE_LOOKUPS_TOTAL
+
 
 def inactive_staff_text(staff: dict) -> str:
     status = (staff.get("status") or "").strip().lower()
@@ -11,6 +14,16 @@ def inactive_staff_text(staff: dict) -> str:
     return "Аккаунт заблокирован/заморожен, обратитесь к администратору."
 
 
+def is_admin_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """True when the update comes from one of the admin chats in ``bot_data``."""
+    admin_chat_ids = set(context.application.bot_data.get("admin_chat_ids") or [])
+    chat = update.effective_chat
+    user = update.effective_user
+    return bool(admin_chat_ids) and (
+        (chat is not None and chat.id in admin_chat_ids) or (user is not None and user.id in admin_chat_ids)
+    )
+
+
 class StaffService:
     def __init__(self, client, cache) -> None:
         self.client = client
@@ -19,6 +32,7 @@ class StaffService:
     async def get_staff(self, telegram_user_id: int, *, force_refresh: bool = False):
         if not force_refresh:
             hit, cached = self.cache.get(telegram_user_id)
+            CACHE_LOOKUPS_TOTAL.inc(cache="staff", result="hit" if hit else "miss")
             if hit:
                 return cached
         staff = await self.client.get_staff(telegram_user_id)
@@ -65,7 +79,10 @@ async def get_staff_or_reply(
         return None
 
     try:
-        staff = await staff_service.get_staff(user.id)
+        staff = await request_context.memoize(
+            (request_context.STAFF, user.id),
+            lambda: staff_service.get_staff(user.id),
+        )
     except RuntimeError:
         if update.effective_message:
             await update.effective_message.reply_text("Временная ошибка связи.")
@@ -1,14 +1,19 @@
-import time
+import asyncio
+import copy
 import logging
 from datetime import datetime
+from functools import partial
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackQueryHandler, ContextTypes, MessageHandler, filters
 
-from shiftbot import config
-from shiftbot.geo import haversine_m
-from shiftbot.handlers_shift import active_shift_keyboard, main_menu_keyboard
+from shiftbot import clock, config, request_context
+from shiftbot.deadline import committing
+from shiftbot.geo import Geofence, PointsGeo
+from shiftbot.handlers_shift import active_shift_keyboard, main_menu_keyboard, point_suggestions_keyboard
 from shiftbot.live_registry import LIVE_REGISTRY
+from shiftbot.loop_monitor import LOOP_MONITOR
+from shiftbot.metrics import ADMIN_ALERTS_TOTAL, PINGS_TOTAL, PINGS_UNDELIVERED_TOTAL
 from shiftbot.models import (
     MODE_AWAITING_LOCATION,
     MODE_CHOOSE_POINT,
@@ -20,9 +25,13 @@ from shiftbot.models import (
 )
 from shiftbot.opencart_client import ApiUnavailableError
 from shiftbot.ping_alerts import DEAD_SOUL_RECENT_ALERTS_KEY, process_ping_alerts
+from shiftbot.ping_journal import ping_record
+from shiftbot.shared_state import call_shared, claim_shared_cooldown
 from shiftbot.violation_alerts import maybe_send_admin_notify_from_decision
 from shiftbot.admin_notify import notify_admins
 
+geo_gate_logger = logging.getLogger("geo_gate")
+
 UNKNOWN_ACC_STATE_KEY = "unknown_acc_state_by_shift"
 UNKNOWN_PINGS_PER_ROUND = 3
 UNKNOWN_MAX_ROUNDS = 2
@@ -63,7 +72,16 @@ def _reset_unknown_acc_state(app, shift_id: int | None) -> None:
         state["auto_end_sent"] = False
 
 
-def build_location_handlers(session_store, staff_service, oc_client, dead_soul_detector, logger):
+def build_location_handlers(
+    session_store,
+    staff_service,
+    oc_client,
+    dead_soul_detector,
+    logger,
+    points_catalog=None,
+    ping_journal=None,
+    side_effects=None,
+):
     role_map = {
         "cashier": "cashier",
         "baker": "baker",
@@ -123,9 +141,20 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         session.active_point_lat = None
         session.active_point_lon = None
         session.active_point_radius = None
+        session.active_geofence = None
         session.active_role = None
         session.active_staff_name = None
 
+    def active_geofence(session) -> Geofence | None:
+        if session.active_point_lat is None or session.active_point_lon is None:
+            return None
+        radius_m = session.active_point_radius or float(config.DEFAULT_RADIUS_M)
+        fence = session.active_geofence
+        if fence is None or not fence.matches(session.active_point_lat, session.active_point_lon, radius_m):
+            fence = Geofence(session.active_point_lat, session.active_point_lon, radius_m)
+            session.active_geofence = fence
+        return fence
+
     def sync_session_from_shift(session, shift: dict) -> None:
         shift_id = shift.get("shift_id") or shift.get("id")
         try:
@@ -149,19 +178,40 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         session.active_staff_name = shift.get("staff_name") or shift.get("full_name") or session.active_staff_name
 
     async def ensure_active_shift(session, staff_id: int, context: ContextTypes.DEFAULT_TYPE) -> dict | None:
-        shift = await oc_client.get_active_shift_by_staff(staff_id)
+        shift = await request_context.memoize(
+            (request_context.ACTIVE_SHIFT, staff_id),
+            lambda: oc_client.get_active_shift_by_staff(staff_id),
+        )
         if not isinstance(shift, dict):
             previous_shift_id = session.active_shift_id
             clear_active_shift(session)
             if previous_shift_id:
                 LIVE_REGISTRY.remove_shift(previous_shift_id)
-                dead_soul_detector.remove_shift(previous_shift_id)
+                await call_shared(dead_soul_detector.remove_shift, previous_shift_id)
                 _clear_unknown_acc_state(context.application, previous_shift_id)
             return None
 
         sync_session_from_shift(session, shift)
         return shift
 
+    async def run_side_effects(name: str, effects: list, *, key=None) -> None:
+        """Hand alerting to the background executor; without one, run it inline."""
+        if side_effects is None:
+            for effect in effects:
+                await effect()
+            return
+        await side_effects.submit(name, effects, key=key)
+
+    async def send_ping_alerts(context, response: dict, session, staff_id: int, staff_chat_id, shift_id) -> None:
+        await enrich_dead_soul_alert_payload(response, session, staff_id)
+        await process_ping_alerts(
+            response=response,
+            context=context,
+            staff_chat_id=staff_chat_id,
+            fallback_shift_id=shift_id,
+            logger=logger,
+        )
+
     async def handle_active_shift_monitoring(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
@@ -174,18 +224,19 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         if not session.active_shift_id:
             return
 
-        now = time.time()
+        now = clock.now()
         lat = location.latitude
         lon = location.longitude
         accuracy = getattr(location, "horizontal_accuracy", None)
-        point_lat = session.active_point_lat
-        point_lon = session.active_point_lon
-        if point_lat is not None and point_lon is not None:
-            dist_m = haversine_m(lat, lon, point_lat, point_lon)
-            radius_m = session.active_point_radius or float(config.DEFAULT_RADIUS_M)
+        fence = active_geofence(session)
+        if fence is not None:
+            dist_m, inside = fence.measure(lat, lon)
+            radius_m = fence.radius_m
+            local_status = STATUS_IN if inside else STATUS_OUT
         else:
             dist_m = None
             radius_m = None
+            local_status = STATUS_UNKNOWN
 
         session.last_ping_ts = now
         session.last_live_update_ts = now
@@ -208,38 +259,57 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
             )
         except ApiUnavailableError:
             logger.warning("PING_ADD_UNAVAILABLE shift_id=%s staff_id=%s", session.active_shift_id, staff_id)
+            if ping_journal is not None:
+                # file write and fsync stay off the event loop
+                await asyncio.to_thread(
+                    ping_journal.append,
+                    ping_record(
+                        shift_id=session.active_shift_id,
+                        staff_id=staff_id,
+                        lat=lat,
+                        lon=lon,
+                        acc=float(accuracy) if accuracy is not None else None,
+                        ts=now,
+                    ),
+                )
+                logger.info("PING_ADD_JOURNALED shift_id=%s staff_id=%s", session.active_shift_id, staff_id)
+            PINGS_UNDELIVERED_TOTAL.inc(outcome="journaled" if ping_journal is not None else "dropped")
             return
 
-        await enrich_dead_soul_alert_payload(response, session, staff_id)
-
-        await process_ping_alerts(
-            response=response,
-            context=context,
-            staff_chat_id=message.chat_id,
-            fallback_shift_id=session.active_shift_id,
-            logger=logger,
-        )
+        # everything below only updates state; messages go to ``effects`` and are sent after.
+        # The alert enrichment reads point/staff names from a copy: an auto-stop below clears the session.
+        effects = [
+            partial(
+                send_ping_alerts, context, response, copy.copy(session), staff_id, message.chat_id, session.active_shift_id
+            )
+        ]
 
-        status = str(response.get("status") or "").upper() or STATUS_UNKNOWN
+        # the server's status decides; the local fence only fills in a reply without one
+        status = str(response.get("status") or "").upper() or local_status
         out_streak = as_int(response.get("out_streak")) or 0
         out_rounds = as_int(response.get("out_violation_rounds")) or 0
         reason = str(response.get("reason") or "")
         is_unknown_acc = status == STATUS_UNKNOWN and reason == "acc_too_high"
 
         if not is_unknown_acc:
-            await maybe_send_admin_notify_from_decision(
-                context=context,
-                response=response,
-                shift_id=session.active_shift_id,
-                logger=logger,
-                staff_name=session.active_staff_name,
-                point_id=session.active_point_id,
-                last_ping_ts=session.last_ping_ts,
+            effects.append(
+                partial(
+                    maybe_send_admin_notify_from_decision,
+                    context=context,
+                    response=response,
+                    shift_id=session.active_shift_id,
+                    logger=logger,
+                    staff_name=session.active_staff_name,
+                    point_id=session.active_point_id,
+                    last_ping_ts=session.last_ping_ts,
+                )
             )
+        PINGS_TOTAL.inc(status=status)
         logger.info(
-            "PING_ADD shift_id=%s staff_id=%s -> status=%s reason=%s out_streak=%s rounds=%s",
+            "PING_ADD shift_id=%s staff_id=%s tg=%s -> status=%s reason=%s out_streak=%s rounds=%s",
             session.active_shift_id,
             staff_id,
+            session.user_id,
             status,
             reason,
             out_streak,
@@ -267,12 +337,21 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
                 d = dist_from_api if dist_from_api is not None else dist_m
                 r = radius_from_api if radius_from_api is not None else radius_m
                 if d is not None and r is not None:
-                    await message.reply_text(
-                        f"⚠️ Вы вне рабочей зоны (≈{d:.0f} м, радиус {r:.0f} м). Вернитесь на точку.",
-                        reply_markup=out_alert_keyboard(),
+                    effects.append(
+                        partial(
+                            message.reply_text,
+                            f"⚠️ Вы вне рабочей зоны (≈{d:.0f} м, радиус {r:.0f} м). Вернитесь на точку.",
+                            reply_markup=out_alert_keyboard(),
+                        )
                     )
                 else:
-                    await message.reply_text("⚠️ Вы вне рабочей зоны, вернитесь на точку.", reply_markup=out_alert_keyboard())
+                    effects.append(
+                        partial(
+                            message.reply_text,
+                            "⚠️ Вы вне рабочей зоны, вернитесь на точку.",
+                            reply_markup=out_alert_keyboard(),
+                        )
+                    )
 
             if out_rounds > session.last_out_violation_notified_round:
                 session.last_out_violation_notified_round = out_rounds
@@ -282,15 +361,16 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
                         "Ждём повторного нарушения.\n"
                         f"shift#{session.active_shift_id} staff#{staff_id} point#{session.active_point_id or '—'}"
                     )
-                    await notify_admins(context, admin_text, shift_id=session.active_shift_id)
+                    effects.append(partial(notify_admins, context, admin_text, shift_id=session.active_shift_id))
                 else:
                     # 2nd violation round — auto-stop the shift
                     shift_id_to_stop = session.active_shift_id
                     auto_stopped = False
                     try:
-                        stop_result = await oc_client.shift_end(
-                            {"shift_id": shift_id_to_stop, "end_reason": "auto_violation_out"}
-                        )
+                        with committing():
+                            stop_result = await oc_client.shift_end(
+                                {"shift_id": shift_id_to_stop, "end_reason": "auto_violation_out"}
+                            )
                         auto_stopped = not (stop_result.get("ok") is False and stop_result.get("error"))
                         logger.info(
                             "AUTO_STOP_SHIFT shift_id=%s reason=out_rounds=%s result=%s",
@@ -303,14 +383,17 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
 
                     if auto_stopped:
                         LIVE_REGISTRY.remove_shift(shift_id_to_stop)
-                        dead_soul_detector.remove_shift(shift_id_to_stop)
+                        await call_shared(dead_soul_detector.remove_shift, shift_id_to_stop)
                         _clear_unknown_acc_state(context.application, shift_id_to_stop)
                         session_store.clear_shift_state(session)
-                        await message.reply_text(
-                            "🔴 Ваша смена завершена автоматически.\n"
-                            "Вы долгое время находились вне рабочей зоны.\n"
-                            "Если это ошибка — обратитесь к администратору.",
-                            reply_markup=main_menu_keyboard(),
+                        effects.append(
+                            partial(
+                                message.reply_text,
+                                "🔴 Ваша смена завершена автоматически.\n"
+                                "Вы долгое время находились вне рабочей зоны.\n"
+                                "Если это ошибка — обратитесь к администратору.",
+                                reply_markup=main_menu_keyboard(),
+                            )
                         )
 
                     admin_text = (
@@ -319,7 +402,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
                         f"out_violation_rounds={out_rounds}\n"
                         + ("✅ Смена завершена автоматически." if auto_stopped else "❗ Автозавершение не удалось — требуется ручная проверка.")
                     )
-                    await notify_admins(context, admin_text, shift_id=shift_id_to_stop)
+                    effects.append(partial(notify_admins, context, admin_text, shift_id=shift_id_to_stop))
 
         if is_unknown_acc:
             unknown_state = _get_unknown_acc_state(context.application, session.active_shift_id)
@@ -332,24 +415,31 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
 
                 if unknown_state["unknown_rounds"] == 1:
                     action = "warn_staff_round_1"
-                    await message.reply_text(
-                        "⚠️ Локация определяется слишком неточно, пинги могут быть некорректны. "
-                        "Проверьте GPS/интернет."
+                    effects.append(
+                        partial(
+                            message.reply_text,
+                            "⚠️ Локация определяется слишком неточно, пинги могут быть некорректны. "
+                            "Проверьте GPS/интернет.",
+                        )
                     )
                 elif unknown_state["unknown_rounds"] >= UNKNOWN_MAX_ROUNDS and not unknown_state.get("auto_end_sent"):
                     unknown_state["auto_end_sent"] = True
                     action = "warn_staff_admin_and_auto_close"
-                    await message.reply_text(
-                        "⚠️ Локация по-прежнему определяется слишком неточно. "
-                        "Смена будет закрыта автоматически."
+                    effects.append(
+                        partial(
+                            message.reply_text,
+                            "⚠️ Локация по-прежнему определяется слишком неточно. "
+                            "Смена будет закрыта автоматически.",
+                        )
                     )
 
                     shift_id_to_stop = session.active_shift_id
                     auto_stopped = False
                     try:
-                        stop_result = await oc_client.shift_end(
-                            {"shift_id": shift_id_to_stop, "end_reason": "auto_end_unknown_acc_too_high"}
-                        )
+                        with committing():
+                            stop_result = await oc_client.shift_end(
+                                {"shift_id": shift_id_to_stop, "end_reason": "auto_end_unknown_acc_too_high"}
+                            )
                         auto_stopped = not (stop_result.get("ok") is False and stop_result.get("error"))
                         logger.info(
                             "AUTO_STOP_SHIFT shift_id=%s reason=unknown_acc_rounds=%s result=%s",
@@ -370,27 +460,34 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
                             else "❗ Автозавершение не удалось — требуется ручная проверка."
                         )
                     )
+                    ADMIN_ALERTS_TOTAL.inc(alert_type="admin_gps_unknown_round")
                     logger.info(
                         "ADMIN_ALERT_SENT shift_id=%s staff_id=%s alert_type=admin_gps_unknown_round round_num=%s",
                         shift_id_to_stop,
                         staff_id,
                         unknown_state["unknown_rounds"],
                     )
-                    await notify_admins(
-                        context,
-                        unknown_admin_text,
-                        shift_id=shift_id_to_stop,
-                        cooldown_key="unknown_warn",
+                    effects.append(
+                        partial(
+                            notify_admins,
+                            context,
+                            unknown_admin_text,
+                            shift_id=shift_id_to_stop,
+                            cooldown_key="unknown_warn",
+                        )
                     )
 
                     if auto_stopped:
                         LIVE_REGISTRY.remove_shift(shift_id_to_stop)
-                        dead_soul_detector.remove_shift(shift_id_to_stop)
+                        await call_shared(dead_soul_detector.remove_shift, shift_id_to_stop)
                         _clear_unknown_acc_state(context.application, shift_id_to_stop)
                         session_store.clear_shift_state(session)
-                        await message.reply_text(
-                            "🔴 Смена завершена автоматически: долгое время позиция определяется слишком неточно.",
-                            reply_markup=main_menu_keyboard(),
+                        effects.append(
+                            partial(
+                                message.reply_text,
+                                "🔴 Смена завершена автоматически: долгое время позиция определяется слишком неточно.",
+                                reply_markup=main_menu_keyboard(),
+                            )
                         )
             logger.info(
                 "GPS_UNKNOWN_UPDATE shift_id=%s staff_id=%s streak=%s rounds=%s action=%s",
@@ -419,7 +516,8 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
             lon,
             coord_key,
         )
-        alerts = dead_soul_detector.register_ping(
+        alerts = await call_shared(
+            dead_soul_detector.register_ping,
             shift_id=session.active_shift_id,
             staff_id=staff_id,
             point_id=point_id,
@@ -440,30 +538,55 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         if alerts:
             dead_soul_recent = context.application.bot_data.setdefault(DEAD_SOUL_RECENT_ALERTS_KEY, {})
             last_point_alert_ts = dead_soul_recent.get(point_id)
-            if isinstance(last_point_alert_ts, (int, float)) and (now - float(last_point_alert_ts)) < 600:
+            recently_alerted = isinstance(last_point_alert_ts, (int, float)) and (now - float(last_point_alert_ts)) < 600
+            if not recently_alerted:
+                # couriers of one point may be served by different shards
+                recently_alerted = not await claim_shared_cooldown(
+                    context.application.bot_data, (DEAD_SOUL_RECENT_ALERTS_KEY, point_id), now, 600
+                )
+            if recently_alerted:
                 logger.info("DEAD_SOUL_ALERT_SKIPPED point_id=%s reason=recent_admin_same_location_2", point_id)
-                return
-
-            point_label = session.active_point_name or (f"id={point_id}" if point_id is not None else "—")
-            pair_lines = []
-            for alert in alerts:
-                pair_lines.append(
-                    "- "
-                    f"staff_id={alert['staff_a']} (shift_id={alert.get('shift_a') or '—'}) "
-                    f"и staff_id={alert['staff_b']} (shift_id={alert.get('shift_b') or '—'})"
+            else:
+                point_label = session.active_point_name or (f"id={point_id}" if point_id is not None else "—")
+                pair_lines = []
+                for alert in alerts:
+                    pair_lines.append(
+                        "- "
+                        f"staff_id={alert['staff_a']} (shift_id={alert.get('shift_a') or '—'}) "
+                        f"и staff_id={alert['staff_b']} (shift_id={alert.get('shift_b') or '—'})"
+                    )
+                alert_text = (
+                    "Подозрительная активность по геолокации 🌐\n\n"
+                    f"Точка: {point_label} (id={point_id or '—'})\n\n"
+                    "Следующие пары сотрудников 5 раз подряд отправили ИДЕНТИЧНЫЕ координаты:\n"
+                    + "\n".join(pair_lines)
+                    + "\n\nВозможная причина: один телефон используется для нескольких аккаунтов."
                 )
-            alert_text = (
-                "Подозрительная активность по геолокации 🌐\n\n"
-                f"Точка: {point_label} (id={point_id or '—'})\n\n"
-                "Следующие пары сотрудников 5 раз подряд отправили ИДЕНТИЧНЫЕ координаты:\n"
-                + "\n".join(pair_lines)
-                + "\n\nВозможная причина: один телефон используется для нескольких аккаунтов."
-            )
-            logger.info("DEAD_SOUL_ALERT point_id=%s pairs=%s", point_id, pairs_for_log)
-            logger.info("ADMIN_ALERT_SENT alert_type=admin_same_location_5 point_id=%s pairs=%s", point_id, pairs_for_log)
-            await notify_admins(context, alert_text)
-            if point_id is not None:
-                dead_soul_recent[point_id] = now
+                logger.info("DEAD_SOUL_ALERT point_id=%s pairs=%s", point_id, pairs_for_log)
+                ADMIN_ALERTS_TOTAL.inc(alert_type="admin_same_location_5")
+                logger.info(
+                    "ADMIN_ALERT_SENT alert_type=admin_same_location_5 point_id=%s pairs=%s", point_id, pairs_for_log
+                )
+                effects.append(partial(notify_admins, context, alert_text))
+                if point_id is not None:
+                    dead_soul_recent[point_id] = now
+
+        await run_side_effects("ping_alerts", effects, key=session.user_id)
+
+    async def suggest_points(message, session, lat: float, lon: float) -> None:
+        try:
+            suggestions = await points_catalog.suggest(lat, lon, k=config.POINT_SUGGESTIONS)
+        except ApiUnavailableError:
+            logger.warning("POINT_SUGGEST_UNAVAILABLE tg=%s", session.user_id)
+            return
+
+        session.point_suggestions_sent = True
+        logger.info("POINT_SUGGEST tg=%s found=%s", session.user_id, len(suggestions))
+        if not suggestions:
+            await message.reply_text("Рядом с вами нет рабочих точек. Выберите точку из списка, отправив её номер.")
+            return
+        session.points_cache = points_catalog.points
+        await message.reply_text("Точки рядом с вами:", reply_markup=point_suggestions_keyboard(suggestions))
 
     async def handle_location_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = update.effective_message
@@ -489,16 +612,23 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         )
 
         session = session_store.get_or_create(user.id, chat.id)
-        session.last_live_update_ts = time.time()
+        session.last_live_update_ts = clock.now()
         session.last_lat = lat
         session.last_lon = lon
         session.last_acc = float(acc) if acc is not None else None
 
+        if session.mode == MODE_CHOOSE_POINT and points_catalog is not None and not session.point_suggestions_sent:
+            await suggest_points(message, session, lat, lon)
+            return
+
         if session.mode in {MODE_CHOOSE_POINT, MODE_CHOOSE_ROLE}:
             logger.info("LOCATION_UPDATE_IGNORED mode=%s tg=%s", session.mode, user.id)
             return
 
-        staff = await oc_client.get_staff_by_telegram(user.id)
+        staff = await request_context.memoize(
+            (request_context.STAFF, user.id),
+            lambda: oc_client.get_staff_by_telegram(user.id),
+        )
         if not staff:
             logger.info("LOCATION_UPDATE staff_not_found tg=%s", user.id)
             return
@@ -511,6 +641,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         except (KeyError, TypeError, ValueError):
             logger.error("LOCATION_STAFF_ID_INVALID staff=%s", staff)
             return
+        session.staff_id = oc_staff_id
 
         try:
             await ensure_active_shift(session, oc_staff_id, context)
@@ -572,15 +703,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         lon: float,
         accuracy: float | None,
     ) -> None:
-        log = logging.getLogger("geo_gate")
-        log.setLevel(logging.INFO)
-
-        def _geolog(msg: str):
-            try:
-                log.info(msg)
-            except Exception:
-                pass
-            print(msg, flush=True)
+        _geolog = geo_gate_logger.info
 
         if session.selected_role is None or session.selected_point_id is None:
             await source_message.reply_text("Сначала выберите точку и роль.", reply_markup=main_menu_keyboard())
@@ -602,6 +725,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
                 "Не удалось начать смену: сотрудник не найден/не активен. Напишите администратору."
             )
             return
+        session.staff_id = oc_staff_id
 
         if point_lat_raw is None or point_lon_raw is None:
             state_snapshot = dict(vars(session))
@@ -628,7 +752,8 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
 
         attempt = max(session.gate_attempt, 0)
         effective_radius = base_radius
-        dist_m = haversine_m(lat, lon, point_lat, point_lon)
+        fence = Geofence(point_lat, point_lon, effective_radius)
+        dist_m, inside = fence.measure(lat, lon)
         session.last_distance_m = dist_m
         attempt_num = attempt + 1
 
@@ -665,7 +790,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         if accuracy is None:
             logger.info("[GEO_GATE] acc=None, continue with distance check")
 
-        if dist_m > effective_radius:
+        if not inside:
             session.last_status = STATUS_OUT
             session.gate_last_reason = "distance"
             session.gate_attempt = 1
@@ -690,10 +815,18 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
             )
             _geolog(f"[GEO_GATE] result=OUT reason={out_reason}")
 
+            other_point_hint = ""
+            if session.points_cache:
+                hits = PointsGeo(session.points_cache, default_radius_m=config.DEFAULT_RADIUS_M).within_radius(lat, lon)
+                other_points = [point for point, _ in hits if as_int(point.get("id")) != session.selected_point_id]
+                if other_points:
+                    other_point_hint = f"Похоже, вы находитесь на точке {other_points[0].get('short_name') or '—'}.\n\n"
+
             await status_message.edit_text(
                 "Мы вас не видим в рабочей зоне, до этой зоны не хватает примерно "
                 f"{max(dist_m - effective_radius, 0):.0f} м.\n\n"
-                "Если вы выбрали не ту точку — просто выберите снова. "
+                + other_point_hint
+                + "Если вы выбрали не ту точку — просто выберите снова. "
                 "Но если вы в рабочей зоне и считаете, что это ошибка — сообщите руководителю вашей точки, чтобы поставить смену.\n\n"
                 "Проверка выполняется только по кнопке «Проверить повторно».",
                 reply_markup=retry_inline_keyboard(include_issue=True),
@@ -749,8 +882,10 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
             payload["start_acc"],
         )
 
+        request_context.forget((request_context.ACTIVE_SHIFT, oc_staff_id))
         try:
-            result = await oc_client.shift_start(payload)
+            with committing():
+                result = await oc_client.shift_start(payload)
         except ApiUnavailableError:
             await status_message.edit_text(
                 "Сайт временно недоступен (ошибка сети). Попробуйте ещё раз через 10 секунд.",
@@ -806,6 +941,7 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         session.active_point_lat = point_lat
         session.active_point_lon = point_lon
         session.active_point_radius = base_radius
+        session.active_geofence = Geofence(point_lat, point_lon, base_radius)
         session.active_role = role
         session.active_staff_name = staff.get("full_name") or staff.get("name") or session.active_staff_name
         session.active_staff_phone = str(staff.get("phone") or "").strip() or session.active_staff_phone
@@ -841,6 +977,9 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         await source_message.reply_text(success_message, reply_markup=main_menu_keyboard())
 
         # Task 3: Companion notifications
+        if LOOP_MONITOR.should_shed("companion_notify"):
+            logger.info("COMPANION_NOTIFY_SHED shift_id=%s", session.active_shift_id)
+            return
         try:
             current_point_id = session.active_point_id
             current_shift_id = session.active_shift_id
@@ -901,7 +1040,11 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
         if point_id is None:
             return
 
-        active_shifts = await oc_client.get_active_shifts_by_point(point_id)
+        if LOOP_MONITOR.should_shed("dead_soul_enrich"):
+            # names come from the alert payload only
+            active_shifts = []
+        else:
+            active_shifts = await oc_client.get_active_shifts_by_point(point_id)
         if not isinstance(active_shifts, list):
             active_shifts = []
 
@@ -986,7 +1129,10 @@ def build_location_handlers(session_store, staff_service, oc_client, dead_soul_d
             )
             return
 
-        staff = await oc_client.get_staff_by_telegram(user.id)
+        staff = await request_context.memoize(
+            (request_context.STAFF, user.id),
+            lambda: oc_client.get_staff_by_telegram(user.id),
+        )
         if not staff:
             await query.message.reply_text("Не удалось найти сотрудника. Обратитесь к администратору.")
             return
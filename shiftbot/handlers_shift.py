@@ -5,13 +5,22 @@ import re
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, Update
 from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
 
-from shiftbot import config
+from shiftbot import clock, config, request_context
 from shiftbot.admin_notify import notify_admins
-from shiftbot.guards import ensure_staff_active, get_staff_or_reply
+from shiftbot.call_budget import ACCOUNTING, format_call_accounting
+from shiftbot.deadline import committing, spawn_detached
+from shiftbot.guards import ensure_staff_active, get_staff_or_reply, is_admin_chat
 from shiftbot.live_registry import LIVE_REGISTRY
+from shiftbot.loop_monitor import LOOP_MONITOR, format_loop_stats
+from shiftbot.memory_report import format_memory_report, format_trace_diff
 from shiftbot.models import MODE_AWAITING_LOCATION, MODE_CHOOSE_POINT, MODE_CHOOSE_ROLE, MODE_IDLE, MODE_REPORT_ISSUE
 from shiftbot.opencart_client import ApiUnavailableError
 from shiftbot.ping_alerts import process_ping_alerts
+from shiftbot.point_index import PointsCatalog
+from shiftbot.profiler import SamplingProfiler, format_profile_report
+from shiftbot.request_stats import format_request_stats
+from shiftbot.shared_state import call_shared
+from shiftbot.synthetic_fleet import SyntheticFleet, build_virtual_shifts, run_with_reports
 
 BTN_START_SHIFT = "🟢 Начать смену"
 BTN_STOP_SHIFT = "🔴 Завершить смену"
@@ -51,6 +60,47 @@ def sort_points_by_dl_number(points: list[dict]) -> list[dict]:
     return sorted(points, key=sort_key)
 
 
+def normalize_point(raw: dict) -> dict:
+    return {
+        "id": raw.get("id") or raw.get("point_id") or raw.get("location_id"),
+        "short_name": raw.get("short_name") or raw.get("name") or "Точка",
+        "address": raw.get("address") or "",
+        "link_yandex": raw.get("link_yandex") or "",
+        "link_2gis": raw.get("link_2gis") or "",
+        "geo_lat": raw.get("geo_lat"),
+        "geo_lon": raw.get("geo_lon") or raw.get("geo_lng") or raw.get("geo_long"),
+        "geo_radius_m": raw.get("geo_radius_m") or raw.get("radius") or raw.get("geo_radius"),
+    }
+
+
+def prepare_points(raw_points: list[dict]) -> list[dict]:
+    return sort_points_by_dl_number([normalize_point(point) for point in raw_points])
+
+
+def point_suggestions_keyboard(suggestions: list[tuple[dict, float]]) -> InlineKeyboardMarkup:
+    rows = [
+        [
+            InlineKeyboardButton(
+                f"{point.get('short_name') or 'Точка'} — {dist:.0f} м",
+                callback_data=f"pick_point:{point.get('id')}",
+            )
+        ]
+        for point, dist in suggestions
+    ]
+    rows.append([InlineKeyboardButton("📋 Все точки", callback_data="show_all_points")])
+    return InlineKeyboardMarkup(rows)
+
+
+def role_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        [
+            [InlineKeyboardButton("Кассир", callback_data="role:cashier")],
+            [InlineKeyboardButton("Пекарь", callback_data="role:baker")],
+            [InlineKeyboardButton("Кассир+Пекарь", callback_data="role:both")],
+        ]
+    )
+
+
 def active_shift_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         [[InlineKeyboardButton(BTN_STOP_SHIFT, callback_data="stop_shift_now"), InlineKeyboardButton(BTN_STATUS, callback_data="show_status")]]
@@ -80,8 +130,25 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, tex
         await target.reply_text(text, reply_markup=main_menu_keyboard())
 
 
-def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_detector, logger):
+def build_shift_handlers(
+    session_store,
+    staff_service,
+    oc_client,
+    dead_soul_detector,
+    logger,
+    points_catalog=None,
+    fleet_oc_client=None,
+):
     TEST_PING_TASKS_KEY = "test_ping_tasks"
+    TEST_FLEETS_KEY = "test_fleets"
+    PROFILER_KEY = "profiler"
+    if points_catalog is None:
+        points_catalog = PointsCatalog(
+            oc_client,
+            ttl_sec=config.POINTS_CACHE_TTL_SEC,
+            default_radius_m=config.DEFAULT_RADIUS_M,
+            prepare=prepare_points,
+        )
 
     async def cmd_admin_test(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
@@ -94,21 +161,108 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
         ok = await notify_admins(context, "🔔 ADMIN TEST from /admin_test")
         await msg.reply_text("sent (see logs)" if ok else "failed (see logs)")
 
+    async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        msg = update.effective_message
+        if not user or not msg:
+            return
+        if not is_admin_chat(update, context):
+            logger.info("STATS_CMD_DENIED user_id=%s", user.id)
+            return
+
+        logger.info("STATS_CMD user_id=%s", user.id)
+        await msg.reply_text(
+            format_request_stats(oc_client.snapshot())
+            + "\n\n"
+            + format_call_accounting(ACCOUNTING.snapshot())
+            + "\n\n"
+            + format_loop_stats(LOOP_MONITOR.snapshot())
+        )
+
+    async def cmd_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        msg = update.effective_message
+        if not user or not msg:
+            return
+        if not is_admin_chat(update, context):
+            logger.info("PROFILE_CMD_DENIED user_id=%s", user.id)
+            return
+
+        args = list(getattr(context, "args", None) or [])
+        try:
+            seconds = float(args[0]) if args else 10.0
+        except ValueError:
+            await msg.reply_text(f"Формат: /profile [секунд, до {config.PROFILE_MAX_SEC}]")
+            return
+        seconds = min(max(seconds, 0.1), float(config.PROFILE_MAX_SEC))
+
+        bot_data = context.application.bot_data
+        running = bot_data.get(PROFILER_KEY)
+        if running is not None and running.running:
+            await msg.reply_text("Профайлер уже запущен.")
+            return
+        profiler = SamplingProfiler(interval_sec=config.PROFILE_INTERVAL_MS / 1000)
+        bot_data[PROFILER_KEY] = profiler
+        logger.info("PROFILE_START user_id=%s seconds=%s", user.id, seconds)
+        await msg.reply_text(f"Профилирую {seconds:g}с…")
+
+        async def run_profile() -> None:
+            try:
+                await profiler.profile(seconds)
+                path = profiler.write_collapsed(config.PROFILE_DIR)
+                summary = profiler.summary()
+                logger.info(
+                    "PROFILE_DONE path=%s samples=%s busy_share=%.2f",
+                    path,
+                    summary["samples"],
+                    summary["loop_busy_share"],
+                )
+                await msg.reply_text(format_profile_report(summary, path))
+            except Exception as exc:
+                logger.warning("PROFILE_FAILED error=%s", exc)
+                with contextlib.suppress(Exception):
+                    await msg.reply_text(f"Профилирование не удалось: {exc}")
+
+        spawn_detached(run_profile(), name="profile")
+
+    async def cmd_memory(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = update.effective_user
+        msg = update.effective_message
+        if not user or not msg:
+            return
+        if not is_admin_chat(update, context):
+            logger.info("MEMORY_CMD_DENIED user_id=%s", user.id)
+            return
+        inspector = context.application.bot_data.get("memory_inspector")
+        if inspector is None:
+            await msg.reply_text("Отчёт о памяти недоступен.")
+            return
+
+        args = [arg.lower() for arg in (getattr(context, "args", None) or [])]
+        logger.info("MEMORY_CMD user_id=%s args=%s", user.id, args)
+        if not args:
+            report = inspector.report()
+            inspector.export(report)
+            await msg.reply_text(format_memory_report(report))
+            return
+        if args[0] != "trace" or len(args) < 2 or args[1] not in {"start", "diff", "stop"}:
+            await msg.reply_text("Формат: /memory или /memory trace start|diff|stop")
+            return
+        if args[1] == "start":
+            inspector.trace_start()
+            await msg.reply_text("tracemalloc включён, базовый снимок сделан. Дальше: /memory trace diff")
+        elif args[1] == "diff":
+            if not inspector.tracing:
+                await msg.reply_text("tracemalloc выключен. Сначала: /memory trace start")
+                return
+            await msg.reply_text(format_trace_diff(inspector.trace_diff()))
+        else:
+            inspector.trace_stop()
+            await msg.reply_text("tracemalloc выключен.")
+
     def reset_flow(session) -> None:
         session_store.reset_flow(session)
 
-    def normalize_point(raw: dict) -> dict:
-        return {
-            "id": raw.get("id") or raw.get("point_id") or raw.get("location_id"),
-            "short_name": raw.get("short_name") or raw.get("name") or "Точка",
-            "address": raw.get("address") or "",
-            "link_yandex": raw.get("link_yandex") or "",
-            "link_2gis": raw.get("link_2gis") or "",
-            "geo_lat": raw.get("geo_lat"),
-            "geo_lon": raw.get("geo_lon") or raw.get("geo_lng") or raw.get("geo_long"),
-            "geo_radius_m": raw.get("geo_radius_m") or raw.get("radius") or raw.get("geo_radius"),
-        }
-
     def as_int(value):
         try:
             return int(value)
@@ -142,7 +296,11 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
         return f"{i}) {point.get('short_name') or f'Точка {i}'} — {address}"
 
     async def sync_active_shift(session, staff_id: int) -> dict | None:
-        shift = await oc_client.get_active_shift_by_staff(staff_id)
+        session.staff_id = staff_id
+        shift = await request_context.memoize(
+            (request_context.ACTIVE_SHIFT, staff_id),
+            lambda: oc_client.get_active_shift_by_staff(staff_id),
+        )
         if not isinstance(shift, dict):
             return None
         shift_id = as_int(shift.get("shift_id") or shift.get("id"))
@@ -181,7 +339,9 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
         if idx is None:
             await msg.reply_text("Точка не найдена. Попробуйте выбрать другую.")
             return False
+        return await apply_selected_point(msg, session, idx, point_number)
 
+    async def apply_selected_point(msg, session, idx: int, point_number: int) -> bool:
         point = session.points_cache[idx]
         p_lat = point.get("geo_lat")
         p_lon = point.get("geo_lon")
@@ -231,12 +391,11 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
 
         session = session_store.get_or_create(user.id, chat.id)
         try:
-            raw_points = await oc_client.get_points()
+            points = await points_catalog.get()
         except ApiUnavailableError:
             await msg.reply_text("Сайт временно недоступен (ошибка сети). Попробуйте ещё раз через 10 секунд.", reply_markup=api_retry_keyboard("retry_points"))
             return
 
-        points = sort_points_by_dl_number([normalize_point(point) for point in raw_points])
         if not points:
             await msg.reply_text("Сейчас нет доступных точек. Попробуйте позже.", reply_markup=main_menu_keyboard())
             return
@@ -255,11 +414,25 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
             selected_role=None,
             gate_attempt=0,
             gate_last_reason=None,
+            point_suggestions_sent=False,
         )
 
+        location_age = clock.now() - session.last_live_update_ts
+        if session.last_lat is not None and session.last_lon is not None and location_age < config.POINT_SUGGEST_LOCATION_MAX_AGE_SEC:
+            suggestions = points_catalog.index.nearby(session.last_lat, session.last_lon, k=config.POINT_SUGGESTIONS)
+            if suggestions:
+                session.point_suggestions_sent = True
+                await msg.reply_text("Точки рядом с вами:", reply_markup=point_suggestions_keyboard(suggestions))
+                return
+
+        await send_points_list(msg, points)
+
+    async def send_points_list(msg, points: list[dict]) -> None:
         lines = "\n".join(format_point_line(i + 1, point) for i, point in enumerate(points))
         await msg.reply_text(f"Адреса, доступные для работы:\n{lines}\n")
-        await msg.reply_text("Чтобы выбрать точку — отправьте номер цифрой")
+        await msg.reply_text(
+            "Чтобы выбрать точку — отправьте номер цифрой или отправьте геопозицию, и мы предложим ближайшие точки"
+        )
 
     async def stop_shift_flow(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if not await ensure_staff_active(update, context, staff_service, logger):
@@ -289,7 +462,8 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
             active_shift_id = session.active_shift_id
 
         try:
-            result = await oc_client.shift_end({"shift_id": active_shift_id, "end_reason": "manual"})
+            with committing():
+                result = await oc_client.shift_end({"shift_id": active_shift_id, "end_reason": "manual"})
         except ApiUnavailableError:
             await msg.reply_text("Сайт временно недоступен (ошибка сети). Попробуйте ещё раз через 10 секунд.", reply_markup=api_retry_keyboard("retry_stop_shift"))
             return
@@ -300,10 +474,12 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
 
         if active_shift_id:
             LIVE_REGISTRY.remove_shift(active_shift_id)
-            dead_soul_detector.remove_shift(active_shift_id)
+            await call_shared(dead_soul_detector.remove_shift, active_shift_id)
             unknown_by_shift = context.application.bot_data.get(UNKNOWN_ACC_STATE_KEY)
             if isinstance(unknown_by_shift, dict):
                 unknown_by_shift.pop(int(active_shift_id), None)
+        if staff_id is not None:
+            request_context.forget((request_context.ACTIVE_SHIFT, staff_id))
         session_store.clear_shift_state(session)
         reset_flow(session)
         await msg.reply_text("Смена завершена", reply_markup=main_menu_keyboard())
@@ -433,6 +609,9 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
             return
 
         args = context.args or []
+        if args and args[0] == "fleet":
+            await start_test_fleet(update, context, args[1:])
+            return
         if len(args) < 3:
             await msg.reply_text("Формат: /test_ping_start <shift_id> <lat> <lon> [interval_sec=60]")
             return
@@ -494,12 +673,95 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
                     logger.exception("TEST_PING_ERROR shift_id=%s staff_id=%s error=%s", shift_id, staff_id, exc)
                 await asyncio.sleep(interval_sec)
 
-        task = asyncio.create_task(_loop(), name=f"test-ping-{key}")
+        task = spawn_detached(_loop(), name=f"test-ping-{key}")
         context.application.bot_data.setdefault(TEST_PING_TASKS_KEY, {})[key] = task
         await msg.reply_text(
             f"Запущен /test_ping_start: shift_id={shift_id}, lat={lat}, lon={lon}, interval={interval_sec}s"
         )
 
+    async def start_test_fleet(update: Update, context: ContextTypes.DEFAULT_TYPE, args: list[str]) -> None:
+        user = update.effective_user
+        chat = update.effective_chat
+        msg = update.effective_message
+        if not is_admin_chat(update, context):
+            logger.info("TEST_FLEET_DENIED user_id=%s", user.id)
+            return
+
+        usage = (
+            "Формат: /test_ping_start fleet <count> <first_shift_id> <lat> <lon> [interval_sec=60] [rate_per_sec]\n"
+            "Смены first_shift_id … first_shift_id+count-1 получают траектории по кругу: "
+            "внутри, уход за радиус, застывшие координаты, плохая точность."
+        )
+        if len(args) < 4:
+            await msg.reply_text(usage)
+            return
+        count = as_int(args[0])
+        first_shift_id = as_int(args[1])
+        lat = as_float(args[2])
+        lon = as_float(args[3])
+        interval_sec = as_float(args[4]) if len(args) > 4 else 60.0
+        rate_per_sec = as_float(args[5]) if len(args) > 5 else config.TEST_FLEET_RATE_PER_SEC
+        if (
+            count is None
+            or not 0 < count <= config.TEST_FLEET_MAX_SHIFTS
+            or first_shift_id is None
+            or lat is None
+            or lon is None
+            or not interval_sec
+            or interval_sec <= 0
+            or rate_per_sec is None
+            or rate_per_sec <= 0
+        ):
+            await msg.reply_text(f"{usage}\nНе больше {config.TEST_FLEET_MAX_SHIFTS} смен.")
+            return
+        rate_per_sec = min(rate_per_sec, config.TEST_FLEET_RATE_PER_SEC)
+
+        if fleet_oc_client is None:
+            # virtual shift ids would land on real shifts of the production API
+            logger.warning("TEST_FLEET_DISABLED user_id=%s reason=no_staging_base_url", user.id)
+            await msg.reply_text("Тестовый флот отключён: не задан отдельный стенд TEST_FLEET_OC_API_BASE.")
+            return
+        try:
+            staff = await fleet_oc_client.get_staff_by_telegram(user.id)
+        except RuntimeError as exc:
+            logger.warning("TEST_FLEET_STAFF_LOOKUP_FAILED user_id=%s error=%s", user.id, exc)
+            await msg.reply_text("Стенд TEST_FLEET_OC_API_BASE недоступен.")
+            return
+        if not staff:
+            await msg.reply_text("На стенде TEST_FLEET_OC_API_BASE нет сотрудника с вашим Telegram.")
+            return
+
+        key = test_ping_task_key(user.id, chat.id)
+        await stop_test_ping_task(context, key)
+
+        shifts = build_virtual_shifts(
+            count, first_shift_id, as_int(staff.get("staff_id")), lat, lon, float(config.DEFAULT_RADIUS_M)
+        )
+        fleet = SyntheticFleet(fleet_oc_client, logger, shifts, interval_sec=interval_sec, rate_per_sec=rate_per_sec)
+
+        async def send_report(text: str) -> None:
+            await context.bot.send_message(chat_id=chat.id, text=text)
+
+        task = spawn_detached(
+            run_with_reports(fleet, send_report, config.TEST_FLEET_REPORT_EVERY_SEC, logger), name=f"test-fleet-{key}"
+        )
+        context.application.bot_data.setdefault(TEST_PING_TASKS_KEY, {})[key] = task
+        context.application.bot_data.setdefault(TEST_FLEETS_KEY, {})[key] = fleet
+        logger.info(
+            "TEST_FLEET_START user_id=%s shifts=%s first_shift_id=%s interval_sec=%s rate_per_sec=%s base_url=%s",
+            user.id,
+            count,
+            first_shift_id,
+            interval_sec,
+            rate_per_sec,
+            getattr(fleet_oc_client, "base_url", None),
+        )
+        await msg.reply_text(
+            f"Запущен тестовый флот: {count} смен с shift_id={first_shift_id}, интервал {interval_sec:g}с, "
+            f"не больше {rate_per_sec:g} пингов/с. Сводка раз в {config.TEST_FLEET_REPORT_EVERY_SEC}с, "
+            "остановка — /test_ping_stop."
+        )
+
     async def cmd_test_ping_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user = update.effective_user
         chat = update.effective_chat
@@ -508,7 +770,10 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
             return
         key = test_ping_task_key(user.id, chat.id)
         stopped = await stop_test_ping_task(context, key)
-        if stopped:
+        fleet = context.application.bot_data.setdefault(TEST_FLEETS_KEY, {}).pop(key, None)
+        if stopped and fleet is not None:
+            await msg.reply_text("Тестовый флот остановлен.\n" + fleet.format_report())
+        elif stopped:
             await msg.reply_text("Тестовый ping-цикл остановлен.")
         else:
             await msg.reply_text("Активный тестовый ping-цикл не найден.")
@@ -573,18 +838,36 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
                 await msg.reply_text("Введите корректный номер точки (например, 1, 2, 5, 6).")
                 return
             if not await save_selected_point(msg, session, point_number):
-                lines = "\n".join(format_point_line(i + 1, point) for i, point in enumerate(session.points_cache))
-                await msg.reply_text(f"Адреса, доступные для работы:\n{lines}\n")
-                await msg.reply_text("Чтобы выбрать точку — отправьте номер цифрой")
+                await send_points_list(msg, session.points_cache)
                 return
-            keyboard = InlineKeyboardMarkup(
-                [
-                    [InlineKeyboardButton("Кассир", callback_data="role:cashier")],
-                    [InlineKeyboardButton("Пекарь", callback_data="role:baker")],
-                    [InlineKeyboardButton("Кассир+Пекарь", callback_data="role:both")],
-                ]
-            )
-            await msg.reply_text("Выберите роль:", reply_markup=keyboard)
+            await msg.reply_text("Выберите роль:", reply_markup=role_keyboard())
+
+    async def pick_point_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        user = update.effective_user
+        chat = update.effective_chat
+        if not query or not user or not chat or not query.message:
+            return
+        await query.answer()
+        if not await ensure_staff_active(update, context, staff_service, logger):
+            return
+
+        session = session_store.get_or_create(user.id, chat.id)
+        if session.mode != MODE_CHOOSE_POINT:
+            await query.message.reply_text("Сначала начните смену.", reply_markup=main_menu_keyboard())
+            return
+
+        point_id = as_int(query.data.split(":", maxsplit=1)[1])
+        idx = next(
+            (i for i, point in enumerate(session.points_cache) if as_int(point.get("id")) == point_id),
+            None,
+        )
+        if idx is None:
+            await query.message.reply_text("Точка не найдена. Попробуйте выбрать другую.")
+            return
+        if not await apply_selected_point(query.message, session, idx, idx + 1):
+            return
+        await query.message.reply_text("Выберите роль:", reply_markup=role_keyboard())
 
     async def role_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         query = update.callback_query
@@ -631,6 +914,13 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
         if data == "retry_points":
             await ask_points(update, context)
             return
+        if data == "show_all_points":
+            session = session_store.get_or_create(user.id, chat.id)
+            if session.mode == MODE_CHOOSE_POINT and session.points_cache:
+                await send_points_list(query.message, session.points_cache)
+            else:
+                await ask_points(update, context)
+            return
         if data == "retry_stop_shift" or data == "stop_shift_now":
             await stop_shift_flow(update, context)
             return
@@ -650,9 +940,13 @@ def build_shift_handlers(session_store, staff_service, oc_client, dead_soul_dete
         CommandHandler("restart", cmd_restart),
         CommandHandler("help", cmd_help),
         CommandHandler("admin_test", cmd_admin_test),
+        CommandHandler("stats", cmd_stats),
+        CommandHandler("profile", cmd_profile),
+        CommandHandler("memory", cmd_memory),
         CommandHandler("test_ping_start", cmd_test_ping_start),
         CommandHandler("test_ping_stop", cmd_test_ping_stop),
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text),
         CallbackQueryHandler(role_callback, pattern=r"^role:"),
-        CallbackQueryHandler(action_callback, pattern=r"^(change_point|report_issue|retry_points|retry_stop_shift|stop_shift_now|show_status)$"),
+        CallbackQueryHandler(pick_point_callback, pattern=r"^pick_point:"),
+        CallbackQueryHandler(action_callback, pattern=r"^(change_point|report_issue|retry_points|retry_stop_shift|stop_shift_now|show_status|show_all_points)$"),
     ]
@@ -1,8 +1,7 @@
-import time
-
 from telegram.ext import ContextTypes
 
-from shiftbot import config
+from shiftbot import clock, config
+from shiftbot.metrics import STALE_JOB_DURATION, STALE_TOTAL
 from shiftbot.models import STATUS_UNKNOWN
 from shiftbot.admin_notify import notify_admins
 
@@ -73,20 +72,23 @@ def build_job_check_stale(session_store, oc_client, logger):
         if session.active_shift_id and refresh_age < ACTIVE_SHIFT_REFRESH_EVERY_SEC:
             return
 
-        try:
-            staff = await oc_client.get_staff_by_telegram(session.user_id)
-        except Exception as exc:
-            logger.warning("STALE_SHIFT_REFRESH_STAFF_FAILED user=%s error=%s", session.user_id, exc)
-            return
-
-        if not isinstance(staff, dict):
-            logger.info("STALE_SHIFT_REFRESH_NO_STAFF user=%s", session.user_id)
-            return
-
-        staff_id = _as_int(staff.get("staff_id"))
+        staff_id = getattr(session, "staff_id", None)
         if staff_id is None:
-            logger.warning("STALE_SHIFT_REFRESH_BAD_STAFF_ID user=%s staff=%s", session.user_id, staff)
-            return
+            try:
+                staff = await oc_client.get_staff_by_telegram(session.user_id)
+            except Exception as exc:
+                logger.warning("STALE_SHIFT_REFRESH_STAFF_FAILED user=%s error=%s", session.user_id, exc)
+                return
+
+            if not isinstance(staff, dict):
+                logger.info("STALE_SHIFT_REFRESH_NO_STAFF user=%s", session.user_id)
+                return
+
+            staff_id = _as_int(staff.get("staff_id"))
+            if staff_id is None:
+                logger.warning("STALE_SHIFT_REFRESH_BAD_STAFF_ID user=%s staff=%s", session.user_id, staff)
+                return
+            session.staff_id = staff_id
 
         try:
             shift = await oc_client.get_active_shift_by_staff(staff_id)
@@ -108,11 +110,94 @@ def build_job_check_stale(session_store, oc_client, logger):
             session.active_shift_id,
         )
 
+    async def _notify_shift_ended(context, session) -> None:
+        _stop_monitoring_session(session)
+        try:
+            await context.bot.send_message(
+                chat_id=session.chat_id,
+                text="⚠️ Ваша смена завершена администратором. Если это ошибка — свяжитесь с нами.",
+            )
+        except Exception as exc:
+            logger.error("SHIFT_ENDED_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
+
+    async def _reconcile_active_shifts(context, now: float) -> set[int]:
+        """Refresh every monitored session with a known staff_id in one bulk call.
+
+        Returns user ids of the sessions brought up to date. Sessions the reply says nothing
+        about are left out, as is everything when there is no bulk route or it failed: the
+        per-session refresh below does the work for them.
+        """
+        bulk = getattr(oc_client, "get_active_shifts_bulk", None)
+        if bulk is None:
+            return set()
+        sessions = [
+            session
+            for session in session_store.values()
+            if session.active and getattr(session, "staff_id", None) is not None
+        ]
+        if not sessions:
+            return set()
+
+        try:
+            shifts = await bulk([session.staff_id for session in sessions])
+        except Exception as exc:
+            logger.warning("STALE_BULK_RECONCILE_FAILED sessions=%s error=%s", len(sessions), exc)
+            return set()
+        if shifts is None:
+            return set()
+
+        ended = 0
+        reconciled = set()
+        for session in sessions:
+            if session.staff_id not in shifts:
+                continue
+            _sync_shift_fields(session, shifts[session.staff_id])
+            session.last_active_shift_refresh_ts = now
+            reconciled.add(session.user_id)
+            if not session.active_shift_id:
+                ended += 1
+                logger.info("STALE_SHIFT_ALREADY_ENDED user=%s -> stop monitoring", session.user_id)
+                await _notify_shift_ended(context, session)
+        logger.info(
+            "STALE_BULK_RECONCILE sessions=%s ended=%s omitted=%s",
+            len(sessions),
+            ended,
+            len(sessions) - len(reconciled),
+        )
+        return reconciled
+
+    async def _violation_ticks(shift_ids: list[int]) -> dict:
+        """Tick all expired shifts: one batched request if possible, else one request per shift."""
+        batch = getattr(oc_client, "violation_tick_many", None)
+        if config.VIOLATION_TICK_BATCH and batch is not None:
+            try:
+                responses = await batch(shift_ids)
+            except Exception as exc:
+                logger.error("VIOLATION_TICK_MANY_FAILED shift_ids=%s error=%s", shift_ids, exc)
+                return {shift_id: {"ok": False, "error": str(exc), "decisions": {}} for shift_id in shift_ids}
+            if responses is not None:
+                return responses
+
+        responses = {}
+        for shift_id in shift_ids:
+            try:
+                responses[shift_id] = await oc_client.violation_tick(shift_id)
+            except Exception as exc:
+                responses[shift_id] = {"ok": False, "error": str(exc), "decisions": {}}
+                logger.error("VIOLATION_TICK_FAILED shift_id=%s error=%s", shift_id, exc)
+        return responses
+
     async def job_check_stale(context: ContextTypes.DEFAULT_TYPE) -> None:
+        with STALE_JOB_DURATION.time():
+            await _check_stale(context)
+
+    async def _check_stale(context: ContextTypes.DEFAULT_TYPE) -> None:
         if session_store.is_empty():
             return
 
-        now = time.time()
+        now = clock.now()
+        reconciled = await _reconcile_active_shifts(context, now)
+        expired = []
         for session in list(session_store.values()):
             if not session.active:
                 continue
@@ -126,8 +211,9 @@ def build_job_check_stale(session_store, oc_client, logger):
 
                 # Force-refresh shift status before doing anything else so we
                 # don't spam a stale warning for a shift that's already closed.
-                session.last_active_shift_refresh_ts = 0.0
-                await _refresh_active_shift_if_needed(session, now)
+                if session.user_id not in reconciled:
+                    session.last_active_shift_refresh_ts = 0.0
+                    await _refresh_active_shift_if_needed(session, now)
 
                 if not session.active_shift_id:
                     logger.info(
@@ -146,6 +232,7 @@ def build_job_check_stale(session_store, oc_client, logger):
                 session.last_stale_notify_ts = now
                 session.last_status = STATUS_UNKNOWN
                 session.out_streak = 0
+                STALE_TOTAL.inc()
                 logger.info("STALE user=%s age=%.1f -> UNKNOWN", session.user_id, age)
 
                 logger.info(
@@ -157,260 +244,288 @@ def build_job_check_stale(session_store, oc_client, logger):
                     getattr(session, "mode", None),
                     getattr(session, "active", None),
                 )
-                try:
-                    violation_response = await oc_client.violation_tick(session.active_shift_id)
-                except Exception as exc:
-                    violation_response = {"ok": False, "error": str(exc), "decisions": {}}
-                    logger.error("VIOLATION_TICK_FAILED shift_id=%s error=%s", session.active_shift_id, exc)
-                logger.info(
-                    "VIOLATION_TICK_RESPONSE shift_id=%s response=%s",
-                    session.active_shift_id,
-                    str(violation_response)[:500],
-                )
+                expired.append(session)
 
-                if isinstance(violation_response, dict) and violation_response.get("error") == "shift_not_active":
-                    logger.warning(
-                        "VIOLATION_TICK_SHIFT_NOT_ACTIVE user=%s shift_id=%s -> stop monitoring",
-                        session.user_id,
-                        session.active_shift_id,
-                    )
-                    _stop_monitoring_session(session)
-                    try:
-                        await context.bot.send_message(
-                            chat_id=session.chat_id,
-                            text="⚠️ Ваша смена завершена администратором. Если это ошибка — свяжитесь с нами.",
-                        )
-                    except Exception as exc:
-                        logger.error("SHIFT_ENDED_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
-                    continue
-
-                warn_round = int(getattr(session, "last_out_violation_notified_round", 0) or 0)
+        if not expired:
+            return
 
-                next_round = warn_round + 1
-                session.last_out_violation_notified_round = next_round
+        responses = await _violation_ticks(list(dict.fromkeys(session.active_shift_id for session in expired)))
+        for session in expired:
+            violation_response = responses.get(session.active_shift_id) or {
+                "ok": False,
+                "error": "missing_in_batch",
+                "decisions": {},
+            }
+            logger.info(
+                "VIOLATION_TICK_RESPONSE shift_id=%s response=%s",
+                session.active_shift_id,
+                str(violation_response)[:500],
+            )
 
-                if next_round == 1:
-                    session.stale_first_detected_ts = now
-                    staff_warning_text = (
-                        "⚠️ Мы вас не видим. Пожалуйста, включите трансляцию геопозиции."
-                        "\n\nПосле второго уведомления смена закроется автоматически, "
-                        "а администратор проведет проверку. "
-                        "Если это ошибка, смену восстановят без потери рабочего времени."
-                    )
+            if isinstance(violation_response, dict) and violation_response.get("error") == "shift_not_active":
+                logger.warning(
+                    "VIOLATION_TICK_SHIFT_NOT_ACTIVE user=%s shift_id=%s -> stop monitoring",
+                    session.user_id,
+                    session.active_shift_id,
+                )
+                _stop_monitoring_session(session)
+                try:
                     await context.bot.send_message(
                         chat_id=session.chat_id,
-                        text=staff_warning_text,
+                        text="⚠️ Ваша смена завершена администратором. Если это ошибка — свяжитесь с нами.",
                     )
-                    continue
+                except Exception as exc:
+                    logger.error("SHIFT_ENDED_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
+                continue
 
-                shift_id_to_stop = session.active_shift_id
-                staff_name = getattr(session, "active_staff_name", None) or f"{session.user_id}"
-                point_label = getattr(session, "active_point_name", None) or (
-                    f"id={getattr(session, 'active_point_id', None)}"
-                    if getattr(session, "active_point_id", None) is not None
-                    else "—"
-                )
-                staff_phone = getattr(session, "active_staff_phone", None) or "не указан"
-                admin_text = (
-                    f"Сотрудник {staff_name} пропал с радаров на точке {point_label}.\n"
-                    f"Телефон сотрудника: {staff_phone}\n\n"
-                    "Требуется ручная проверка по камерам. "
-                    "Заявка на подозрение отправлена на сайт для рассмотрения."
+            warn_round = int(getattr(session, "last_out_violation_notified_round", 0) or 0)
+
+            next_round = warn_round + 1
+            session.last_out_violation_notified_round = next_round
 
+            if next_round == 1:
+                session.stale_first_detected_ts = now
+                staff_warning_text = (
+                    "⚠️ Мы вас не видим. Пожалуйста, включите трансляцию геопозиции."
+                    "\n\nПосле второго уведомления смена закроется автоматически, "
+                    "а администратор проведет проверку. "
+                    "Если это ошибка, смену восстановят без потери рабочего времени."
                 )
-                await notify_admins(
-                    context,
-                    admin_text,
-                    shift_id=shift_id_to_stop,
-                    cooldown_key="admin_notify_stale",
+                await context.bot.send_message(
+                    chat_id=session.chat_id,
+                    text=staff_warning_text,
                 )
+                continue
 
-                end_at_ts = int(getattr(session, "stale_first_detected_ts", 0.0) or now)
+            shift_id_to_stop = session.active_shift_id
+            staff_name = getattr(session, "active_staff_name", None) or f"{session.user_id}"
+            point_label = getattr(session, "active_point_name", None) or (
+                f"id={getattr(session, 'active_point_id', None)}"
+                if getattr(session, "active_point_id", None) is not None
+                else "—"
+            )
+            staff_phone = getattr(session, "active_staff_phone", None) or "не указан"
+            admin_text = (
+                f"Сотрудник {staff_name} пропал с радаров на точке {point_label}.\n"
+                f"Телефон сотрудника: {staff_phone}\n\n"
+                "Требуется ручная проверка по камерам. "
+                "Заявка на подозрение отправлена на сайт для рассмотрения."
+            )
+            await notify_admins(
+                context,
+                admin_text,
+                shift_id=shift_id_to_stop,
+                cooldown_key="admin_notify_stale",
+            )
 
-                logger.info(
-                    "VIOLATION_TICK_SECOND_NOTICE shift_id=%s round=%s",
-                    shift_id_to_stop,
-                    next_round,
-                )
+            end_at_ts = int(getattr(session, "stale_first_detected_ts", 0.0) or now)
+
+            # the batch at the top of this tick already ticked the shift; no second request
+            logger.info(
+                "VIOLATION_TICK_SECOND_NOTICE shift_id=%s round=%s",
+                shift_id_to_stop,
+                next_round,
+            )
+
+            auto_stopped = False
+            stop_result = None
+            end_reasons = ["auto_stale_no_geo_second_notice", "auto_violation_out", "manual"]
+            for end_reason in end_reasons:
                 try:
-                    pre_stop_violation_response = await oc_client.violation_tick(shift_id_to_stop)
-                    logger.info(
-                        "VIOLATION_TICK_SECOND_NOTICE_RESPONSE shift_id=%s response=%s",
-                        shift_id_to_stop,
-                        str(pre_stop_violation_response)[:500],
+                    stop_result = await oc_client.shift_end(
+                        {
+                            "shift_id": shift_id_to_stop,
+                            "end_reason": end_reason,
+                            "end_at": end_at_ts,
+                        }
                     )
                 except Exception as exc:
-                    pre_stop_violation_response = {"ok": False, "error": str(exc), "decisions": {}}
                     logger.error(
-                        "VIOLATION_TICK_SECOND_NOTICE_FAILED shift_id=%s error=%s",
+                        "AUTO_STOP_STALE_SHIFT_FAILED shift_id=%s reason=%s error=%s",
                         shift_id_to_stop,
+                        end_reason,
                         exc,
                     )
+                    continue
 
-                auto_stopped = False
-                stop_result = None
-                end_reasons = ["auto_stale_no_geo_second_notice", "auto_violation_out", "manual"]
-                for end_reason in end_reasons:
-                    try:
-                        stop_result = await oc_client.shift_end(
-                            {
-                                "shift_id": shift_id_to_stop,
-                                "end_reason": end_reason,
-                                "end_at": end_at_ts,
-                            }
-                        )
-                    except Exception as exc:
-                        logger.error(
-                            "AUTO_STOP_STALE_SHIFT_FAILED shift_id=%s reason=%s error=%s",
-                            shift_id_to_stop,
-                            end_reason,
-                            exc,
-                        )
-                        continue
-
-                    status_code = None
-                    ok_flag = None
-                    success_flag = None
-                    error_payload = {}
-                    if isinstance(stop_result, dict):
-                        status_code = _as_int(stop_result.get("status"))
-                        ok_flag = stop_result.get("ok")
-                        success_flag = stop_result.get("success")
-                        raw_error_payload = stop_result.get("json")
-                        if isinstance(raw_error_payload, dict):
-                            error_payload = raw_error_payload
-
-                    top_level_error = stop_result.get("error") if isinstance(stop_result, dict) else ""
-                    error_code = str(error_payload.get("error") or top_level_error or "").strip().lower()
-                    is_error = bool(
-                        (ok_flag is False)
-                        or (success_flag is False)
-                        or (status_code is not None and status_code >= 400)
-                        or error_code
-                    )
+                status_code = None
+                ok_flag = None
+                success_flag = None
+                error_payload = {}
+                if isinstance(stop_result, dict):
+                    status_code = _as_int(stop_result.get("status"))
+                    ok_flag = stop_result.get("ok")
+                    success_flag = stop_result.get("success")
+                    raw_error_payload = stop_result.get("json")
+                    if isinstance(raw_error_payload, dict):
+                        error_payload = raw_error_payload
+
+                top_level_error = stop_result.get("error") if isinstance(stop_result, dict) else ""
+                error_code = str(error_payload.get("error") or top_level_error or "").strip().lower()
+                is_error = bool(
+                    (ok_flag is False)
+                    or (success_flag is False)
+                    or (status_code is not None and status_code >= 400)
+                    or error_code
+                )
 
-                    if not is_error:
-                        auto_stopped = True
-                        logger.info(
-                            "AUTO_STOP_STALE_SHIFT_ACCEPTED shift_id=%s reason=%s result=%s",
-                            shift_id_to_stop,
-                            end_reason,
-                            stop_result,
-                        )
-                        break
-
-                    if error_code != "bad_end_reason":
-                        logger.warning(
-                            "AUTO_STOP_STALE_SHIFT_REJECTED shift_id=%s reason=%s error=%s result=%s",
-                            shift_id_to_stop,
-                            end_reason,
-                            error_code,
-                            stop_result,
-                        )
-                        break
+                if not is_error:
+                    auto_stopped = True
+                    logger.info(
+                        "AUTO_STOP_STALE_SHIFT_ACCEPTED shift_id=%s reason=%s result=%s",
+                        shift_id_to_stop,
+                        end_reason,
+                        stop_result,
+                    )
+                    break
 
+                if error_code != "bad_end_reason":
                     logger.warning(
-                        "AUTO_STOP_STALE_SHIFT_BAD_REASON shift_id=%s reason=%s -> retry",
+                        "AUTO_STOP_STALE_SHIFT_REJECTED shift_id=%s reason=%s error=%s result=%s",
                         shift_id_to_stop,
                         end_reason,
+                        error_code,
+                        stop_result,
                     )
+                    break
 
-                if auto_stopped:
-                    # Verify on server that shift is truly closed.
-                    session.last_active_shift_refresh_ts = 0.0
-                    await _refresh_active_shift_if_needed(session, now)
-                    auto_stopped = not bool(session.active_shift_id)
+                logger.warning(
+                    "AUTO_STOP_STALE_SHIFT_BAD_REASON shift_id=%s reason=%s -> retry",
+                    shift_id_to_stop,
+                    end_reason,
+                )
+
+            if auto_stopped:
+                # Verify on server that shift is truly closed.
+                session.last_active_shift_refresh_ts = 0.0
+                await _refresh_active_shift_if_needed(session, now)
+                auto_stopped = not bool(session.active_shift_id)
+
+            logger.info(
+                "AUTO_STOP_STALE_SHIFT shift_id=%s round=%s auto_stopped=%s result=%s end_at=%s",
+                shift_id_to_stop,
+                next_round,
+                auto_stopped,
+                stop_result,
+                end_at_ts,
+            )
+
+            if auto_stopped:
+                _stop_monitoring_session(session)
+                try:
+                    await context.bot.send_message(
+                        chat_id=session.chat_id,
+                        text=(
+                            "🔴 Смена закрыта автоматически после повторной потери геопозиции.\n"
+                            "Администратор проведет проверку. Если это ошибка — смену восстановят "
+                            "без потери рабочего времени."
+                        ),
+                    )
+                except Exception as exc:
+                    logger.error("AUTO_STOP_STALE_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
+                continue
+
+            logger.warning(
+                "AUTO_STOP_STALE_SHIFT_NOT_CONFIRMED shift_id=%s result=%s",
+                shift_id_to_stop,
+                stop_result,
+            )
+
+            response = violation_response
+
+            decisions = response.get("decisions", {}) if isinstance(response, dict) else {}
+            admin_chat_ids = response.get("admin_chat_ids", []) if isinstance(response, dict) else []
+            logger.info(
+                "VIOLATION_TICK_DECISIONS shift_id=%s decisions=%s admin_chat_ids=%s",
+                session.active_shift_id,
+                decisions,
+                admin_chat_ids,
+            )
 
+            if isinstance(response, dict) and response.get("error") == "shift_not_active":
+                logger.warning(
+                    "VIOLATION_TICK_SHIFT_NOT_ACTIVE user=%s shift_id=%s -> stop monitoring",
+                    session.user_id,
+                    session.active_shift_id,
+                )
+                _stop_monitoring_session(session)
+                try:
+                    await context.bot.send_message(
+                        chat_id=session.chat_id,
+                        text="⚠️ Ваша смена завершена администратором. Если это ошибка — свяжитесь с нами.",
+                    )
+                except Exception as exc:
+                    logger.error("SHIFT_ENDED_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
+                continue
 
+            if decisions.get("staff_warn"):
                 logger.info(
-                    "AUTO_STOP_STALE_SHIFT shift_id=%s round=%s auto_stopped=%s result=%s end_at=%s",
-                    shift_id_to_stop,
-                    next_round,
-                    auto_stopped,
-                    stop_result,
-                    end_at_ts,
+                    "VIOLATION_TICK_STAFF_WARN_ALREADY_SENT user=%s shift_id=%s",
+                    session.user_id,
+                    session.active_shift_id,
                 )
 
-                if auto_stopped:
-                    _stop_monitoring_session(session)
-                    try:
-                        await context.bot.send_message(
-                            chat_id=session.chat_id,
-                            text=(
-                                "🔴 Смена закрыта автоматически после повторной потери геопозиции.\n"
-                                "Администратор проведет проверку. Если это ошибка — смену восстановят "
-                                "без потери рабочего времени."
-                            ),
-                        )
-                    except Exception as exc:
-                        logger.error("AUTO_STOP_STALE_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
-                    continue
+            if decisions.get("admin_notify"):
+                shift_id = session.active_shift_id
+                staff_name = getattr(session, "active_staff_name", None) or f"{session.user_id}"
 
-                logger.warning(
-                    "AUTO_STOP_STALE_SHIFT_NOT_CONFIRMED shift_id=%s result=%s",
-                    shift_id_to_stop,
-                    stop_result,
+                point_label = getattr(session, "active_point_name", None) or (
+                    f"id={getattr(session, 'active_point_id', None)}"
+                    if getattr(session, "active_point_id", None) is not None
+                    else "—"
                 )
+                staff_phone = getattr(session, "active_staff_phone", None) or "не указан"
 
-                response = violation_response
+                admin_text = (
+                    f"Сотрудник {staff_name} пропал с радаров на точке {point_label}.\n"
 
+                    f"Телефон сотрудника: {staff_phone}\n\n"
+                    "Требуется ручная проверка по камерам. "
+                    "Заявка на подозрение отправлена на сайт для рассмотрения."
+                )
 
-                decisions = response.get("decisions", {}) if isinstance(response, dict) else {}
-                admin_chat_ids = response.get("admin_chat_ids", []) if isinstance(response, dict) else []
-                logger.info(
-                    "VIOLATION_TICK_DECISIONS shift_id=%s decisions=%s admin_chat_ids=%s",
-                    session.active_shift_id,
-                    decisions,
-                    admin_chat_ids,
+                await notify_admins(
+                    context,
+                    admin_text,
+                    shift_id=shift_id,
+                    cooldown_key="admin_notify_stale",
                 )
 
-                if isinstance(response, dict) and response.get("error") == "shift_not_active":
-                    logger.warning(
-                        "VIOLATION_TICK_SHIFT_NOT_ACTIVE user=%s shift_id=%s -> stop monitoring",
-                        session.user_id,
-                        session.active_shift_id,
-                    )
-                    _stop_monitoring_session(session)
-                    try:
-                        await context.bot.send_message(
-                            chat_id=session.chat_id,
-                            text="⚠️ Ваша смена завершена администратором. Если это ошибка — свяжитесь с нами.",
-                        )
-                    except Exception as exc:
-                        logger.error("SHIFT_ENDED_NOTIFY_FAIL chat_id=%s error=%s", session.chat_id, exc)
-                    continue
+    return job_check_stale
 
-                if decisions.get("staff_warn"):
-                    logger.info(
-                        "VIOLATION_TICK_STAFF_WARN_ALREADY_SENT user=%s shift_id=%s",
-                        session.user_id,
-                        session.active_shift_id,
-                    )
 
-                if decisions.get("admin_notify"):
-                    shift_id = session.active_shift_id
-                    staff_name = getattr(session, "active_staff_name", None) or f"{session.user_id}"
+def build_job_replay_ping_journal(replayer, logger):
+    async def job_replay_ping_journal(context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await replayer.drain()
+        except Exception as exc:
+            logger.error("PING_JOURNAL_REPLAY_FAILED error=%s", exc)
+
+    return job_replay_ping_journal
 
-                    point_label = getattr(session, "active_point_name", None) or (
-                        f"id={getattr(session, 'active_point_id', None)}"
-                        if getattr(session, "active_point_id", None) is not None
-                        else "—"
-                    )
-                    staff_phone = getattr(session, "active_staff_phone", None) or "не указан"
 
-                    admin_text = (
-                        f"Сотрудник {staff_name} пропал с радаров на точке {point_label}.\n"
+def build_job_refresh_admin_directory(directory, logger):
+    async def job_refresh_admin_directory(context: ContextTypes.DEFAULT_TYPE):
+        if not directory.is_stale():
+            return
+        try:
+            await directory.refresh()
+        except Exception as exc:
+            logger.error("ADMIN_DIRECTORY_JOB_FAILED error=%s", exc)
 
-                        f"Телефон сотрудника: {staff_phone}\n\n"
-                        "Требуется ручная проверка по камерам. "
-                        "Заявка на подозрение отправлена на сайт для рассмотрения."
-                    )
+    return job_refresh_admin_directory
 
-                    await notify_admins(
-                        context,
-                        admin_text,
-                        shift_id=shift_id,
-                        cooldown_key="admin_notify_stale",
-                    )
 
-    return job_check_stale
+def build_job_memory_report(inspector, logger):
+    async def job_memory_report(context: ContextTypes.DEFAULT_TYPE):
+        report = inspector.report()
+        inspector.export(report)
+        largest = sorted(report["structures"].items(), key=lambda item: item[1]["bytes"], reverse=True)[:5]
+        logger.info(
+            "MEMORY_REPORT rss_bytes=%s walk_ms=%.0f largest=%s",
+            report["rss_bytes"],
+            report["walk_sec"] * 1000,
+            {name: (stats["entries"], stats["bytes"]) for name, stats in largest},
+        )
+
+    return job_memory_report
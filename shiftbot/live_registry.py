@@ -1,7 +1,8 @@
-import time
 from dataclasses import dataclass
 from typing import Dict
 
+from shiftbot import clock
+
 
 @dataclass
 class PairState:
@@ -21,7 +22,7 @@ class LiveShiftRegistry:
         return f"{left}:{right}"
 
     def cleanup_stale(self, stale_timeout_sec: int, now_ts: float | None = None) -> None:
-        now = now_ts or time.time()
+        now = now_ts or clock.now()
         stale_ids = [
             shift_id
             for shift_id, data in self._shifts.items()
@@ -46,7 +47,7 @@ class LiveShiftRegistry:
             "point_id": point_id,
             "last_bucket_key": bucket_key,
             "same_gps_streak": 0,
-            "last_seen_ts": now_ts or time.time(),
+            "last_seen_ts": now_ts or clock.now(),
         }
 
     def remove_shift(self, shift_id: int) -> None:
@@ -85,7 +86,7 @@ class LiveShiftRegistry:
         state = self._pair_states.get(pair_key)
         if not state:
             return False
-        now = now_ts or time.time()
+        now = now_ts or clock.now()
         if (now - state.last_notify_ts) < cooldown_sec:
             return False
         state.last_notify_ts = now
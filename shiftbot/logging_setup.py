@@ -1,9 +1,123 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+from shiftbot import config
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def event_name(record: logging.LogRecord) -> str:
+    """Leading CAPS_EVENT token of the format string, e.g. ``PING_ADD``."""
+    msg = record.msg if isinstance(record.msg, str) else ""
+    head = msg.split(" ", 1)[0].strip("[]")
+    return head if head and head.replace("_", "").isalnum() and head.upper() == head else ""
+
+
+class EventSamplingFilter(logging.Filter):
+    """Thins high-frequency INFO/DEBUG events; WARNING and above always pass.
+
+    ``sample_rates`` keeps a deterministic share of an event (0.1 → every 10th record),
+    ``rate_limits`` caps an event to N records per second with a token bucket.
+    """
+
+    def __init__(
+        self,
+        sample_rates: dict[str, float] | None = None,
+        rate_limits: dict[str, float] | None = None,
+        *,
+        clock=time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.sample_every = {
+            name: max(int(round(1.0 / rate)), 1) if rate > 0 else 0 for name, rate in (sample_rates or {}).items()
+        }
+        self.rate_limits = dict(rate_limits or {})
+        self.clock = clock
+        self._seen: dict[str, int] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self.dropped: dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or (not self.sample_every and not self.rate_limits):
+            return True
+        name = event_name(record)
+        if not name:
+            return True
+
+        every = self.sample_every.get(name)
+        if every is not None:
+            seen = self._seen.get(name, 0)
+            self._seen[name] = seen + 1
+            if every == 0 or seen % every:
+                return self._drop(name)
+
+        limit = self.rate_limits.get(name)
+        if limit is not None:
+            now = self.clock()
+            tokens, updated = self._buckets.get(name, (limit, now))
+            tokens = min(limit, tokens + (now - updated) * limit)
+            if tokens < 1.0:
+                self._buckets[name] = (tokens, now)
+                return self._drop(name)
+            self._buckets[name] = (tokens - 1.0, now)
+        return True
+
+    def _drop(self, name: str) -> bool:
+        self.dropped[name] = self.dropped.get(name, 0) + 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": event_name(record) or None,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
 
 
 def setup_logging() -> logging.Logger:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    )
+    """Root logging goes through a queue; a listener thread formats and writes to stderr.
+
+    Handlers on the event loop only enqueue records, so a slow terminal or disk never
+    stalls update processing.
+    """
+    global _listener
+    if _listener is not None:
+        return logging.getLogger("shiftbot")
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(EventSamplingFilter(config.LOG_SAMPLE, config.LOG_RATE_LIMIT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(getattr(logging, config.LOG_LEVEL, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
     return logging.getLogger("shiftbot")
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,123 @@
+"""Event-loop lag monitor and load shedding.
+
+``LoopLagMonitor.run()`` sleeps ``interval_sec`` in a loop and measures how late it wakes
+up: that delay is what every handler waiting on the loop pays too. When a sample reaches
+``shed_lag_sec`` the monitor switches to shedding until a sample drops to
+``recover_lag_sec`` or below. While shedding, optional work asks ``should_shed(kind)``
+and is skipped (companion notifications, dead-soul alert enrichment), and DEBUG logging
+is switched off. Shift start/end and ping recording never consult the monitor.
+"""
+
+import asyncio
+import logging
+import time
+
+from shiftbot import config
+from shiftbot.metrics import REGISTRY
+from shiftbot.request_stats import LatencyHistogram
+
+LOOP_LAG = REGISTRY.histogram(
+    "shiftbot_event_loop_lag_seconds",
+    "How late the event loop woke a sleeping task.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_SHEDDING = REGISTRY.gauge("shiftbot_load_shedding", "1 while optional work is being shed.")
+SHED_TOTAL = REGISTRY.counter("shiftbot_shed_total", "Optional work skipped under loop lag, by kind.", ("kind",))
+SHED_TRANSITIONS_TOTAL = REGISTRY.counter(
+    "shiftbot_load_shedding_transitions_total", "Load shedding switched on or off.", ("state",)
+)
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        *,
+        interval_sec: float,
+        shed_lag_sec: float,
+        recover_lag_sec: float,
+        logger=None,
+        log_root: logging.Logger | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        self.interval_sec = interval_sec
+        self.shed_lag_sec = shed_lag_sec
+        self.recover_lag_sec = recover_lag_sec
+        self.logger = logger or logging.getLogger(__name__)
+        self.log_root = log_root or logging.getLogger()
+        self.clock = clock
+        self.lag = LatencyHistogram(LOOP_LAG.buckets)
+        self.last_lag_sec = 0.0
+        self.shedding = False
+        self.shed: dict[str, int] = {}
+        self._saved_log_level: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.shed_lag_sec > 0
+
+    async def run(self) -> None:
+        """Sample loop lag until cancelled."""
+        while True:
+            expected = self.clock() + self.interval_sec
+            await asyncio.sleep(self.interval_sec)
+            self.observe(max(self.clock() - expected, 0.0))
+
+    def observe(self, lag_sec: float) -> None:
+        self.last_lag_sec = lag_sec
+        self.lag.observe(lag_sec)
+        if not self.enabled:
+            return
+        if not self.shedding and lag_sec >= self.shed_lag_sec:
+            self._set_shedding(True)
+        elif self.shedding and lag_sec <= self.recover_lag_sec:
+            self._set_shedding(False)
+
+    def should_shed(self, kind: str) -> bool:
+        """``True`` when optional work of ``kind`` must be skipped now; counts the skip."""
+        if not self.shedding:
+            return False
+        self.shed[kind] = self.shed.get(kind, 0) + 1
+        SHED_TOTAL.inc(kind=kind)
+        return True
+
+    def _set_shedding(self, shedding: bool) -> None:
+        self.shedding = shedding
+        LOOP_SHEDDING.set(1 if shedding else 0)
+        SHED_TRANSITIONS_TOTAL.inc(state="on" if shedding else "off")
+        if shedding:
+            self.logger.warning("LOAD_SHEDDING_ON lag_sec=%.3f threshold_sec=%s", self.last_lag_sec, self.shed_lag_sec)
+            level = self.log_root.level
+            if level < logging.INFO:
+                self._saved_log_level = level
+                self.log_root.setLevel(logging.INFO)
+        else:
+            if self._saved_log_level is not None:
+                self.log_root.setLevel(self._saved_log_level)
+                self._saved_log_level = None
+            self.logger.warning("LOAD_SHEDDING_OFF lag_sec=%.3f shed=%s", self.last_lag_sec, self.shed)
+
+    def snapshot(self) -> dict:
+        return {
+            "shedding": self.shedding,
+            "last_lag_sec": self.last_lag_sec,
+            "lag": self.lag.as_dict(),
+            "shed": dict(self.shed),
+        }
+
+
+LOOP_MONITOR = LoopLagMonitor(
+    interval_sec=config.LOOP_LAG_SAMPLE_SEC,
+    shed_lag_sec=config.LOOP_LAG_SHED_SEC,
+    recover_lag_sec=config.LOOP_LAG_RECOVER_SEC,
+)
+LOOP_LAG.children[()] = LOOP_MONITOR.lag
+
+
+def format_loop_stats(snapshot: dict) -> str:
+    lag = snapshot["lag"]
+    shed = ", ".join(f"{kind} {count}" for kind, count in sorted(snapshot["shed"].items())) or "—"
+    return (
+        f"Event loop: лаг сейчас {snapshot['last_lag_sec'] * 1000:.0f}мс, "
+        f"p95≤{lag['p95_sec'] * 1000:.0f}мс max {lag['max_sec'] * 1000:.0f}мс, "
+        f"сброс нагрузки {'вкл' if snapshot['shedding'] else 'выкл'}, пропущено: {shed}"
+    )
@@ -1,7 +1,13 @@
+from shiftbot import config
 from shiftbot.app import ShiftBotApp
 from shiftbot.logging_setup import setup_logging
 
 
 def main() -> None:
     logger = setup_logging()
+    if config.SHARD_WORKERS > 1:
+        from shiftbot.sharding import ShardSupervisor
+
+        ShardSupervisor(config.SHARD_WORKERS, logger).run()
+        return
     ShiftBotApp(logger).run()
@@ -0,0 +1,196 @@
+"""Memory accounting per in-process structure.
+
+``MemoryInspector`` is given named sources (sessions, dead-soul trackers, caches,
+``bot_data`` keys, ...) and reports entry counts and an approximate deep size for each.
+The deep size walks plain containers and dataclass instances only; any other object
+(clients, tasks, the application) counts with its shallow ``sys.getsizeof``, so one
+reference to ``oc_client`` does not pull the whole HTTP stack into a structure. One report
+walks every object once: an object shared between structures counts toward the first one
+that reaches it, and ``max_objects`` bounds the whole report, not each structure.
+
+On demand the inspector also drives ``tracemalloc``: ``trace_start()`` takes a baseline
+snapshot, ``trace_diff()`` shows which source lines allocated the most since then.
+"""
+
+import collections
+import dataclasses
+import os
+import sys
+import time
+import tracemalloc
+
+from shiftbot.metrics import REGISTRY
+
+MEMORY_ENTRIES = REGISTRY.gauge("shiftbot_memory_entries", "Entries in in-process structures.", ("structure",))
+MEMORY_BYTES = REGISTRY.gauge(
+    "shiftbot_memory_bytes", "Approximate deep size of in-process structures.", ("structure",)
+)
+PROCESS_RSS_BYTES = REGISTRY.gauge("shiftbot_process_rss_bytes", "Resident set size of the process.")
+MEMORY_REPORT_DURATION = REGISTRY.histogram(
+    "shiftbot_memory_report_duration_seconds", "Time spent walking structures for one memory report."
+)
+
+_CONTAINERS = (dict, list, tuple, set, frozenset, collections.deque)
+_SCALARS = (str, bytes, int, float, bool, type(None))
+# dataclass type -> field names; dataclasses.fields() is slow to call per instance
+_FIELD_NAMES: dict[type, tuple[str, ...]] = {}
+
+
+def _field_values(item) -> list:
+    names = _FIELD_NAMES.get(type(item))
+    if names is None:
+        names = _FIELD_NAMES[type(item)] = tuple(field.name for field in dataclasses.fields(item))
+    values = item.__dict__ if hasattr(item, "__dict__") else None
+    if values is not None:
+        return [values.get(name) for name in names]
+    return [getattr(item, name, None) for name in names]
+
+
+def deep_sizeof(obj, *, max_objects: int = 200_000, seen: set[int] | None = None) -> tuple[int, bool]:
+    """``(bytes, complete)``; ``complete`` is ``False`` when ``max_objects`` cut the walk short.
+
+    Objects already in ``seen`` are skipped; pass one set to several calls to count each
+    object once and share the ``max_objects`` budget between them.
+    """
+    if seen is None:
+        seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        if len(seen) >= max_objects:
+            return total, False
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, _SCALARS):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, _CONTAINERS):
+            stack.extend(item)
+        elif dataclasses.is_dataclass(item) and not isinstance(item, type):
+            stack.extend(_field_values(item))
+    return total, True
+
+
+def process_rss_bytes() -> int | None:
+    """Current RSS from ``/proc``; ``None`` where it is not available."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            resident_pages = int(handle.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+    )
+
+
+class MemoryInspector:
+    def __init__(self, *, max_objects: int = 200_000, trace_frames: int = 1, clock=time.perf_counter) -> None:
+        self.max_objects = max_objects
+        self.trace_frames = trace_frames
+        self.clock = clock
+        self._sources: dict[str, object] = {}
+        self._baseline: tracemalloc.Snapshot | None = None
+        self.last_report: dict | None = None
+
+    def add_source(self, name: str, source) -> None:
+        """``source()`` returns the structure to measure, or a ``MemoryGroup`` reported as ``name.key``."""
+        self._sources[name] = source
+
+    def report(self) -> dict:
+        started = self.clock()
+        structures = {}
+        seen: set[int] = set()
+        for name, source in self._sources.items():
+            value = source()
+            if isinstance(value, MemoryGroup):
+                for key, member in value.members.items():
+                    structures[f"{name}.{key}"] = self._measure(member, seen)
+            else:
+                structures[name] = self._measure(value, seen)
+        elapsed = self.clock() - started
+        result = {
+            "structures": structures,
+            "rss_bytes": process_rss_bytes(),
+            "walk_sec": elapsed,
+        }
+        self.last_report = result
+        return result
+
+    def _measure(self, value, seen: set[int]) -> dict:
+        size, complete = deep_sizeof(value, max_objects=self.max_objects, seen=seen)
+        try:
+            entries = len(value)
+        except TypeError:
+            entries = 1
+        return {"entries": entries, "bytes": size, "complete": complete}
+
+    def export(self, report: dict) -> None:
+        for name, stats in report["structures"].items():
+            MEMORY_ENTRIES.set(stats["entries"], structure=name)
+            MEMORY_BYTES.set(stats["bytes"], structure=name)
+        if report["rss_bytes"] is not None:
+            PROCESS_RSS_BYTES.set(report["rss_bytes"])
+        MEMORY_REPORT_DURATION.observe(report["walk_sec"])
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    def trace_start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        self._baseline = _take_snapshot()
+
+    def trace_diff(self, top: int = 10) -> list[tracemalloc.StatisticDiff]:
+        """Allocation growth by source line since ``trace_start()`` (or the previous diff)."""
+        if not tracemalloc.is_tracing() or self._baseline is None:
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = _take_snapshot()
+        stats = snapshot.compare_to(self._baseline, "lineno")
+        self._baseline = snapshot
+        return stats[:top]
+
+    def trace_stop(self) -> None:
+        self._baseline = None
+        tracemalloc.stop()
+
+
+class MemoryGroup:
+    """Several structures reported under one source name, e.g. ``bot_data`` by key."""
+
+    __slots__ = ("members",)
+
+    def __init__(self, members: dict) -> None:
+        self.members = members
+
+
+def format_memory_report(report: dict, top: int = 15) -> str:
+    rss = report["rss_bytes"]
+    lines = [
+        f"Память: RSS {rss / 2**20:.1f} МБ" if rss is not None else "Память: RSS неизвестен",
+        f"Обход структур {report['walk_sec'] * 1000:.0f}мс",
+    ]
+    ranked = sorted(report["structures"].items(), key=lambda item: item[1]["bytes"], reverse=True)
+    for name, stats in ranked[:top]:
+        mark = "" if stats["complete"] else " (не полностью)"
+        lines.append(f"{name}: {stats['entries']} шт, ~{stats['bytes'] / 1024:.0f} КБ{mark}")
+    return "\n".join(lines)
+
+
+def format_trace_diff(stats: list) -> str:
+    if not stats:
+        return "С прошлого снимка роста нет."
+    lines = ["Рост аллокаций с прошлого снимка:"]
+    for stat in stats:
+        frame = stat.traceback[0]
+        lines.append(f"{frame.filename}:{frame.lineno} {stat.size_diff / 1024:+.0f} КБ ({stat.count_diff:+d} объектов)")
+    return "\n".join(lines)
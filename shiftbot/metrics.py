@@ -0,0 +1,346 @@
+"""In-process metrics registry with a Prometheus text endpoint.
+
+Metrics are plain Python objects updated at the existing log points; ``render()`` walks
+the registry and prints the text exposition format. Gauges that mirror live state
+(sessions, trackers, queues) are filled by collectors registered by the app right before
+each scrape, so the hot path never pays for them.
+"""
+
+import asyncio
+import logging
+import time
+
+from shiftbot.request_stats import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Mirror a total that is counted elsewhere (e.g. in ``RequestStats``)."""
+        self.values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = (), buckets=None) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self.children: dict[tuple, LatencyHistogram] = {}
+
+    def child(self, **labels) -> LatencyHistogram:
+        key = self._key(labels)
+        hist = self.children.get(key)
+        if hist is None:
+            hist = self.children[key] = LatencyHistogram(self.buckets) if self.buckets else LatencyHistogram()
+        return hist
+
+    def observe(self, value: float, **labels) -> None:
+        self.child(**labels).observe(value)
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self.child(**labels))
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, hist in sorted(self.children.items()):
+            cumulative = 0
+            for bound, count in zip([*hist.bounds, float("inf")], hist.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(hist.total_sec)}")
+            lines.append(f"{self.name}_count{labels} {hist.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "started")
+
+    def __init__(self, hist: LatencyHistogram) -> None:
+        self.hist = hist
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.hist.observe(time.perf_counter() - self.started)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list = []
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, tuple(labelnames), **kwargs)
+        elif type(metric) is not cls:
+            raise ValueError(f"metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=None) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def add_collector(self, collector) -> None:
+        """``collector()`` runs before every render to refresh state-mirroring metrics."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as exc:
+                logger.warning("METRICS_COLLECTOR_FAILED collector=%s error=%s", collector, exc)
+        lines: list[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_DURATION = REGISTRY.histogram(
+    "shiftbot_handler_duration_seconds", "Handler latency by handler type and callback.", ("handler",)
+)
+PINGS_TOTAL = REGISTRY.counter("shiftbot_pings_total", "Pings accepted by OpenCart, by status.", ("status",))
+PINGS_UNDELIVERED_TOTAL = REGISTRY.counter(
+    "shiftbot_pings_undelivered_total", "Pings that hit an unavailable API, by outcome.", ("outcome",)
+)
+STALE_TOTAL = REGISTRY.counter("shiftbot_stale_total", "Active shifts marked stale.")
+STALE_JOB_DURATION = REGISTRY.histogram("shiftbot_stale_job_duration_seconds", "Duration of one stale check run.")
+ADMIN_ALERTS_TOTAL = REGISTRY.counter("shiftbot_admin_alerts_total", "Admin alerts sent, by type.", ("alert_type",))
+CACHE_LOOKUPS_TOTAL = REGISTRY.counter(
+    "shiftbot_cache_lookups_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result")
+)
+SESSIONS = REGISTRY.gauge("shiftbot_sessions", "Sessions in memory, by state.", ("state",))
+DEAD_SOUL_TRACKERS = REGISTRY.gauge("shiftbot_dead_soul_trackers", "Dead-soul detector state sizes.", ("kind",))
+QUEUE_DEPTH = REGISTRY.gauge("shiftbot_queue_depth", "Items waiting in internal queues.", ("queue",))
+OC_REQUEST_DURATION = REGISTRY.histogram(
+    "shiftbot_opencart_request_duration_seconds", "OpenCart request latency incl. retries.", ("route",)
+)
+OC_REQUESTS_TOTAL = REGISTRY.counter("shiftbot_opencart_requests_total", "OpenCart requests.", ("route",))
+OC_RETRIES_TOTAL = REGISTRY.counter("shiftbot_opencart_retries_total", "OpenCart retry attempts.", ("route",))
+OC_ERRORS_TOTAL = REGISTRY.counter("shiftbot_opencart_errors_total", "OpenCart transport errors.", ("route",))
+OC_RESPONSES_TOTAL = REGISTRY.counter(
+    "shiftbot_opencart_responses_total", "OpenCart responses by status code.", ("route", "code")
+)
+OC_BYTES_TOTAL = REGISTRY.counter(
+    "shiftbot_opencart_bytes_total", "OpenCart payload bytes by direction.", ("route", "direction")
+)
+OC_IN_FLIGHT = REGISTRY.gauge("shiftbot_opencart_in_flight", "OpenCart requests in progress.", ("route",))
+
+OC_LANE_LIMIT = REGISTRY.gauge("shiftbot_opencart_lane_limit", "Concurrency limit per traffic lane.", ("lane",))
+OC_LANE_IN_FLIGHT = REGISTRY.gauge("shiftbot_opencart_lane_in_flight", "Requests running per traffic lane.", ("lane",))
+OC_LANE_WAITING = REGISTRY.gauge("shiftbot_opencart_lane_waiting", "Requests queued per traffic lane.", ("lane",))
+OC_LANE_WAIT = REGISTRY.histogram(
+    "shiftbot_opencart_lane_wait_seconds", "Time spent waiting for a traffic lane slot.", ("lane",)
+)
+
+OC_LIMIT = REGISTRY.gauge("shiftbot_opencart_adaptive_limit", "Current adaptive concurrency window.")
+OC_LIMIT_WAITING = REGISTRY.gauge("shiftbot_opencart_adaptive_waiting", "Requests queued for the adaptive window.")
+OC_LIMIT_DECREASES = REGISTRY.counter(
+    "shiftbot_opencart_adaptive_decreases_total", "Times the adaptive window was shrunk."
+)
+OC_LIMIT_QUEUE_WAIT = REGISTRY.histogram(
+    "shiftbot_opencart_adaptive_queue_wait_seconds", "Time spent waiting for the adaptive window."
+)
+
+BACKEND_CALL_DURATION = REGISTRY.histogram(
+    "shiftbot_backend_call_duration_seconds",
+    "Outbound OpenCart / Telegram calls by originating handler.",
+    ("handler", "target", "op"),
+)
+BACKEND_CALLS_PER_UPDATE_MAX = REGISTRY.gauge(
+    "shiftbot_backend_calls_per_update_max", "Most outbound calls made for one update.", ("handler", "target")
+)
+HANDLER_UPDATES_TOTAL = REGISTRY.counter("shiftbot_handler_updates_total", "Updates handled, by handler.", ("handler",))
+
+
+def export_call_accounting(accounting) -> None:
+    """Mirror ``call_budget.ACCOUNTING`` into the backend call metrics."""
+    for handler, stats in accounting.handlers.items():
+        HANDLER_UPDATES_TOTAL.set_total(stats.updates, handler=handler)
+        for target, target_stats in stats.targets.items():
+            BACKEND_CALLS_PER_UPDATE_MAX.set(target_stats.max_per_update, handler=handler, target=target)
+            for op, hist in target_stats.ops.items():
+                BACKEND_CALL_DURATION.children[(handler, target, op)] = hist
+
+
+def export_limiter_stats(limiter) -> None:
+    OC_LIMIT_QUEUE_WAIT.children[()] = limiter.queue_wait
+    OC_LIMIT.set(limiter.limit)
+    OC_LIMIT_WAITING.set(limiter.waiting)
+    OC_LIMIT_DECREASES.set_total(limiter.decreases)
+
+
+def export_request_stats(stats) -> None:
+    """Mirror an ``OpenCartClient.stats`` into the OpenCart metrics."""
+    for lane, lane_stats in stats.lanes.items():
+        OC_LANE_WAIT.children[(lane,)] = lane_stats.wait
+        OC_LANE_LIMIT.set(lane_stats.limit, lane=lane)
+        OC_LANE_IN_FLIGHT.set(lane_stats.in_flight, lane=lane)
+        OC_LANE_WAITING.set(lane_stats.waiting, lane=lane)
+    for route, route_stats in stats.routes.items():
+        OC_REQUEST_DURATION.children[(route,)] = route_stats.latency
+        OC_REQUESTS_TOTAL.set_total(route_stats.requests, route=route)
+        OC_RETRIES_TOTAL.set_total(route_stats.retries, route=route)
+        OC_ERRORS_TOTAL.set_total(route_stats.errors, route=route)
+        OC_IN_FLIGHT.set(route_stats.in_flight, route=route)
+        OC_BYTES_TOTAL.set_total(route_stats.bytes_in, route=route, direction="in")
+        OC_BYTES_TOTAL.set_total(route_stats.bytes_out, route=route, direction="out")
+        for code, count in route_stats.statuses.items():
+            OC_RESPONSES_TOTAL.set_total(count, route=route, code=str(code))
+
+
+def instrument_handler(handler):
+    """Wrap a PTB handler's callback so its latency lands in ``HANDLER_DURATION``."""
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return handler
+    hist = HANDLER_DURATION.child(handler=f"{type(handler).__name__}:{getattr(callback, '__name__', 'callback')}")
+
+    async def timed_callback(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            hist.observe(time.perf_counter() - started)
+
+    handler.callback = timed_callback
+    return handler
+
+
+class MetricsServer:
+    """Minimal HTTP server answering ``GET /metrics`` on a local port."""
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int, logger) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.logger = logger
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def bound_port(self) -> int | None:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.logger.info("METRICS_SERVER_STARTED host=%s port=%s", self.host, self.bound_port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), timeout=5.0)
+                if header in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+            if len(parts) >= 2 and parts[0] == "GET" and path == "/metrics":
+                status, content_type, body = "200 OK", CONTENT_TYPE, self.registry.render().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+            writer.write(
+                (
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as exc:
+            self.logger.warning("METRICS_REQUEST_FAILED error=%s", exc)
+        finally:
+            writer.close()
@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
 from typing import Optional
 
+from shiftbot.geo import Geofence
+
 STATUS_IDLE = "IDLE"
 STATUS_IN = "IN"
 STATUS_OUT = "OUT"
@@ -31,13 +33,17 @@ class ShiftSession:
     selected_role: Optional[str] = None
     gate_attempt: int = 0
     gate_last_reason: Optional[str] = None
+    point_suggestions_sent: bool = False
 
+    # staff_id в OpenCart; запоминается при первом получении, сменой не сбрасывается
+    staff_id: Optional[int] = None
     active_shift_id: Optional[int] = None
     active_point_id: Optional[int] = None
     active_point_name: Optional[str] = None
     active_point_lat: Optional[float] = None
     active_point_lon: Optional[float] = None
     active_point_radius: Optional[float] = None
+    active_geofence: Optional[Geofence] = field(default=None, repr=False)
     active_role: Optional[str] = None
     active_staff_name: Optional[str] = None
     active_staff_phone: Optional[str] = None
@@ -5,24 +5,114 @@ import time
 
 import httpx
 
+from shiftbot import clock, deadline
+from shiftbot.call_budget import TARGET_OPENCART, record_call
+from shiftbot.request_stats import RequestStats
+
+# an attempt with less time left than this is not started
+MIN_ATTEMPT_SEC = 0.05
+
+# Traffic classes: each has its own connection pool and concurrency limit, so a burst of
+# pings or stale-job ticks never queues a courier's shift start behind it.
+TRAFFIC_INTERACTIVE = "interactive"
+TRAFFIC_PING = "ping"
+TRAFFIC_BULK = "bulk"
+DEFAULT_LANE_LIMITS = {TRAFFIC_INTERACTIVE: 10, TRAFFIC_PING: 20, TRAFFIC_BULK: 5}
+# order in which lanes get slots of the adaptive limiter
+LANE_PRIORITY = {TRAFFIC_INTERACTIVE: 0, TRAFFIC_PING: 1, TRAFFIC_BULK: 2}
+ROUTE_TRAFFIC_CLASS = {
+    "dl/geo_api/ping_add": TRAFFIC_PING,
+    "dl/geo_api/violation_tick": TRAFFIC_BULK,
+    "dl/geo_api/active_shifts_by_point": TRAFFIC_BULK,
+    "dl/geo_api/admin_chat_ids": TRAFFIC_BULK,
+    "dl/geo_api/active_shifts_bulk": TRAFFIC_BULK,
+    "dl/geo_api/violation_tick_many": TRAFFIC_BULK,
+    "dl/geo_api": TRAFFIC_BULK,
+}
+
 
 class ApiUnavailableError(RuntimeError):
     pass
 
 
+class DeadlineExceeded(ApiUnavailableError):
+    """The caller's time budget ran out before the request could complete."""
+
+
+class AttemptLog:
+    """When the latest attempt of one call started; route stats are shared with concurrent calls."""
+
+    __slots__ = ("started",)
+
+    def __init__(self) -> None:
+        self.started: float | None = None
+
+    def elapsed(self) -> float | None:
+        return None if self.started is None else time.perf_counter() - self.started
+
+
+class TrafficLane:
+    __slots__ = ("name", "client", "semaphore", "stats")
+
+    def __init__(self, name: str, client: httpx.AsyncClient, limit: int, stats) -> None:
+        self.name = name
+        self.client = client
+        self.semaphore = asyncio.Semaphore(limit)
+        self.stats = stats
+
+
 class OpenCartClient:
-    def __init__(self, base_url: str, api_key: str, logger, admin_base_url: str | None = None) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        logger,
+        admin_base_url: str | None = None,
+        *,
+        lane_limits: dict[str, int] | None = None,
+        limiter=None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
         self.base_url = self._normalize_base_url(base_url)
         self.admin_base_url = self._normalize_base_url(admin_base_url) if admin_base_url else None
         self.api_key = api_key
         self.logger = logger
-        self._client = httpx.AsyncClient(
-            timeout=httpx.Timeout(connect=5.0, read=15.0, write=15.0, pool=5.0),
-            headers={"User-Agent": "dl-geo-bot/1.0"},
-            follow_redirects=True,
-        )
+        self.timeout = httpx.Timeout(connect=5.0, read=15.0, write=15.0, pool=5.0)
         self._admin_chat_ids_cache: list[int] | None = None
         self._admin_chat_ids_cache_ts: float = 0.0
+        self.stats = RequestStats()
+        # optional AdaptiveLimiter shared by all lanes: it protects the one backend behind them
+        self.limiter = limiter
+        limits = {**DEFAULT_LANE_LIMITS, **(lane_limits or {})}
+        self.lanes = {
+            name: TrafficLane(
+                name,
+                httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                    headers={"User-Agent": "dl-geo-bot/1.0"},
+                    follow_redirects=True,
+                    transport=transport,
+                ),
+                limit,
+                self.stats.lane(name, limit),
+            )
+            for name, limit in limits.items()
+        }
+        # clients replaced through the ``_client`` setter, closed by ``aclose``
+        self._replaced_clients: list[httpx.AsyncClient] = []
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return self.lanes[TRAFFIC_INTERACTIVE].client
+
+    @_client.setter
+    def _client(self, client: httpx.AsyncClient) -> None:
+        """Route every lane through one client; prefer passing ``transport`` to the constructor."""
+        for lane in self.lanes.values():
+            if lane.client is not client and lane.client not in self._replaced_clients:
+                self._replaced_clients.append(lane.client)
+            lane.client = client
 
     @staticmethod
     def _normalize_base_url(base_url: str) -> str:
@@ -42,7 +132,47 @@ class OpenCartClient:
         return f"{base.rstrip('/')}/{endpoint}"
 
     async def aclose(self) -> None:
-        await self._client.aclose()
+        closed = set()
+        for client in [*self._replaced_clients, *(lane.client for lane in self.lanes.values())]:
+            if id(client) not in closed:
+                closed.add(id(client))
+                await client.aclose()
+        self._replaced_clients.clear()
+
+    def snapshot(self) -> dict:
+        snapshot = self.stats.snapshot()
+        if self.limiter is not None:
+            snapshot["limiter"] = self.limiter.snapshot()
+        return snapshot
+
+    @staticmethod
+    def _redact_params(params: dict) -> dict:
+        if "key" not in params:
+            return params
+        return {**params, "key": "***"}
+
+    def _attempt_timeout(self):
+        """Client timeouts trimmed to the remaining deadline budget."""
+        left = deadline.remaining()
+        if left is None:
+            return httpx.USE_CLIENT_DEFAULT
+        if left <= MIN_ATTEMPT_SEC:
+            deadline.DEADLINE_EXCEEDED_TOTAL.inc(scope="opencart_request")
+            raise DeadlineExceeded("deadline_exceeded")
+        return httpx.Timeout(
+            connect=min(self.timeout.connect, left),
+            read=min(self.timeout.read, left),
+            write=min(self.timeout.write, left),
+            pool=min(self.timeout.pool, left),
+        )
+
+    @staticmethod
+    def _retry_fits(delay_sec: float) -> bool:
+        left = deadline.remaining()
+        if left is None or left - delay_sec > MIN_ATTEMPT_SEC:
+            return True
+        deadline.DEADLINE_EXCEEDED_TOTAL.inc(scope="opencart_retry")
+        return False
 
     def _require_config(self) -> None:
         if not self.base_url or not self.api_key:
@@ -65,6 +195,101 @@ class OpenCartClient:
         all_params = dict(params or {})
         all_params["key"] = self.api_key
 
+        route = str(all_params.get("route") or endpoint_path)
+        lane = self.lanes[ROUTE_TRAFFIC_CLASS.get(route, TRAFFIC_INTERACTIVE)]
+        route_stats = self.stats.route(route)
+        route_stats.requests += 1
+        route_stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await self._limited_attempts(
+                lane,
+                method,
+                url,
+                all_params,
+                data,
+                json_data,
+                headers,
+                route_stats,
+                return_meta=return_meta,
+            )
+        finally:
+            route_stats.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            route_stats.latency.observe(elapsed)
+            record_call(TARGET_OPENCART, route.removeprefix("dl/geo_api/"), elapsed)
+
+    async def _limited_attempts(self, lane: TrafficLane, *args, return_meta: bool) -> dict:
+        if self.limiter is None:
+            return await self._lane_attempts(lane, *args, return_meta=return_meta)
+
+        # the backend window comes first: a lane slot is never held while queued here
+        await self._wait_for(
+            self.limiter.acquire(LANE_PRIORITY.get(lane.name, 0)), scope=f"opencart_limiter:{lane.name}"
+        )
+        attempt_log = AttemptLog()
+        latency = None
+        failed = False
+        try:
+            result = await self._lane_attempts(lane, *args, return_meta=return_meta, attempt_log=attempt_log)
+            # the final attempt answered: a 502 absorbed by a retry does not shrink the window
+            latency = attempt_log.elapsed()
+            return result
+        except DeadlineExceeded:
+            # our own budget ran out; says nothing about the backend
+            raise
+        except ApiUnavailableError:
+            latency = attempt_log.elapsed()
+            failed = True
+            raise
+        finally:
+            self.limiter.release(latency_sec=latency, failed=failed)
+
+    async def _lane_attempts(
+        self, lane: TrafficLane, *args, return_meta: bool, attempt_log: AttemptLog | None = None
+    ) -> dict:
+        started = time.perf_counter()
+        lane.stats.waiting += 1
+        try:
+            await self._wait_for(lane.semaphore.acquire(), scope=f"opencart_lane:{lane.name}")
+        finally:
+            lane.stats.waiting -= 1
+        lane.stats.wait.observe(time.perf_counter() - started)
+        lane.stats.in_flight += 1
+        try:
+            return await self._request_attempts(lane.client, *args, return_meta=return_meta, attempt_log=attempt_log)
+        finally:
+            lane.stats.in_flight -= 1
+            lane.semaphore.release()
+
+    @staticmethod
+    async def _wait_for(acquire, *, scope: str) -> None:
+        """Await a slot, giving up with ``DeadlineExceeded`` when the budget runs out first."""
+        left = deadline.remaining()
+        if left is None:
+            await acquire
+            return
+        try:
+            async with asyncio.timeout(max(left, 0.0)):
+                await acquire
+        except TimeoutError:
+            deadline.DEADLINE_EXCEEDED_TOTAL.inc(scope=scope)
+            raise DeadlineExceeded("deadline_exceeded") from None
+
+    async def _request_attempts(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        all_params: dict,
+        data: Optional[dict],
+        json_data: Optional[dict],
+        headers: Optional[dict],
+        route_stats,
+        *,
+        return_meta: bool,
+        attempt_log: AttemptLog | None = None,
+    ) -> dict:
         network_backoff = [0.3, 0.8, 1.8]
         status_backoff = [0.3, 0.8]
         network_errors = (
@@ -78,26 +303,33 @@ class OpenCartClient:
         )
 
         for attempt in range(1, len(network_backoff) + 2):
+            if attempt > 1:
+                route_stats.retries += 1
+            if attempt_log is not None:
+                attempt_log.started = time.perf_counter()
             self.logger.info(
                 "API_REQUEST attempt=%s method=%s params=%s has_data=%s",
                 attempt,
                 method,
-                all_params,
+                self._redact_params(all_params),
                 (data is not None or json_data is not None),
             )
+            timeout = self._attempt_timeout()
             try:
                 if method.upper() == "POST":
-                    response = await self._client.request(
+                    response = await client.request(
                         method,
                         url,
                         params=all_params,
                         data=data,
                         json=json_data,
                         headers=headers,
+                        timeout=timeout,
                     )
                 else:
-                    response = await self._client.request(method, url, params=all_params)
+                    response = await client.request(method, url, params=all_params, headers=headers, timeout=timeout)
             except network_errors as exc:
+                route_stats.errors += 1
                 self.logger.warning(
                     "API_REQUEST_EXCEPTION attempt=%s method=%s error_type=%s attempt_no=%s error=%s",
                     attempt,
@@ -107,10 +339,13 @@ class OpenCartClient:
                     exc,
                 )
                 if attempt <= len(network_backoff):
+                    if not self._retry_fits(network_backoff[attempt - 1]):
+                        raise DeadlineExceeded("deadline_exceeded") from exc
                     await asyncio.sleep(network_backoff[attempt - 1])
                     continue
                 raise ApiUnavailableError("temporary_api_error") from exc
             except httpx.HTTPError as exc:
+                route_stats.errors += 1
                 self.logger.warning(
                     "API_REQUEST_EXCEPTION attempt=%s method=%s error_type=%s attempt_no=%s error=%s",
                     attempt,
@@ -121,8 +356,12 @@ class OpenCartClient:
                 )
                 raise ApiUnavailableError("temporary_api_error") from exc
 
+            route_stats.statuses[response.status_code] = route_stats.statuses.get(response.status_code, 0) + 1
+            route_stats.bytes_in += len(response.content)
+            route_stats.bytes_out += len(response.request.content)
+
             if response.status_code in {502, 503, 504}:
-                if attempt <= len(status_backoff):
+                if attempt <= len(status_backoff) and self._retry_fits(status_backoff[attempt - 1]):
                     self.logger.warning(
                         "API_REQUEST_RETRY_STATUS attempt=%s method=%s url=%s status=%s",
                         attempt,
@@ -164,6 +403,10 @@ class OpenCartClient:
                     "text": response.text,
                 }
 
+            if response.status_code == 304 and return_meta:
+                # conditional GET: the cached copy is still current, there is no body
+                return {"ok": True, "status": 304, "json": {}, "text": "", "etag": response.headers.get("etag")}
+
             try:
                 payload = response.json()
             except ValueError as exc:
@@ -176,6 +419,7 @@ class OpenCartClient:
                     "status": response.status_code,
                     "json": payload if isinstance(payload, dict) else {},
                     "text": response.text,
+                    "etag": response.headers.get("etag"),
                 }
 
             return payload if isinstance(payload, dict) else {}
@@ -241,7 +485,6 @@ class OpenCartClient:
             clean_payload["start_acc"] = str(int(payload.get("start_acc")))
 
         self.logger.info("SHIFT_START payload=%s", clean_payload)
-        print(f"SHIFT_START payload={clean_payload}", flush=True)
 
         return await self._request(
             "POST",
@@ -273,6 +516,8 @@ class OpenCartClient:
         lon: float,
         acc: float | None = None,
         status_fields: Optional[dict] = None,
+        time_field: str | None = None,
+        ping_ts: float | None = None,
     ) -> dict:
         payload = {"shift_id": str(shift_id), "lat": str(lat), "lon": str(lon)}
         if staff_id is not None:
@@ -288,6 +533,9 @@ class OpenCartClient:
             if value is None:
                 continue
             payload[str(key)] = str(value)
+        if time_field and ping_ts is not None:
+            # journal replay: the fix was taken at ``ping_ts``, not when it is finally sent
+            payload[time_field] = str(int(ping_ts))
 
         data = await self._request(
             "POST",
@@ -316,6 +564,49 @@ class OpenCartClient:
         shift = payload.get("shift") if isinstance(payload, dict) else None
         return shift if isinstance(shift, dict) else None
 
+    async def get_active_shifts_bulk(self, staff_ids: list[int]) -> dict[int, dict | None] | None:
+        """Active shifts of many staff members in one request.
+
+        Returns ``{staff_id: shift or None}`` for the ids the server reported on (``None``
+        only when it said so explicitly), or ``None`` when the server does not know the
+        route, so the caller can fall back to per-staff lookups. Ids missing from the reply
+        are missing from the result: an omission is not proof that a shift ended.
+        """
+        requested = sorted({int(staff_id) for staff_id in staff_ids})
+        payload = await self._request(
+            "POST",
+            params={"route": "dl/geo_api/active_shifts_bulk"},
+            json_data={"staff_ids": requested},
+            return_meta=True,
+        )
+        body = payload.get("json") if isinstance(payload, dict) else None
+        if payload.get("ok") is not True or not isinstance(body, dict) or body.get("ok") is not True:
+            self.logger.warning(
+                "ACTIVE_SHIFTS_BULK_UNSUPPORTED status=%s body=%s",
+                payload.get("status"),
+                str(body)[:300],
+            )
+            return None
+
+        raw = body.get("shifts")
+        if isinstance(raw, dict):
+            items = [(key, shift) for key, shift in raw.items()]
+        elif isinstance(raw, list):
+            items = [(shift.get("staff_id"), shift) for shift in raw if isinstance(shift, dict)]
+        else:
+            return None
+
+        wanted = set(requested)
+        result: dict[int, dict | None] = {}
+        for key, shift in items:
+            try:
+                staff_id = int(key)
+            except (TypeError, ValueError):
+                continue
+            if staff_id in wanted and (shift is None or isinstance(shift, dict)):
+                result[staff_id] = shift
+        return result
+
     async def rebind_telegram(
         self,
         staff_id: int,
@@ -391,12 +682,51 @@ class OpenCartClient:
             "staff_id": staff.get("staff_id") or body.get("staff_id"),
         }
 
+    @staticmethod
+    def _parse_admin_chat_ids(status: int, body) -> list[int] | None:
+        """Chat ids from a valid reply (possibly empty), ``None`` when the reply is not one."""
+        if not (
+            200 <= status < 300 and isinstance(body, dict) and body.get("ok") is True and isinstance(body.get("chat_ids"), list)
+        ):
+            return None
+        result: list[int] = []
+        for x in body["chat_ids"]:
+            try:
+                v = int(x)
+                if v > 0:
+                    result.append(v)
+            except (TypeError, ValueError):
+                pass
+        return result
+
+    async def fetch_admin_chat_ids(self, *, etag: str | None = None) -> dict:
+        """Conditional fetch for ``AdminDirectory``: no cache, no fallback.
+
+        Returns ``{"status", "chat_ids", "etag"}``; ``chat_ids`` is ``None`` when the server
+        answered 304 to ``If-None-Match: etag`` or the reply is invalid, and ``[]`` when the
+        server has no admins. Transport errors raise ``ApiUnavailableError``.
+        """
+        payload = await self._request(
+            "GET",
+            params={"route": "dl/geo_api/admin_chat_ids"},
+            headers={"If-None-Match": etag} if etag else None,
+            return_meta=True,
+        )
+        status = int(payload.get("status") or 0)
+        if status == 304:
+            return {"status": status, "chat_ids": None, "etag": payload.get("etag") or etag}
+        return {
+            "status": status,
+            "chat_ids": self._parse_admin_chat_ids(status, payload.get("json")),
+            "etag": payload.get("etag"),
+        }
+
     async def get_admin_chat_ids(self) -> list[int]:
         """Fetch admin chat IDs from API. Caches result for 60 seconds.
         Falls back to ADMIN_FORCE_CHAT_IDS from config on any failure."""
         from shiftbot import config
 
-        now = time.time()
+        now = clock.now()
         if self._admin_chat_ids_cache is not None and (now - self._admin_chat_ids_cache_ts) < 600:
             return list(self._admin_chat_ids_cache)
 
@@ -415,16 +745,7 @@ class OpenCartClient:
         status = int(payload.get("status") or 0) if isinstance(payload, dict) else 0
         body = payload.get("json") if isinstance(payload, dict) else None
 
-        result: list[int] = []
-        if 200 <= status < 300 and isinstance(body, dict) and body.get("ok") is True and isinstance(body.get("chat_ids"), list):
-            for x in body["chat_ids"]:
-                try:
-                    v = int(x)
-                    if v > 0:
-                        result.append(v)
-                except (TypeError, ValueError):
-                    pass
-
+        result = self._parse_admin_chat_ids(status, body)
         if result:
             self._admin_chat_ids_cache = result
             self._admin_chat_ids_cache_ts = now
@@ -484,3 +805,48 @@ class OpenCartClient:
             self.logger.warning("VIOLATION_TICK_UNAVAILABLE shift_id=%s error=%s", shift_id, exc)
             return {"ok": False, "error": "temporary_api_error", "decisions": {}}
         return data if isinstance(data, dict) else {"ok": False, "error": "Некорректный ответ API", "decisions": {}}
+
+    async def violation_tick_many(self, shift_ids: list[int]) -> dict[int, dict] | None:
+        """``violation_tick`` for several shifts in one request.
+
+        Returns ``{shift_id: response}`` where every response has the shape of a single
+        ``violation_tick`` reply, or ``None`` when the server does not know the route.
+        """
+        requested = sorted({int(shift_id) for shift_id in shift_ids})
+        self.logger.info("VIOLATION_TICK_MANY_REQUEST shift_ids=%s", requested)
+        try:
+            payload = await self._request(
+                "POST",
+                params={"route": "dl/geo_api/violation_tick_many"},
+                json_data={"shift_ids": requested},
+                return_meta=True,
+            )
+        except ApiUnavailableError as exc:
+            self.logger.warning("VIOLATION_TICK_MANY_UNAVAILABLE shift_ids=%s error=%s", requested, exc)
+            return {shift_id: {"ok": False, "error": "temporary_api_error", "decisions": {}} for shift_id in requested}
+
+        body = payload.get("json") if isinstance(payload, dict) else None
+        raw = body.get("results") if isinstance(body, dict) and body.get("ok") is True else None
+        if payload.get("ok") is not True or not isinstance(raw, (dict, list)):
+            self.logger.warning(
+                "VIOLATION_TICK_MANY_UNSUPPORTED status=%s body=%s",
+                payload.get("status"),
+                str(body)[:300],
+            )
+            return None
+
+        if isinstance(raw, dict):
+            items = list(raw.items())
+        else:
+            items = [(item.get("shift_id"), item) for item in raw if isinstance(item, dict)]
+        result = {
+            shift_id: {"ok": False, "error": "missing_in_batch", "decisions": {}} for shift_id in requested
+        }
+        for key, response in items:
+            try:
+                shift_id = int(key)
+            except (TypeError, ValueError):
+                continue
+            if shift_id in result and isinstance(response, dict):
+                result[shift_id] = response
+        return result
@@ -1,7 +1,9 @@
-import time
-
 from telegram.ext import ContextTypes
 
+from shiftbot import clock
+from shiftbot.metrics import ADMIN_ALERTS_TOTAL
+from shiftbot.shared_state import claim_shared_cooldown, mark_shared_cooldown
+
 PING_ALERT_COOLDOWN_KEY = "ping_alert_cooldowns"
 DEAD_SOUL_RECENT_ALERTS_KEY = "dead_soul_recent_alert_by_point"
 STAFF_ALERT_COOLDOWN_SEC = 120
@@ -194,7 +196,7 @@ async def process_ping_alerts(
     if not normalized_alerts:
         return
 
-    now = time.time()
+    now = clock.now()
     cooldowns = context.application.bot_data.setdefault(PING_ALERT_COOLDOWN_KEY, {})
     for raw_alert in normalized_alerts:
 
@@ -215,6 +217,11 @@ async def process_ping_alerts(
         staff_text, admin_text = _alert_text(raw_alert)
         if not staff_text and not admin_text:
             continue
+        if cooldown_key[1] == "point" and not await claim_shared_cooldown(
+            context.application.bot_data, cooldown_key, now, cooldown_sec
+        ):
+            # couriers of one point may be served by different shards
+            continue
 
         if staff_text:
             await context.bot.send_message(chat_id=staff_chat_id, text=staff_text)
@@ -229,6 +236,7 @@ async def process_ping_alerts(
                 continue
             for admin_chat_id in admin_chat_ids:
                 await context.bot.send_message(chat_id=admin_chat_id, text=admin_text)
+            ADMIN_ALERTS_TOTAL.inc(alert_type=alert_type)
             logger.info(
                 "ADMIN_ALERT_SENT shift_id=%s alert_type=%s admin_chat_ids=%s",
                 shift_id,
@@ -240,4 +248,7 @@ async def process_ping_alerts(
                 if point_id is not None:
                     dead_soul_recent = context.application.bot_data.setdefault(DEAD_SOUL_RECENT_ALERTS_KEY, {})
                     dead_soul_recent[point_id] = now
+                    await mark_shared_cooldown(
+                        context.application.bot_data, (DEAD_SOUL_RECENT_ALERTS_KEY, point_id), now
+                    )
             cooldowns[cooldown_key] = now
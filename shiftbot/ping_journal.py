@@ -0,0 +1,313 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from shiftbot.opencart_client import ApiUnavailableError
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "pings-"
+SEGMENT_SUFFIX = ".jsonl"
+CURSOR_FILE = "cursor.json"
+
+
+class PingJournal:
+    """Append-only on-disk journal of pings that could not be delivered to OpenCart.
+
+    Records are compact JSON lines in numbered segment files. Writes are fsynced in batches
+    (every ``fsync_every`` records or ``fsync_interval_sec``, whichever comes first), so a
+    crash loses at most one batch. Replay progress is a ``(segment, offset)`` cursor stored
+    next to the segments; fully replayed segments are deleted.
+
+    Methods do blocking file I/O and are safe to call from several threads; async code
+    calls them through ``asyncio.to_thread``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_max_bytes: int = 4 * 1024 * 1024,
+        fsync_every: int = 32,
+        fsync_interval_sec: float = 1.0,
+    ) -> None:
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = max(int(fsync_every), 1)
+        self.fsync_interval_sec = fsync_interval_sec
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = sorted(self._scan_segments())
+        self._cursor = self._load_cursor()
+        self._fh = None
+        self._write_seq = self._segments[-1] if self._segments else 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self._lock = threading.RLock()
+        self._pending = self._measure_pending()
+
+    def _scan_segments(self) -> list[int]:
+        result = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    result.append(int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return result
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}")
+
+    def _load_cursor(self) -> tuple[int, int]:
+        first = self._segments[0] if self._segments else 1
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            seq, offset = int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return first, 0
+        if seq < first:
+            return first, 0
+        return seq, offset
+
+    def _store_cursor(self) -> None:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    def _open_next_segment(self) -> None:
+        if self._fh is not None:
+            self.flush()
+            self._fh.close()
+        self._write_seq += 1
+        self._segments.append(self._write_seq)
+        self._fh = open(self._segment_path(self._write_seq), "ab")
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+            if self._fh is None:
+                if self._segments and os.path.getsize(self._segment_path(self._write_seq)) < self.segment_max_bytes:
+                    self._fh = open(self._segment_path(self._write_seq), "ab")
+                else:
+                    self._open_next_segment()
+            elif self._fh.tell() > 0 and self._fh.tell() + len(line) > self.segment_max_bytes:
+                self._open_next_segment()
+
+            self._fh.write(line)
+            self._pending += len(line)
+            self._unsynced += 1
+            due = (time.monotonic() - self._last_fsync) >= self.fsync_interval_sec
+            if self._unsynced >= self.fsync_every or due:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is None or self._unsynced == 0:
+                return
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+            self._last_fsync = time.monotonic()
+
+    def read_batch(self, limit: int) -> list[tuple[tuple[int, int], dict]]:
+        """Next records after the cursor, each paired with the position right after it."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+            seq, offset = self._cursor
+            records: list[tuple[tuple[int, int], dict]] = []
+            while len(records) < limit and seq in self._segments:
+                with open(self._segment_path(seq), "rb") as fh:
+                    fh.seek(offset)
+                    for raw in fh:
+                        if not raw.endswith(b"\n"):
+                            # torn tail of a crashed write; leave it until the line is complete
+                            break
+                        offset += len(raw)
+                        try:
+                            record = json.loads(raw)
+                        except ValueError:
+                            logger.warning("PING_JOURNAL_BAD_RECORD segment=%s offset=%s", seq, offset)
+                            continue
+                        records.append(((seq, offset), record))
+                        if len(records) >= limit:
+                            break
+                if len(records) >= limit or seq >= self._segments[-1]:
+                    break
+                seq = self._segments[self._segments.index(seq) + 1]
+                offset = 0
+            return records
+
+    def commit(self, position: tuple[int, int]) -> None:
+        with self._lock:
+            self._cursor = position
+            self._store_cursor()
+            for seq in [seq for seq in self._segments if seq < position[0]]:
+                try:
+                    os.remove(self._segment_path(seq))
+                except FileNotFoundError:
+                    pass
+                self._segments.remove(seq)
+            self._pending = self._measure_pending()
+
+    def has_pending(self) -> bool:
+        return self.pending_bytes() > 0
+
+    def pending_bytes(self) -> int:
+        # kept up to date by append/commit, so metrics can read it on the loop without I/O
+        return self._pending
+
+    def _measure_pending(self) -> int:
+        if self._fh is not None:
+            self._fh.flush()
+        seq, offset = self._cursor
+        total = 0
+        for segment in self._segments:
+            if segment < seq:
+                continue
+            size = os.path.getsize(self._segment_path(segment))
+            total += size - offset if segment == seq else size
+        return max(total, 0)
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+            return sum(os.path.getsize(self._segment_path(seq)) for seq in self._segments)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self.flush()
+                self._fh.close()
+                self._fh = None
+
+
+def ping_record(*, shift_id: int, staff_id: int | None, lat: float, lon: float, acc: float | None, ts: float) -> dict:
+    return {"shift_id": shift_id, "staff_id": staff_id, "lat": lat, "lon": lon, "acc": acc, "ts": round(ts, 3)}
+
+
+class PingJournalReplayer:
+    """Drains the journal in order once OpenCart's health check passes again.
+
+    Each ping goes out with its original time in ``time_field``, the ``ping_add`` field the
+    server takes the fix time from; without it the server would stamp old positions with
+    the replay time. A ``shift_not_active`` reply drops that ping and the rest of the
+    shift's pings without sending them. Replies are logged, not acted upon: the server's
+    decisions for a position from minutes ago are no reason to alert anyone now.
+    """
+
+    def __init__(
+        self,
+        journal: PingJournal,
+        oc_client,
+        logger,
+        *,
+        time_field: str,
+        rate_per_sec: float,
+        batch_size: int = 50,
+    ) -> None:
+        if not time_field:
+            raise ValueError("time_field is required to replay pings")
+        self.journal = journal
+        self.oc_client = oc_client
+        self.logger = logger
+        self.time_field = time_field
+        self.min_interval_sec = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self.batch_size = batch_size
+        self._draining = False
+
+    async def drain(self, *, max_records: int | None = None) -> int:
+        """Replay pending pings; returns how many records left the journal (sent or dropped)."""
+        if self._draining or not self.journal.has_pending():
+            return 0
+        try:
+            healthy = await self.oc_client.health_check()
+        except Exception as exc:
+            self.logger.info("PING_JOURNAL_REPLAY_WAIT reason=health_check_failed error=%s", exc)
+            return 0
+        if not healthy:
+            self.logger.info("PING_JOURNAL_REPLAY_WAIT reason=unhealthy")
+            return 0
+
+        self._draining = True
+        done = sent = rejected = dropped = 0
+        ended_shifts: set[int] = set()
+        try:
+            while max_records is None or done < max_records:
+                limit = self.batch_size if max_records is None else min(self.batch_size, max_records - done)
+                batch = await asyncio.to_thread(self.journal.read_batch, limit)
+                if not batch:
+                    break
+                last_position = None
+                try:
+                    for position, record in batch:
+                        shift_id = record["shift_id"]
+                        if shift_id in ended_shifts:
+                            dropped += 1
+                        else:
+                            started = time.monotonic()
+                            response = await self.oc_client.ping_add(
+                                shift_id=shift_id,
+                                staff_id=record.get("staff_id"),
+                                lat=record["lat"],
+                                lon=record["lon"],
+                                acc=record.get("acc"),
+                                status_fields={"source": "journal"},
+                                time_field=self.time_field,
+                                ping_ts=record.get("ts"),
+                            )
+                            sent += 1
+                            if not self._log_outcome(record, response):
+                                rejected += 1
+                                if response.get("error") == "shift_not_active":
+                                    ended_shifts.add(shift_id)
+                            pause = self.min_interval_sec - (time.monotonic() - started)
+                            if pause > 0:
+                                await asyncio.sleep(pause)
+                        last_position = position
+                        done += 1
+                except ApiUnavailableError:
+                    self.logger.warning("PING_JOURNAL_REPLAY_INTERRUPTED sent=%s", sent)
+                    break
+                finally:
+                    if last_position is not None:
+                        await asyncio.to_thread(self.journal.commit, last_position)
+        finally:
+            self._draining = False
+
+        if done:
+            self.logger.info(
+                "PING_JOURNAL_REPLAYED sent=%s rejected=%s dropped=%s ended_shifts=%s pending_bytes=%s",
+                sent,
+                rejected,
+                dropped,
+                sorted(ended_shifts),
+                self.journal.pending_bytes(),
+            )
+        return done
+
+    def _log_outcome(self, record: dict, response) -> bool:
+        if not isinstance(response, dict) or response.get("ok") is False:
+            error = response.get("error") if isinstance(response, dict) else "bad_response"
+            self.logger.info(
+                "PING_JOURNAL_REPLAY_REJECTED shift_id=%s ts=%s error=%s", record["shift_id"], record.get("ts"), error
+            )
+            return False
+        self.logger.info(
+            "PING_JOURNAL_REPLAY_OK shift_id=%s ts=%s status=%s decisions=%s",
+            record["shift_id"],
+            record.get("ts"),
+            response.get("status"),
+            response.get("decisions"),
+        )
+        return True
@@ -0,0 +1,116 @@
+import math
+
+from shiftbot import clock
+from shiftbot.geo import haversine_m
+from shiftbot.metrics import CACHE_LOOKUPS_TOTAL
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PointGridIndex:
+    """Uniform lat/lon grid over the points catalog.
+
+    A query only measures points in the cells that can reach the fix within the largest
+    point radius, so it stays at a handful of haversines no matter how big the catalog is.
+    """
+
+    def __init__(self, points: list[dict], *, default_radius_m: float, cell_m: float = 250.0) -> None:
+        self.points: list[dict] = []
+        self._coords: list[tuple[float, float, float]] = []
+        for point in points:
+            lat = _as_float(point.get("geo_lat"))
+            lon = _as_float(point.get("geo_lon"))
+            if lat is None or lon is None:
+                continue
+            radius = _as_float(point.get("geo_radius_m")) or float(default_radius_m)
+            self.points.append(point)
+            self._coords.append((lat, lon, radius))
+
+        self.cell_m = float(cell_m)
+        self.max_radius_m = max((radius for _, _, radius in self._coords), default=float(default_radius_m))
+        mean_lat = sum(lat for lat, _, _ in self._coords) / len(self._coords) if self._coords else 0.0
+        self._cell_lat = self.cell_m / METERS_PER_DEG_LAT
+        # cells are square at the catalog's mean latitude; query reach is widened by a ring to cover the drift
+        self._cell_lon = self._cell_lat / max(math.cos(math.radians(mean_lat)), 0.01)
+        self._reach = int(math.ceil(self.max_radius_m / self.cell_m)) + 1
+
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for idx, (lat, lon, _) in enumerate(self._coords):
+            self._cells.setdefault(self._cell(lat, lon), []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return int(math.floor(lat / self._cell_lat)), int(math.floor(lon / self._cell_lon))
+
+    def nearby(self, lat: float, lon: float, *, k: int = 3) -> list[tuple[dict, float]]:
+        """Up to ``k`` points whose zone contains the fix, nearest first."""
+        if k <= 0 or not self._cells:
+            return []
+        row, col = self._cell(lat, lon)
+        reach = self._reach
+        m_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+        hits: list[tuple[float, int]] = []
+        for d_row in range(-reach, reach + 1):
+            for d_col in range(-reach, reach + 1):
+                for idx in self._cells.get((row + d_row, col + d_col), ()):
+                    p_lat, p_lon, radius = self._coords[idx]
+                    # cheap planar reject; 1% slack covers the projection error at city scale
+                    dy = (p_lat - lat) * METERS_PER_DEG_LAT
+                    dx = (p_lon - lon) * m_per_deg_lon
+                    limit = radius * 1.01
+                    if dx * dx + dy * dy > limit * limit:
+                        continue
+                    dist = haversine_m(lat, lon, p_lat, p_lon)
+                    if dist <= radius:
+                        hits.append((dist, idx))
+        hits.sort()
+        return [(self.points[idx], dist) for dist, idx in hits[:k]]
+
+
+class PointsCatalog:
+    """Points list cached for ``ttl_sec`` together with its grid index.
+
+    ``prepare`` turns the raw API list into the normalized, ordered list the handlers show.
+    Sessions reference the cached list instead of keeping their own copies.
+    """
+
+    def __init__(self, oc_client, *, ttl_sec: int, default_radius_m: float, prepare=None) -> None:
+        self.oc_client = oc_client
+        self.ttl_sec = ttl_sec
+        self.default_radius_m = default_radius_m
+        self.prepare = prepare or (lambda points: points)
+        self.points: list[dict] = []
+        self.index = PointGridIndex([], default_radius_m=default_radius_m)
+        self._loaded = False
+        self._loaded_at = 0.0
+
+    def is_fresh(self) -> bool:
+        # an empty list from the API is a valid answer and is cached like any other
+        return self._loaded and (clock.now() - self._loaded_at) < self.ttl_sec
+
+    async def get(self, *, force_refresh: bool = False) -> list[dict]:
+        if not force_refresh and self.is_fresh():
+            CACHE_LOOKUPS_TOTAL.inc(cache="points", result="hit")
+            return self.points
+        CACHE_LOOKUPS_TOTAL.inc(cache="points", result="miss")
+        raw_points = await self.oc_client.get_points()
+        points = self.prepare(raw_points)
+        self.points = points
+        self.index = PointGridIndex(points, default_radius_m=self.default_radius_m)
+        self._loaded = True
+        self._loaded_at = clock.now()
+        return points
+
+    async def suggest(self, lat: float, lon: float, *, k: int = 3) -> list[tuple[dict, float]]:
+        if not self.is_fresh():
+            await self.get()
+        return self.index.nearby(lat, lon, k=k)
@@ -0,0 +1,188 @@
+"""Built-in sampling profiler for the running event loop.
+
+A daemon thread wakes every ``interval_sec`` and records two kinds of stacks:
+
+* ``loop`` — what the event-loop thread is executing right now (on-CPU time; a stack
+  ending in ``selectors:select`` means the loop is idle);
+* ``tasks`` — the await chain of every asyncio task, so a handler waiting on OpenCart
+  or Telegram is counted too (wall time per coroutine).
+
+Samples are written in the collapsed-stack format (``a;b;c 42``) that flamegraph.pl and
+speedscope open directly. No extra dependencies; reading other tasks' frames from the
+sampling thread is racy by nature and a failed sample is simply skipped.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+MAX_DEPTH = 64
+IDLE_FRAMES = {("selectors", "select"), ("selectors", "poll")}
+
+
+_labels: dict = {}
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+    return label
+
+
+def thread_stack(frame) -> tuple[str, ...]:
+    """Labels of ``frame`` and its callers, outermost first."""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def await_stack(coro) -> tuple[str, ...]:
+    """Labels along a coroutine's await chain, outermost first."""
+    labels = []
+    while coro is not None and len(labels) < MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            if not hasattr(coro, "cr_await"):
+                # a Future or another awaitable: the leaf the coroutine is waiting on
+                labels.append(f"<{type(coro).__name__}>")
+            break
+        labels.append(frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return tuple(labels)
+
+
+class SamplingProfiler:
+    def __init__(
+        self,
+        *,
+        interval_sec: float = 0.02,
+        modules: tuple[str, ...] = ("shiftbot.handlers_location", "shiftbot.jobs"),
+    ) -> None:
+        self.interval_sec = interval_sec
+        self.modules = modules
+        self.loop_stacks: Counter = Counter()
+        self.task_stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.failed_samples = 0
+        self.started_at = 0.0
+        self.duration_sec = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start sampling the event loop this is called from."""
+        if self._thread is not None:
+            raise RuntimeError("profiler already running")
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="shiftbot-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration_sec = time.perf_counter() - self.started_at
+
+    async def profile(self, seconds: float) -> None:
+        self.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.sample()
+            except Exception:
+                # the loop thread changed the task set or a frame under us
+                self.failed_samples += 1
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = thread_stack(frame)
+        current = asyncio.current_task(self._loop)
+        tasks = []
+        for task in asyncio.all_tasks(self._loop):
+            task_stack = await_stack(task.get_coro())
+            if task is current and task_stack and task_stack[0] in stack:
+                # a running coroutine has no await chain yet: its frames are on the thread stack
+                task_stack = stack[stack.index(task_stack[0]) :]
+            tasks.append(task_stack)
+        self.samples += 1
+        self.loop_stacks[stack] += 1
+        leaf = stack[-1].split(":", 1) if stack else ()
+        if tuple(leaf) in IDLE_FRAMES:
+            self.idle_samples += 1
+        for task_stack in tasks:
+            if task_stack:
+                self.task_stacks[task_stack] += 1
+
+    def collapsed_lines(self) -> list[str]:
+        lines = [f"loop;{';'.join(stack)} {count}" for stack, count in self.loop_stacks.most_common()]
+        lines.extend(f"tasks;{';'.join(stack)} {count}" for stack, count in self.task_stacks.most_common())
+        return lines
+
+    def write_collapsed(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(self.collapsed_lines()) + "\n")
+        return path
+
+    def coroutine_wall_time(self) -> dict[str, float]:
+        """Seconds each coroutine of ``modules`` spent on some task's await chain (inclusive)."""
+        totals: Counter = Counter()
+        for stack, count in self.task_stacks.items():
+            for label in set(stack):
+                if label.split(":", 1)[0] in self.modules:
+                    totals[label] += count
+        # the thread wakes later than ``interval_sec`` under load; use the measured spacing
+        per_sample = self.duration_sec / self.samples if self.samples and self.duration_sec else self.interval_sec
+        return {label: count * per_sample for label, count in totals.most_common()}
+
+    def summary(self, top: int = 10) -> dict:
+        busy = self.samples - self.idle_samples
+        return {
+            "duration_sec": self.duration_sec,
+            "samples": self.samples,
+            "failed_samples": self.failed_samples,
+            "loop_busy_share": busy / self.samples if self.samples else 0.0,
+            "coroutines": list(self.coroutine_wall_time().items())[:top],
+        }
+
+
+def format_profile_report(summary: dict, path: str) -> str:
+    lines = [
+        f"Профиль за {summary['duration_sec']:.1f}с: {summary['samples']} сэмплов, "
+        f"loop занят {summary['loop_busy_share'] * 100:.0f}%",
+        f"Файл: {path}",
+    ]
+    if summary["coroutines"]:
+        lines.append("Время в корутинах (wall, сумма по всем задачам):")
+        lines.extend(f"{label.split(':', 1)[1]} {seconds:.2f}с" for label, seconds in summary["coroutines"])
+    else:
+        lines.append("Обработчики handlers_location / jobs за это время не выполнялись.")
+    return "\n".join(lines)
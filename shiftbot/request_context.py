@@ -0,0 +1,112 @@
+"""Values resolved while handling one update, carried in a ContextVar.
+
+A guard, the handler it protects and the helpers they call often need the same staff
+record or active shift. ``memoize(key, factory)`` runs ``factory`` once per update and
+hands every later caller the same result; outside an update it just calls ``factory``.
+Failures are not remembered, so a retry inside the same update still reaches the API.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+
+STAFF = "staff"
+ACTIVE_SHIFT = "active_shift"
+
+
+class RequestContext:
+    __slots__ = ("update_id", "handler", "calls", "_values")
+
+    def __init__(self, update_id=None, handler: str | None = None) -> None:
+        self.update_id = update_id
+        self.handler = handler
+        # outbound calls made for this update, by target ("opencart", "telegram")
+        self.calls: dict[str, int] = {}
+        self._values: dict[tuple, asyncio.Future] = {}
+
+    async def memoize(self, key: tuple, factory):
+        future = self._values.get(key)
+        if future is None:
+            future = self._values[key] = asyncio.get_running_loop().create_future()
+            try:
+                future.set_result(await factory())
+            except asyncio.CancelledError:
+                del self._values[key]
+                future.cancel()
+                raise
+            except Exception as exc:
+                del self._values[key]
+                future.set_exception(exc)
+                # the exception is re-raised here; waiters get it from the future
+                future.exception()
+                raise
+        return await asyncio.shield(future)
+
+    def forget(self, key: tuple) -> None:
+        self._values.pop(key, None)
+
+
+_current: contextvars.ContextVar[RequestContext | None] = contextvars.ContextVar(
+    "shiftbot_request_context", default=None
+)
+# called with the finished RequestContext when the outermost scope closes
+_finish_hooks: list = []
+
+
+def add_finish_hook(hook) -> None:
+    _finish_hooks.append(hook)
+
+
+def current() -> RequestContext | None:
+    return _current.get()
+
+
+def clear() -> None:
+    """Leave the current update: later calls in this context count as background work."""
+    _current.set(None)
+
+
+@contextlib.contextmanager
+def request_scope(update=None, handler: str | None = None):
+    """Open a fresh context for ``update``; nested scopes reuse the outer one."""
+    if _current.get() is not None:
+        yield _current.get()
+        return
+    context = RequestContext(getattr(update, "update_id", None), handler)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+        for hook in _finish_hooks:
+            hook(context)
+
+
+async def memoize(key: tuple, factory):
+    context = _current.get()
+    if context is None:
+        return await factory()
+    return await context.memoize(key, factory)
+
+
+def forget(key: tuple) -> None:
+    """Drop a memoized value after the handler changed it on the server."""
+    context = _current.get()
+    if context is not None:
+        context.forget(key)
+
+
+def with_request_context(handler):
+    """Run a PTB handler's callback inside ``request_scope``."""
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return handler
+    name = getattr(callback, "__name__", "callback")
+
+    async def callback_with_request_context(update, context):
+        with request_scope(update, name):
+            return await callback(update, context)
+
+    callback_with_request_context.__name__ = name
+    handler.callback = callback_with_request_context
+    return handler
@@ -0,0 +1,146 @@
+from bisect import bisect_left
+
+# upper bounds of latency buckets, seconds; the last bucket is open-ended
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: one bisect and a few additions per observation."""
+
+    __slots__ = ("bounds", "counts", "count", "total_sec", "max_sec")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS_SEC) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+
+    def observe(self, value_sec: float) -> None:
+        self.counts[bisect_left(self.bounds, value_sec)] += 1
+        self.count += 1
+        self.total_sec += value_sec
+        if value_sec > self.max_sec:
+            self.max_sec = value_sec
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (``max_sec`` for the open bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return self.bounds[idx] if idx < len(self.bounds) else self.max_sec
+        return self.max_sec
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_sec": self.total_sec / self.count if self.count else 0.0,
+            "p50_sec": self.quantile(0.5),
+            "p95_sec": self.quantile(0.95),
+            "p99_sec": self.quantile(0.99),
+            "max_sec": self.max_sec,
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+        }
+
+
+class RouteStats:
+    __slots__ = ("requests", "retries", "errors", "statuses", "bytes_in", "bytes_out", "in_flight", "latency")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.statuses: dict[int, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.in_flight = 0
+        self.latency = LatencyHistogram()
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "in_flight": self.in_flight,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class LaneStats:
+    __slots__ = ("limit", "waiting", "in_flight", "wait")
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.waiting = 0
+        self.in_flight = 0
+        self.wait = LatencyHistogram()
+
+    def as_dict(self) -> dict:
+        return {"limit": self.limit, "waiting": self.waiting, "in_flight": self.in_flight, "wait": self.wait.as_dict()}
+
+
+class RequestStats:
+    """Per-route request accounting of ``OpenCartClient``.
+
+    Latency covers the whole logical request including retries and backoff; statuses,
+    errors and bytes are counted per attempt.
+    """
+
+    def __init__(self) -> None:
+        self.routes: dict[str, RouteStats] = {}
+        self.lanes: dict[str, LaneStats] = {}
+
+    def route(self, name: str) -> RouteStats:
+        stats = self.routes.get(name)
+        if stats is None:
+            stats = self.routes[name] = RouteStats()
+        return stats
+
+    def lane(self, name: str, limit: int) -> LaneStats:
+        stats = self.lanes.get(name)
+        if stats is None:
+            stats = self.lanes[name] = LaneStats(limit)
+        return stats
+
+    @property
+    def in_flight(self) -> int:
+        return sum(stats.in_flight for stats in self.routes.values())
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "routes": {name: stats.as_dict() for name, stats in sorted(self.routes.items())},
+            "lanes": {name: stats.as_dict() for name, stats in self.lanes.items()},
+        }
+
+
+def format_request_stats(snapshot: dict) -> str:
+    lines = [f"OpenCart API, в работе: {snapshot['in_flight']}"]
+    for lane, stats in snapshot.get("lanes", {}).items():
+        lines.append(
+            f"lane {lane}: {stats['in_flight']}/{stats['limit']} в работе, ждут {stats['waiting']}, "
+            f"ожидание p95≤{stats['wait']['p95_sec'] * 1000:.0f}мс"
+        )
+    limiter = snapshot.get("limiter")
+    if limiter:
+        lines.append(
+            f"adaptive limit {limiter['limit']}: в работе {limiter['in_flight']}, ждут {limiter['waiting']}, "
+            f"снижений {limiter['decreases']}, ожидание p95≤{limiter['queue_wait']['p95_sec'] * 1000:.0f}мс"
+        )
+    for route, stats in snapshot["routes"].items():
+        latency = stats["latency"]
+        statuses = " ".join(f"{code}:{count}" for code, count in sorted(stats["statuses"].items())) or "—"
+        lines.append(
+            f"{route.removeprefix('dl/geo_api/')}: {stats['requests']} req, "
+            f"p50≤{latency['p50_sec'] * 1000:.0f}мс p95≤{latency['p95_sec'] * 1000:.0f}мс "
+            f"max {latency['max_sec'] * 1000:.0f}мс, retry {stats['retries']}, err {stats['errors']}, "
+            f"коды {statuses}, in {stats['bytes_in']}B out {stats['bytes_out']}B"
+        )
+    return "\n".join(lines)
@@ -29,6 +29,7 @@ class SessionStore:
         session.selected_role = None
         session.gate_attempt = 0
         session.gate_last_reason = None
+        session.point_suggestions_sent = False
 
     def patch(self, session: ShiftSession, **changes) -> None:
         for key, value in changes.items():
@@ -42,6 +43,7 @@ class SessionStore:
         session.active_point_lat = None
         session.active_point_lon = None
         session.active_point_radius = None
+        session.active_geofence = None
         session.active_role = None
         session.active_staff_name = None
         session.active_staff_phone = None
@@ -0,0 +1,202 @@
+"""Supervisor mode: one poller process routes updates to N worker processes by ``user_id % N``.
+
+Everything keyed by a user or a shift (sessions, staff cache, unknown-accuracy state and
+the per-shift alert cooldowns) stays inside the worker that owns the user. State that
+crosses users — the dead-soul detector, which pairs couriers of the same point, and the
+per-point alert cooldowns — lives in a ``SharedStateManager`` process and is handed to
+every worker as proxies; workers call them through ``shared_state.call_shared``.
+
+The supervisor checks its workers on every poll round and restarts a dead one on the same
+queue, so its backlog is not lost; after ``SHARD_WORKER_MAX_RESTARTS`` restarts of one
+shard it stops instead of feeding a queue nobody reads.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from dataclasses import dataclass, field
+from multiprocessing.managers import SyncManager
+
+from telegram import Bot
+
+from shiftbot import config
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.shared_state import SharedCooldowns
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_UPDATES = ["message", "edited_message", "callback_query"]
+_STOP = None
+
+
+class SharedStateManager(SyncManager):
+    pass
+
+
+SharedStateManager.register("DeadSoulDetector", DeadSoulDetector)
+SharedStateManager.register("SharedCooldowns", SharedCooldowns)
+
+
+@dataclass
+class SharedState:
+    admin_chat_ids: list[int] = field(default_factory=list)
+    cooldowns: object | None = None
+    dead_soul_detector: object | None = None
+
+
+def update_user_id(payload: dict) -> int | None:
+    for kind in ALLOWED_UPDATES:
+        item = payload.get(kind)
+        if not isinstance(item, dict):
+            continue
+        sender = item.get("from")
+        if isinstance(sender, dict) and sender.get("id") is not None:
+            return int(sender["id"])
+        chat = item.get("chat")
+        if isinstance(chat, dict) and chat.get("id") is not None:
+            return int(chat["id"])
+    return None
+
+
+def shard_for_update(payload: dict, shard_count: int) -> int:
+    user_id = update_user_id(payload)
+    if user_id is None or shard_count <= 1:
+        return 0
+    return user_id % shard_count
+
+
+def build_shared_state(manager: SharedStateManager, admin_chat_ids: list[int]) -> SharedState:
+    return SharedState(
+        admin_chat_ids=list(admin_chat_ids),
+        cooldowns=manager.SharedCooldowns(),
+        dead_soul_detector=manager.DeadSoulDetector(
+            bucket_sec=config.DEAD_SOUL_BUCKET_SEC,
+            window_sec=config.DEAD_SOUL_WINDOW_SEC,
+            streak_threshold=config.DEAD_SOUL_STREAK,
+            alert_cooldown_sec=config.ALERT_COOLDOWN_DEAD_SEC,
+        ),
+    )
+
+
+def run_worker(shard_index: int, shard_count: int, source_queue, shared_state: SharedState) -> None:
+    from shiftbot.app import ShiftBotApp
+    from shiftbot.logging_setup import setup_logging
+
+    worker_logger = setup_logging()
+    worker_logger.info("SHARD_WORKER_START shard=%s/%s", shard_index, shard_count)
+    bot_app = ShiftBotApp(worker_logger, shared_state=shared_state, shard_index=shard_index)
+    asyncio.run(bot_app.serve_queue(source_queue))
+
+
+class ShardSupervisor:
+    def __init__(self, shard_count: int, logger) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be a positive integer")
+        self.shard_count = shard_count
+        self.logger = logger
+        self.routed = [0] * shard_count
+        self.restarts = [0] * shard_count
+        self._ctx = None
+        self._queues: list = []
+        self._workers: list = []
+        self._shared_state: SharedState | None = None
+
+    async def _resolve_admin_chat_ids(self) -> list[int]:
+        from shiftbot.opencart_client import OpenCartClient
+
+        oc_client = OpenCartClient(
+            config.OC_API_BASE,
+            config.OC_API_KEY,
+            self.logger,
+            admin_base_url=config.OC_API_ADMIN_BASE,
+        )
+        try:
+            return await oc_client.get_admin_chat_ids()
+        finally:
+            await oc_client.aclose()
+
+    def _spawn_worker(self, index: int):
+        process = self._ctx.Process(
+            target=run_worker,
+            args=(index, self.shard_count, self._queues[index], self._shared_state),
+            name=f"shiftbot-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def check_workers(self) -> None:
+        """Restart dead workers on their queues; give up on a shard that keeps dying."""
+        for index, process in enumerate(self._workers):
+            if process.is_alive():
+                continue
+            self.logger.error(
+                "SHARD_WORKER_DIED shard=%s exitcode=%s restarts=%s queued=%s",
+                index,
+                process.exitcode,
+                self.restarts[index],
+                _queue_size(self._queues[index]),
+            )
+            if self.restarts[index] >= config.SHARD_WORKER_MAX_RESTARTS:
+                raise RuntimeError(f"shard worker {index} keeps dying (exitcode={process.exitcode})")
+            self.restarts[index] += 1
+            self._workers[index] = self._spawn_worker(index)
+
+    async def _poll(self) -> None:
+        offset = None
+        async with Bot(config.BOT_TOKEN) as bot:
+            while True:
+                self.check_workers()
+                try:
+                    updates = await bot.get_updates(
+                        offset=offset,
+                        timeout=config.SHARD_POLL_TIMEOUT_SEC,
+                        allowed_updates=ALLOWED_UPDATES,
+                    )
+                except Exception as exc:
+                    self.logger.warning("SHARD_POLL_FAILED error=%s", exc)
+                    await asyncio.sleep(1.0)
+                    continue
+                for update in updates:
+                    offset = update.update_id + 1
+                    payload = update.to_dict()
+                    shard = shard_for_update(payload, self.shard_count)
+                    self.routed[shard] += 1
+                    self._queues[shard].put(payload)
+
+    def run(self) -> None:
+        if not config.BOT_TOKEN:
+            raise RuntimeError("BOT_TOKEN пуст.")
+
+        self._ctx = multiprocessing.get_context("spawn")
+        manager = SharedStateManager(ctx=self._ctx)
+        manager.start()
+        self._queues = [self._ctx.Queue() for _ in range(self.shard_count)]
+        self._workers = []
+        try:
+            admin_chat_ids = asyncio.run(self._resolve_admin_chat_ids())
+            self._shared_state = build_shared_state(manager, admin_chat_ids)
+            for index in range(self.shard_count):
+                self._workers.append(self._spawn_worker(index))
+
+            print(f"Bot started (polling, {self.shard_count} shard workers). Ctrl+C to stop.")
+            asyncio.run(self._poll())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.logger.info("SHARD_SUPERVISOR_STOP routed=%s restarts=%s", self.routed, self.restarts)
+            for source_queue in self._queues:
+                source_queue.put(_STOP)
+            for process in self._workers:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            manager.shutdown()
+
+
+def _queue_size(source_queue) -> int | None:
+    try:
+        return source_queue.qsize()
+    except NotImplementedError:
+        # macOS has no sem_getvalue
+        return None
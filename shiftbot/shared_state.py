@@ -0,0 +1,62 @@
+"""State shared between shard workers in supervisor mode (see ``sharding``).
+
+Workers get manager proxies for it, and every proxy call is a blocking IPC round-trip
+to the manager process. Async code therefore goes through ``call_shared`` and the
+cooldown helpers below, which move those calls to a thread. In a single process
+nothing is shared: the helpers call local objects in place, and
+``claim_shared_cooldown`` always grants.
+"""
+
+import asyncio
+import threading
+from multiprocessing.managers import BaseProxy
+
+SHARED_COOLDOWNS_KEY = "shared_cooldowns"
+
+
+class SharedCooldowns:
+    """Alert timestamps across shards; ``claim`` checks and sets under one lock."""
+
+    def __init__(self) -> None:
+        self._stamps: dict = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key, now: float, cooldown_sec: float) -> bool:
+        with self._lock:
+            last_sent_at = self._stamps.get(key)
+            if last_sent_at is not None and (now - last_sent_at) < cooldown_sec:
+                return False
+            self._stamps[key] = now
+            return True
+
+    def mark(self, key, now: float) -> None:
+        with self._lock:
+            self._stamps[key] = now
+
+    def size(self) -> int:
+        return len(self._stamps)
+
+
+def is_shared_proxy(obj) -> bool:
+    return isinstance(obj, BaseProxy)
+
+
+async def call_shared(method, *args, **kwargs):
+    """Call ``method`` from a thread when it belongs to a manager proxy, in place otherwise."""
+    if is_shared_proxy(getattr(method, "__self__", None)):
+        return await asyncio.to_thread(method, *args, **kwargs)
+    return method(*args, **kwargs)
+
+
+async def claim_shared_cooldown(bot_data, key, now: float, cooldown_sec: float) -> bool:
+    """``False`` when another shard already alerted on ``key`` within ``cooldown_sec``."""
+    shared = bot_data.get(SHARED_COOLDOWNS_KEY)
+    if shared is None:
+        return True
+    return await call_shared(shared.claim, key, now, cooldown_sec)
+
+
+async def mark_shared_cooldown(bot_data, key, now: float) -> None:
+    shared = bot_data.get(SHARED_COOLDOWNS_KEY)
+    if shared is not None:
+        await call_shared(shared.mark, key, now)
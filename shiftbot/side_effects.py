@@ -0,0 +1,145 @@
+"""Background executor for the side effects of an update.
+
+The ping handler records the ping and updates the session, then hands the alerting
+(Telegram messages, admin notifications, the alert enrichment lookup) to
+``SideEffectExecutor.submit``. Jobs run in one ``asyncio.TaskGroup`` owned by ``run()``,
+at most ``max_concurrency`` at a time, each under ``timeout_sec``; failures are logged and
+counted, never raised into the handler. The effects of one job run in order, and jobs
+submitted with the same ``key`` (the courier) run one after another in submission order,
+so a courier's messages keep the order of their updates and the cooldown check and set of
+one shift's admin alerts never interleave. Queued jobs run outside the update's request
+context, so their calls are accounted as background, not to the handler.
+"""
+
+import asyncio
+import collections
+import time
+
+from shiftbot.deadline import detached_context
+from shiftbot.metrics import REGISTRY
+
+SIDE_EFFECTS_TOTAL = REGISTRY.counter(
+    "shiftbot_side_effects_total", "Background side-effect jobs, by name and outcome.", ("name", "outcome")
+)
+SIDE_EFFECT_DURATION = REGISTRY.histogram(
+    "shiftbot_side_effect_duration_seconds", "Run time of background side-effect jobs.", ("name",)
+)
+
+
+class SideEffectExecutor:
+    def __init__(self, logger, *, max_concurrency: int, timeout_sec: float, max_pending: int) -> None:
+        self.logger = logger
+        self.max_concurrency = max_concurrency
+        self.timeout_sec = timeout_sec
+        self.max_pending = max_pending
+        self.pending = 0
+        self.running = 0
+        self.overflow = 0
+        self.outcomes: dict[str, int] = {}
+        self.errors: collections.deque = collections.deque(maxlen=20)
+        self._group: asyncio.TaskGroup | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._stopping: asyncio.Event | None = None
+        # last queued job per key; the next job of that key waits for it
+        self._tails: dict = {}
+
+    @property
+    def started(self) -> bool:
+        return self._group is not None
+
+    async def run(self) -> None:
+        """Own the task group until ``stop()``; jobs still queued then are finished first."""
+        self._stopping = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        async with asyncio.TaskGroup() as group:
+            self._group = group
+            try:
+                await self._stopping.wait()
+            finally:
+                self._group = None
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def submit(self, name: str, effects: list, *, key=None) -> None:
+        """Run the zero-argument coroutine functions in ``effects`` one after another.
+
+        The job starts after the previous job submitted with the same ``key`` has finished.
+        Before ``run()`` started, or with ``max_pending`` jobs already queued, the job runs
+        right here instead: the caller waits, which throttles a flood of alerts.
+        """
+        if not effects:
+            return
+        previous = self._tails.get(key) if key is not None else None
+        if self._group is None or self.pending >= self.max_pending:
+            if self._group is not None:
+                self.overflow += 1
+                self.logger.warning("SIDE_EFFECTS_OVERFLOW name=%s pending=%s", name, self.pending)
+            # the inline run is the key's tail too, so the next job of the courier waits for it
+            inline = asyncio.get_running_loop().create_future() if key is not None else None
+            if inline is not None:
+                self._tails[key] = inline
+            try:
+                if previous is not None:
+                    await asyncio.wait([previous])
+                await self._run(name, effects)
+            finally:
+                if inline is not None:
+                    inline.set_result(None)
+                    self._forget_tail(key, inline)
+            return
+        self.pending += 1
+        # the update is finished by the time the job runs: no deadline, no request context
+        task = self._group.create_task(
+            self._run_queued(name, effects, previous), name=f"side_effect:{name}", context=detached_context()
+        )
+        if key is not None:
+            self._tails[key] = task
+            task.add_done_callback(lambda done: self._forget_tail(key, done))
+
+    def _forget_tail(self, key, task: asyncio.Future) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _run_queued(self, name: str, effects: list, previous: asyncio.Future | None) -> None:
+        try:
+            if previous is not None:
+                # wait outside the concurrency slots: a courier's backlog does not block others
+                await asyncio.wait([previous])
+            async with self._slots:
+                self.running += 1
+                try:
+                    await self._run(name, effects)
+                finally:
+                    self.running -= 1
+        finally:
+            self.pending -= 1
+
+    async def _run(self, name: str, effects: list) -> None:
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            async with asyncio.timeout(self.timeout_sec):
+                for effect in effects:
+                    await effect()
+        except TimeoutError:
+            outcome = "timeout"
+            self.logger.warning("SIDE_EFFECT_TIMEOUT name=%s timeout_sec=%s", name, self.timeout_sec)
+        except Exception as exc:
+            outcome = "error"
+            self.errors.append((name, repr(exc)))
+            self.logger.warning("SIDE_EFFECT_FAILED name=%s error=%s", name, exc)
+        elapsed = time.perf_counter() - started
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        SIDE_EFFECTS_TOTAL.inc(name=name, outcome=outcome)
+        SIDE_EFFECT_DURATION.observe(elapsed, name=name)
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "overflow": self.overflow,
+            "outcomes": dict(self.outcomes),
+            "errors": list(self.errors),
+        }
@@ -1,10 +1,12 @@
-import time
 from typing import Dict, Optional, Tuple
 
+from shiftbot import clock as clock_module
+
 
 class StaffCache:
-    def __init__(self, ttl_sec: int = 30) -> None:
+    def __init__(self, ttl_sec: int = 30, *, clock=clock_module.now) -> None:
         self.ttl_sec = ttl_sec
+        self.clock = clock
         self._cache: Dict[int, Tuple[float, Optional[dict]]] = {}
 
     def get(self, telegram_user_id: int) -> Tuple[bool, Optional[dict]]:
@@ -12,13 +14,13 @@ class StaffCache:
         if not item:
             return False, None
         ts, staff = item
-        if (time.time() - ts) > self.ttl_sec:
+        if (self.clock() - ts) > self.ttl_sec:
             self._cache.pop(telegram_user_id, None)
             return False, None
         return True, staff
 
     def set(self, telegram_user_id: int, staff: Optional[dict]) -> None:
-        self._cache[telegram_user_id] = (time.time(), staff)
+        self._cache[telegram_user_id] = (self.clock(), staff)
 
     def invalidate(self, telegram_user_id: int) -> None:
         self._cache.pop(telegram_user_id, None)
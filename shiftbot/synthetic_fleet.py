@@ -0,0 +1,205 @@
+"""Synthetic fleet for load-testing a staging OpenCart from the bot.
+
+``/test_ping_start fleet ...`` starts one ``SyntheticFleet``: a single scheduler task
+that sends ``ping_add`` for N virtual shifts. Each shift follows a scripted trajectory
+(see ``TRAJECTORIES``), the total rate is capped, and the chat gets a periodic summary
+instead of one message per ping. Ping alerts are not processed for virtual shifts.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import math
+import random
+import time
+from dataclasses import dataclass
+
+from shiftbot.opencart_client import ApiUnavailableError
+from shiftbot.request_stats import LatencyHistogram
+
+INSIDE = "inside"
+DRIFT_OUT = "drift_out"
+FROZEN = "frozen"
+POOR_ACCURACY = "poor_acc"
+TRAJECTORIES = (INSIDE, DRIFT_OUT, FROZEN, POOR_ACCURACY)
+
+METERS_PER_DEG_LAT = 111_320.0
+DRIFT_STEP_M = 25.0
+
+
+def offset_m(lat: float, lon: float, north_m: float, east_m: float) -> tuple[float, float]:
+    return (
+        lat + north_m / METERS_PER_DEG_LAT,
+        lon + east_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6)),
+    )
+
+
+@dataclass
+class VirtualShift:
+    shift_id: int
+    staff_id: int | None
+    trajectory: str
+    lat: float
+    lon: float
+    radius_m: float
+    step: int = 0
+
+    def next_fix(self, rng: random.Random) -> tuple[float, float, float]:
+        """``(lat, lon, acc)`` of the next ping."""
+        step = self.step
+        self.step += 1
+        if self.trajectory == FROZEN:
+            # bit-identical coordinates every time, like a phone left on a table
+            lat, lon = offset_m(self.lat, self.lon, self.radius_m * 0.2, 0.0)
+            return lat, lon, 8.0
+        if self.trajectory == DRIFT_OUT:
+            # walks out to 3 radii and jumps back in, crossing the geofence every cycle
+            distance = (step * DRIFT_STEP_M) % (self.radius_m * 3)
+            lat, lon = offset_m(self.lat, self.lon, distance, rng.uniform(-5, 5))
+            return lat, lon, 12.0
+        noise = self.radius_m * 0.3
+        lat, lon = offset_m(self.lat, self.lon, rng.uniform(-noise, noise), rng.uniform(-noise, noise))
+        if self.trajectory == POOR_ACCURACY:
+            return lat, lon, rng.uniform(150.0, 500.0)
+        return lat, lon, rng.uniform(5.0, 20.0)
+
+
+def build_virtual_shifts(
+    count: int, first_shift_id: int, staff_id: int | None, lat: float, lon: float, radius_m: float
+) -> list[VirtualShift]:
+    """``count`` consecutive shift ids, trajectories assigned round-robin."""
+    return [
+        VirtualShift(first_shift_id + idx, staff_id, TRAJECTORIES[idx % len(TRAJECTORIES)], lat, lon, radius_m)
+        for idx in range(count)
+    ]
+
+
+class FleetStats:
+    def __init__(self) -> None:
+        self.sent = 0
+        self.errors = 0
+        self.statuses: dict[str, int] = {}
+        self.latency = LatencyHistogram()
+        # how late pings left against their schedule; grows when the rate cap bites
+        self.max_lag_sec = 0.0
+
+    def observe(self, status: str, latency_sec: float) -> None:
+        self.sent += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.observe(latency_sec)
+
+
+class SyntheticFleet:
+    def __init__(
+        self,
+        oc_client,
+        logger,
+        shifts: list[VirtualShift],
+        *,
+        interval_sec: float,
+        rate_per_sec: float,
+        max_in_flight: int = 32,
+        seed: int | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        self.oc_client = oc_client
+        self.logger = logger
+        self.shifts = shifts
+        self.interval_sec = interval_sec
+        self.min_gap_sec = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self.max_in_flight = max_in_flight
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.stats = FleetStats()
+        self.started_at = clock()
+        self._in_flight: set[asyncio.Task] = set()
+
+    async def run(self, *, max_pings: int | None = None) -> None:
+        """Scheduler loop; runs until cancelled or ``max_pings`` were sent."""
+        slots = asyncio.Semaphore(self.max_in_flight)
+        start = self.clock()
+        # spread first pings evenly over one interval
+        due = [(start + self.interval_sec * idx / len(self.shifts), idx) for idx in range(len(self.shifts))]
+        heapq.heapify(due)
+        next_slot = start
+        scheduled = 0
+        try:
+            while due and (max_pings is None or scheduled < max_pings):
+                due_at, idx = heapq.heappop(due)
+                send_at = max(due_at, next_slot)
+                delay = send_at - self.clock()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now = self.clock()
+                next_slot = max(now, next_slot) + self.min_gap_sec
+                self.stats.max_lag_sec = max(self.stats.max_lag_sec, now - due_at)
+                await slots.acquire()
+                task = asyncio.create_task(self._ping(self.shifts[idx]))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+                task.add_done_callback(lambda _: slots.release())
+                scheduled += 1
+                heapq.heappush(due, (due_at + self.interval_sec, idx))
+            if self._in_flight:
+                await asyncio.wait(set(self._in_flight))
+        finally:
+            for task in list(self._in_flight):
+                task.cancel()
+
+    async def _ping(self, shift: VirtualShift) -> None:
+        lat, lon, acc = shift.next_fix(self.rng)
+        started = self.clock()
+        try:
+            response = await self.oc_client.ping_add(
+                shift_id=shift.shift_id,
+                staff_id=shift.staff_id,
+                lat=round(lat, 7),
+                lon=round(lon, 7),
+                acc=round(acc, 1),
+                status_fields={"source": "synthetic", "trajectory": shift.trajectory},
+            )
+        except ApiUnavailableError:
+            self.stats.errors += 1
+            self.stats.observe("unavailable", self.clock() - started)
+            return
+        except Exception as exc:
+            self.stats.errors += 1
+            self.stats.observe("error", self.clock() - started)
+            self.logger.warning("TEST_FLEET_PING_ERROR shift_id=%s error=%s", shift.shift_id, exc)
+            return
+        if response.get("ok") is False:
+            status = str(response.get("error") or "error")
+        else:
+            status = str(response.get("status") or "UNKNOWN").upper()
+        self.stats.observe(status, self.clock() - started)
+
+    def format_report(self) -> str:
+        stats = self.stats
+        elapsed = max(self.clock() - self.started_at, 1e-9)
+        latency = stats.latency.as_dict()
+        statuses = ", ".join(f"{name} {count}" for name, count in sorted(stats.statuses.items())) or "—"
+        return (
+            f"Тестовый флот: {len(self.shifts)} смен, интервал {self.interval_sec:g}с\n"
+            f"Отправлено {stats.sent} пингов ({stats.sent / elapsed:.1f}/с), ошибок {stats.errors}\n"
+            f"Статусы: {statuses}\n"
+            f"Ответ API p50≤{latency['p50_sec'] * 1000:.0f}мс p95≤{latency['p95_sec'] * 1000:.0f}мс "
+            f"max {latency['max_sec'] * 1000:.0f}мс, отставание до {stats.max_lag_sec:.1f}с"
+        )
+
+
+async def run_with_reports(fleet: SyntheticFleet, send_report, report_every_sec: float, logger) -> None:
+    """Run ``fleet`` and call ``send_report(text)`` every ``report_every_sec`` seconds."""
+    runner = asyncio.create_task(fleet.run())
+    try:
+        while not runner.done():
+            await asyncio.wait([runner], timeout=report_every_sec)
+            report = fleet.format_report()
+            logger.info("TEST_FLEET_REPORT sent=%s errors=%s", fleet.stats.sent, fleet.stats.errors)
+            try:
+                await send_report(report)
+            except Exception as exc:
+                logger.warning("TEST_FLEET_REPORT_FAILED error=%s", exc)
+    finally:
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await runner
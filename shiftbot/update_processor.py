@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUEUE_WAIT_SEC = 2.0
+
+
+@dataclass
+class TimingStats:
+    count: int = 0
+    total_sec: float = 0.0
+    max_sec: float = 0.0
+
+    def observe(self, value_sec: float) -> None:
+        self.count += 1
+        self.total_sec += value_sec
+        if value_sec > self.max_sec:
+            self.max_sec = value_sec
+
+    def as_dict(self) -> dict:
+        avg = self.total_sec / self.count if self.count else 0.0
+        return {"count": self.count, "avg_sec": avg, "max_sec": self.max_sec, "total_sec": self.total_sec}
+
+
+class _KeyLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+def update_order_key(update: object) -> int | None:
+    """Key that must be processed strictly in order: the telegram user, else the chat."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different users concurrently, updates of one user in arrival order.
+
+    PTB acquires its own semaphore before calling ``do_process_update``, so that one is sized
+    as the cap on *pending* updates, while ``max_workers`` limits updates that actually run.
+    Waiting on a user's lock therefore never occupies a worker slot, and a single courier
+    flooding edits cannot starve everyone else.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int | None = None) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be a positive integer")
+        super().__init__(max(max_pending or 0, max_workers))
+        self.max_workers = max_workers
+        self._workers = asyncio.Semaphore(max_workers)
+        self._key_locks: dict[int, _KeyLock] = {}
+        self.queue_wait = TimingStats()
+        self.processing = TimingStats()
+        self.in_progress = 0
+
+    async def do_process_update(self, update, coroutine) -> None:
+        enqueued_at = time.monotonic()
+        key = update_order_key(update)
+
+        key_lock = None
+        if key is not None:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = _KeyLock()
+            key_lock.users += 1
+
+        try:
+            if key_lock is not None:
+                await key_lock.lock.acquire()
+            try:
+                async with self._workers:
+                    started_at = time.monotonic()
+                    wait_sec = started_at - enqueued_at
+                    self.queue_wait.observe(wait_sec)
+                    if wait_sec >= SLOW_QUEUE_WAIT_SEC:
+                        logger.warning("UPDATE_QUEUE_WAIT_SLOW key=%s wait=%.3fs", key, wait_sec)
+                    self.in_progress += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.in_progress -= 1
+                        self.processing.observe(time.monotonic() - started_at)
+            finally:
+                if key_lock is not None:
+                    key_lock.lock.release()
+        finally:
+            if key_lock is not None:
+                key_lock.users -= 1
+                if key_lock.users == 0:
+                    self._key_locks.pop(key, None)
+
+    def snapshot(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_concurrent_updates,
+            "pending": self.current_concurrent_updates,
+            "in_progress": self.in_progress,
+            "active_keys": len(self._key_locks),
+            "queue_wait": self.queue_wait.as_dict(),
+            "processing": self.processing.as_dict(),
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        snapshot = self.snapshot()
+        logger.info(
+            "UPDATE_PROCESSOR_STATS processed=%s queue_wait_avg=%.4fs queue_wait_max=%.4fs "
+            "processing_avg=%.4fs processing_max=%.4fs",
+            snapshot["processing"]["count"],
+            snapshot["queue_wait"]["avg_sec"],
+            snapshot["queue_wait"]["max_sec"],
+            snapshot["processing"]["avg_sec"],
+            snapshot["processing"]["max_sec"],
+        )
@@ -1,9 +1,9 @@
-import time
 from datetime import datetime
 
 from telegram.ext import ContextTypes
 
-from shiftbot import config
+from shiftbot import clock, config
+from shiftbot.metrics import ADMIN_ALERTS_TOTAL
 
 ADMIN_NOTIFY_COOLDOWN_KEY = "admin_notify_cooldowns"
 
@@ -57,7 +57,7 @@ async def maybe_send_admin_notify_from_decision(
         return False
 
     cooldowns = app.bot_data.setdefault(ADMIN_NOTIFY_COOLDOWN_KEY, {})
-    now = time.time()
+    now = clock.now()
     cooldown_reason_value = str(cooldown_reason or reason)
     cooldown_key = (int(shift_id), cooldown_reason_value)
     last_sent_at = cooldowns.get(cooldown_key)
@@ -90,6 +90,7 @@ async def maybe_send_admin_notify_from_decision(
         await context.bot.send_message(chat_id=admin_chat_id, text=text_to_send)
 
     cooldowns[cooldown_key] = now
+    ADMIN_ALERTS_TOTAL.inc(alert_type="violation_decision")
     logger.info(
         "ADMIN_NOTIFY_SENT shift_id=%s reason=%s cooldown_reason=%s round=%s chats=%s",
         shift_id,
@@ -0,0 +1,182 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from shiftbot import deadline
+from shiftbot.adaptive_limit import AdaptiveLimiter
+from shiftbot.opencart_client import ApiUnavailableError, DeadlineExceeded, OpenCartClient
+
+real_sleep = asyncio.sleep
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class AdaptiveLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_aimd_window_shrinks_once_per_burst_and_grows_back(self):
+        now = [0.0]
+        limiter = AdaptiveLimiter(initial=10, min_limit=2, max_limit=12, latency_target_sec=1.0, clock=lambda: now[0])
+
+        for _ in range(3):
+            await limiter.acquire()
+        for _ in range(3):
+            limiter.release(latency_sec=5.0)
+        self.assertEqual((limiter.limit, limiter.decreases), (7, 1))
+
+        for _ in range(30):
+            await limiter.acquire()
+            limiter.release(latency_sec=0.1)
+        self.assertEqual(limiter.limit, 10)
+
+        await limiter.acquire()
+        limiter.release(latency_sec=None)
+        self.assertEqual(limiter.limit, 10)
+
+    async def test_waiters_are_served_by_priority(self):
+        limiter = AdaptiveLimiter(initial=1, max_limit=1, latency_target_sec=1.0)
+        order = []
+        await limiter.acquire()
+
+        async def worker(tag, priority):
+            await limiter.acquire(priority)
+            order.append(tag)
+            limiter.release(latency_sec=None)
+
+        tasks = [asyncio.create_task(worker("bulk", 2)), asyncio.create_task(worker("interactive", 0))]
+        await real_sleep(0)
+        self.assertEqual(limiter.waiting, 2)
+        limiter.release(latency_sec=None)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(order, ["interactive", "bulk"])
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class RecordingLimiter(AdaptiveLimiter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.releases = []
+
+    def release(self, *, latency_sec, failed=False):
+        self.releases.append(failed)
+        super().release(latency_sec=latency_sec, failed=failed)
+
+
+class LimitedClientTests(unittest.IsolatedAsyncioTestCase):
+    def make_client(self, handler, limiter):
+        client = OpenCartClient(
+            "https://example.com", "secret", DummyLogger(), limiter=limiter, transport=httpx.MockTransport(handler)
+        )
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def test_limiter_sees_the_final_attempt_of_each_call(self):
+        statuses = [502, 200, 503, 503, 503]
+
+        async def handler(request):
+            status = statuses.pop(0)
+            return httpx.Response(status, json={"ok": True} if status == 200 else None)
+
+        async def fast_backoff(_delay):
+            await real_sleep(0)
+
+        limiter = RecordingLimiter(initial=4, max_limit=4, latency_target_sec=10.0)
+        client = self.make_client(handler, limiter)
+        with patch("shiftbot.opencart_client.asyncio.sleep", fast_backoff):
+            await client.ping_add(shift_id=1, lat=1.0, lon=2.0)
+            with self.assertRaises(ApiUnavailableError):
+                await client.ping_add(shift_id=2, lat=1.0, lon=2.0)
+
+        # a 502 absorbed by a retry is not congestion; running out of retries is
+        self.assertEqual(limiter.releases, [False, True])
+        self.assertEqual(limiter.decreases, 1)
+
+    async def test_deadline_applies_while_queued_in_limiter_without_holding_a_lane_slot(self):
+        limiter = AdaptiveLimiter(initial=1, max_limit=1, latency_target_sec=1.0)
+        client = self.make_client(lambda request: httpx.Response(200, json={"ok": True}), limiter)
+        await limiter.acquire()
+
+        async def queued_ping():
+            with deadline.budget(0.1):
+                await client.ping_add(shift_id=1, lat=1.0, lon=2.0)
+
+        task = asyncio.create_task(queued_ping())
+        await real_sleep(0.01)
+        lane = client.snapshot()["lanes"]["ping"]
+        self.assertEqual((lane["in_flight"], lane["waiting"], limiter.waiting), (0, 0, 1))
+
+        with self.assertRaises(DeadlineExceeded):
+            await task
+        limiter.release(latency_sec=None)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class SlowBackendSimulationTests(unittest.IsolatedAsyncioTestCase):
+    """A mock OpenCart that slows down past 4 concurrent requests and sheds load past 12."""
+
+    async def run_load(self, limiter):
+        state = {"in_flight": 0, "rejected": 0, "failed": 0}
+
+        async def handler(request):
+            state["in_flight"] += 1
+            try:
+                if state["in_flight"] > 12:
+                    state["rejected"] += 1
+                    return httpx.Response(503)
+                await real_sleep(0.005 + 0.005 * max(0, state["in_flight"] - 4))
+                return httpx.Response(200, json={"ok": True})
+            finally:
+                state["in_flight"] -= 1
+
+        client = OpenCartClient(
+            "https://example.com",
+            "secret",
+            DummyLogger(),
+            lane_limits={"ping": 50},
+            limiter=limiter,
+            transport=httpx.MockTransport(handler),
+        )
+        self.addAsyncCleanup(client.aclose)
+
+        async def ping():
+            try:
+                await client.ping_add(shift_id=1, lat=1.0, lon=2.0)
+            except ApiUnavailableError:
+                state["failed"] += 1
+
+        async def fast_backoff(_delay):
+            await real_sleep(0)
+
+        with patch("shiftbot.opencart_client.asyncio.sleep", fast_backoff):
+            for _ in range(3):
+                await asyncio.gather(*(ping() for _ in range(40)))
+        return state
+
+    async def test_limiter_backs_off_under_distress(self):
+        unlimited = await self.run_load(None)
+        limiter = AdaptiveLimiter(initial=20, min_limit=1, max_limit=40, latency_target_sec=0.05)
+        limited = await self.run_load(limiter)
+
+        self.assertGreater(limiter.decreases, 0)
+        self.assertLess(limiter.limit, 20)
+        self.assertLess(limited["rejected"], unlimited["rejected"])
+        self.assertLess(limited["failed"], unlimited["failed"])
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertGreater(limiter.snapshot()["queue_wait"]["count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+import asyncio
+import unittest
+
+import httpx
+
+from shiftbot.admin_directory import AdminDirectory
+from shiftbot.admin_notify import notify_admins
+from shiftbot.opencart_client import ApiUnavailableError, OpenCartClient
+
+
+class DummyLogger:
+    def __init__(self):
+        self.warnings = []
+
+    def debug(self, *args, **kwargs):
+        pass
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, msg, *args, **kwargs):
+        self.warnings.append(msg % args if args else msg)
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DummyClient:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+        self.gate: asyncio.Event | None = None
+
+    async def fetch_admin_chat_ids(self, *, etag=None):
+        self.calls.append(etag)
+        if self.gate is not None:
+            await self.gate.wait()
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class DummyBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append(chat_id)
+
+
+class DummyApplication:
+    def __init__(self):
+        self.bot_data = {}
+
+
+class DummyContext:
+    def __init__(self):
+        self.application = DummyApplication()
+        self.bot = DummyBot()
+
+
+class AdminDirectoryTests(unittest.IsolatedAsyncioTestCase):
+    def make_directory(self, client, fallback=None):
+        clock = FakeClock()
+        directory = AdminDirectory(client, DummyLogger(), ttl_sec=600, retry_sec=30, fallback=fallback, clock=clock)
+        return directory, clock
+
+    async def test_stale_value_is_served_while_refresh_runs_in_background(self):
+        client = DummyClient(
+            [
+                {"status": 200, "chat_ids": [1, 2], "etag": '"v1"'},
+                {"status": 200, "chat_ids": [3], "etag": '"v2"'},
+            ]
+        )
+        directory, clock = self.make_directory(client)
+        bot_data = {}
+        directory.attach(bot_data)
+        self.assertEqual(await directory.get(), [1, 2])
+        published = bot_data["admin_chat_ids"]
+
+        clock.now += 601
+        client.gate = asyncio.Event()
+        self.assertEqual(await directory.get(), [1, 2])
+        self.assertEqual(await directory.get(), [1, 2])
+        await asyncio.sleep(0)
+        self.assertEqual(client.calls, [None, '"v1"'])
+
+        client.gate.set()
+        await directory._refresh_task
+        self.assertEqual(bot_data["admin_chat_ids"], [3])
+        # published as a new list: readers of the old one are not affected
+        self.assertIsNot(bot_data["admin_chat_ids"], published)
+        self.assertEqual(published, [1, 2])
+
+    async def test_not_modified_extends_freshness_without_republishing(self):
+        client = DummyClient(
+            [
+                {"status": 200, "chat_ids": [5], "etag": '"v1"'},
+                {"status": 304, "chat_ids": None, "etag": '"v1"'},
+            ]
+        )
+        directory, clock = self.make_directory(client)
+        bot_data = {}
+        directory.attach(bot_data)
+        await directory.refresh()
+        published = bot_data["admin_chat_ids"]
+
+        clock.now += 601
+        self.assertTrue(directory.is_stale())
+        self.assertTrue(await directory.refresh())
+
+        self.assertFalse(directory.is_stale())
+        self.assertIs(bot_data["admin_chat_ids"], published)
+
+    async def test_failure_keeps_last_value_and_retries_later(self):
+        client = DummyClient(
+            [
+                {"status": 200, "chat_ids": [5], "etag": None},
+                ApiUnavailableError("temporary_api_error"),
+            ]
+        )
+        directory, clock = self.make_directory(client, fallback=[777])
+        await directory.refresh()
+
+        clock.now += 601
+        self.assertFalse(await directory.refresh())
+
+        self.assertEqual(directory.chat_ids, [5])
+        self.assertFalse(directory.is_stale())
+        clock.now += 31
+        self.assertTrue(directory.is_stale())
+
+    async def test_fallback_is_served_when_first_load_fails(self):
+        client = DummyClient([{"status": 500, "chat_ids": None, "etag": None}])
+        directory, _ = self.make_directory(client, fallback=[777])
+
+        self.assertEqual(await directory.get(), [777])
+
+    async def test_empty_list_replaces_admins_instead_of_failing(self):
+        client = DummyClient(
+            [
+                {"status": 200, "chat_ids": [5], "etag": '"v1"'},
+                {"status": 200, "chat_ids": [], "etag": '"v2"'},
+            ]
+        )
+        directory, clock = self.make_directory(client, fallback=[777])
+        await directory.refresh()
+
+        clock.now += 601
+        self.assertTrue(await directory.refresh())
+
+        self.assertEqual(directory.chat_ids, [777])
+        self.assertEqual(directory.etag, '"v2"')
+        clock.now += 31
+        self.assertFalse(directory.is_stale())
+
+    async def test_notify_admins_does_not_wait_for_refresh(self):
+        client = DummyClient([{"status": 200, "chat_ids": [11], "etag": None}, {"status": 200, "chat_ids": [12]}])
+        directory, clock = self.make_directory(client)
+        context = DummyContext()
+        directory.attach(context.application.bot_data)
+        context.application.bot_data["admin_directory"] = directory
+        await directory.refresh()
+
+        clock.now += 601
+        client.gate = asyncio.Event()
+        sent = await asyncio.wait_for(notify_admins(context, "alert"), timeout=1)
+
+        self.assertTrue(sent)
+        self.assertEqual(context.bot.sent, [11])
+        client.gate.set()
+        await directory._refresh_task
+        self.assertEqual(context.application.bot_data["admin_chat_ids"], [12])
+
+
+class FetchAdminChatIdsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_conditional_request_sends_etag_and_handles_304(self):
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, json={"ok": True, "chat_ids": [1, "2"]}, headers={"ETag": '"v1"'})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger(), transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        first = await client.fetch_admin_chat_ids()
+        second = await client.fetch_admin_chat_ids(etag=first["etag"])
+
+        self.assertEqual(first, {"status": 200, "chat_ids": [1, 2], "etag": '"v1"'})
+        self.assertEqual(second, {"status": 304, "chat_ids": None, "etag": '"v1"'})
+        self.assertEqual(seen, [None, '"v1"'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+from types import SimpleNamespace
+
+import httpx
+
+from shiftbot import deadline
+from shiftbot.call_budget import (
+    ACCOUNTING,
+    TARGET_OPENCART,
+    TARGET_TELEGRAM,
+    capture_calls,
+    track_calls,
+)
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.opencart_client import OpenCartClient
+from shiftbot.request_context import request_scope, with_request_context
+from shiftbot.session_store import SessionStore
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def debug(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class DummyOcClient:
+    def __init__(self, ping_response=None):
+        self.ping_response = ping_response or {"ok": True, "status": "IN", "out_streak": 0}
+
+    async def get_staff_by_telegram(self, telegram_user_id: int):
+        return {"staff_id": 42, "telegram_user_id": telegram_user_id, "full_name": "Иван", "is_active": 1}
+
+    async def get_active_shift_by_staff(self, staff_id: int):
+        return {"shift_id": 500, "point_id": 7, "point_lat": 56.6, "point_lon": 47.9, "point_radius": 120}
+
+    async def ping_add(self, **kwargs):
+        return dict(self.ping_response)
+
+
+class DummyBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+
+class DummyMessage:
+    def __init__(self, lat, lon, acc=10.0):
+        self.location = SimpleNamespace(latitude=lat, longitude=lon, horizontal_accuracy=acc)
+        self.chat_id = 70
+
+    async def reply_text(self, text, **kwargs):
+        return None
+
+    async def edit_text(self, text, **kwargs):
+        return None
+
+
+def make_location_edit(update_id, lat=56.6, lon=47.9):
+    message = track_calls(DummyMessage(lat, lon), TARGET_TELEGRAM)
+    return SimpleNamespace(
+        update_id=update_id,
+        effective_message=message,
+        edited_message=message,
+        effective_user=SimpleNamespace(id=7),
+        effective_chat=SimpleNamespace(id=70),
+    )
+
+
+class CallBudgetTests(unittest.IsolatedAsyncioTestCase):
+    """Budgets of outbound calls per update. Raise a number only on purpose."""
+
+    def setUp(self):
+        self.session_store = SessionStore()
+        session = self.session_store.get_or_create(7, 70)
+        session.active = True
+        session.active_shift_id = 500
+        session.active_point_id = 7
+        session.active_point_lat = 56.6
+        session.active_point_lon = 47.9
+        session.active_point_radius = 120
+        self.oc_client = track_calls(DummyOcClient(), TARGET_OPENCART)
+        self.context = SimpleNamespace(
+            bot=track_calls(DummyBot(), TARGET_TELEGRAM),
+            application=SimpleNamespace(bot_data={"admin_chat_ids": []}),
+        )
+        detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+        handlers = build_location_handlers(self.session_store, None, self.oc_client, detector, DummyLogger())
+        handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_location_message")
+        self.handle_location = with_request_context(handler).callback
+
+    async def test_steady_state_live_location_edit(self):
+        await self.handle_location(make_location_edit(1), self.context)
+
+        with capture_calls() as calls:
+            await self.handle_location(make_location_edit(2), self.context)
+
+        # staff lookup + active shift check + ping_add; no message to the courier
+        self.assertEqual(calls.ops(TARGET_OPENCART), ["get_staff_by_telegram", "get_active_shift_by_staff", "ping_add"])
+        self.assertEqual(calls.count(TARGET_TELEGRAM), 0)
+        self.assertEqual(calls.count(handler="handle_location_message"), 3)
+
+    async def test_third_out_in_a_row_warns_courier_once(self):
+        self.oc_client.ping_response = {"ok": True, "status": "OUT", "out_streak": 3, "dist_m": 400, "radius_m": 120}
+
+        with capture_calls() as calls:
+            await self.handle_location(make_location_edit(3, lat=56.7), self.context)
+
+        self.assertEqual(calls.count(TARGET_OPENCART), 3)
+        self.assertEqual(calls.ops(TARGET_TELEGRAM), ["reply_text"])
+
+    async def test_accounting_keeps_per_handler_breakdown(self):
+        before = ACCOUNTING.snapshot().get("handle_location_message", {"updates": 0})["updates"]
+
+        await self.handle_location(make_location_edit(4), self.context)
+
+        stats = ACCOUNTING.snapshot()["handle_location_message"]
+        self.assertEqual(stats["updates"], before + 1)
+        self.assertGreaterEqual(stats["targets"][TARGET_OPENCART]["per_update_max"], 3)
+        self.assertIn("ping_add", stats["targets"][TARGET_OPENCART]["ops"])
+
+
+class OpenCartClientAccountingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_real_client_calls_are_tagged_with_handler_and_update(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"ok": True, "staff": {"staff_id": 1}})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger(), transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        with capture_calls() as calls:
+            with request_scope(SimpleNamespace(update_id=77), "cmd_status"):
+                await client.get_staff(1)
+            await client.get_staff(2)
+
+        self.assertEqual(calls.count(TARGET_OPENCART, handler="cmd_status", update_id=77), 1)
+        self.assertEqual(calls.count(TARGET_OPENCART, handler="background"), 1)
+        self.assertEqual(calls.ops(), ["staff_by_telegram", "staff_by_telegram"])
+
+    async def test_detached_task_calls_are_background(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"ok": True, "staff": {"staff_id": 1}})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger(), transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        with capture_calls() as calls:
+            with request_scope(SimpleNamespace(update_id=78), "cmd_status") as context:
+                task = deadline.spawn_detached(client.get_staff(1))
+            await task
+
+        self.assertEqual(calls.count(TARGET_OPENCART, handler="background"), 1)
+        self.assertEqual(context.calls, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+
+from benchmarks.simulate_shifts import Simulation
+from shiftbot import clock, config
+from shiftbot.staff_cache import StaffCache
+
+
+class ClockTests(unittest.TestCase):
+    def test_use_clock_swaps_and_restores_source(self):
+        virtual = clock.VirtualClock(start_ts=100.0)
+        with clock.use_clock(virtual):
+            virtual.advance(5)
+            self.assertEqual(clock.now(), 105.0)
+        self.assertAlmostEqual(clock.now(), time.time(), delta=5)
+
+    def test_staff_cache_expires_in_virtual_time(self):
+        virtual = clock.VirtualClock()
+        cache = StaffCache(ttl_sec=30)
+        with clock.use_clock(virtual):
+            cache.set(7, {"staff_id": 1})
+            virtual.advance(30)
+            self.assertEqual(cache.get(7), (True, {"staff_id": 1}))
+            virtual.advance(1)
+            self.assertEqual(cache.get(7), (False, None))
+
+
+class VirtualTimeSimulationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_dark_couriers_are_stopped_and_visible_ones_are_not(self):
+        simulation = Simulation(shifts=20, hours=0.5, dark_share=0.5, dark_mean_sec=1800, away_share=0.0, seed=3)
+
+        started = time.perf_counter()
+        result = await simulation.run()
+
+        self.assertLess(time.perf_counter() - started, 10)
+        self.assertEqual(result["stale_checks"], 1800 // config.STALE_CHECK_EVERY_SEC)
+        self.assertGreater(result["auto_stopped"], 0)
+        self.assertEqual(result["false_stops"], 0)
+        self.assertEqual(result["admin_messages"], result["auto_stopped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
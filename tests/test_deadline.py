@@ -0,0 +1,157 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import httpx
+
+from shiftbot import deadline
+from shiftbot.opencart_client import ApiUnavailableError, DeadlineExceeded, OpenCartClient
+
+
+class DummyLogger:
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, msg, *args, **kwargs):
+        self.warnings.append(msg % args if args else msg)
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class DeadlineClientTests(unittest.IsolatedAsyncioTestCase):
+    def make_client(self, handler):
+        client = OpenCartClient("https://example.com", "secret", DummyLogger(), transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def test_retry_that_does_not_fit_budget_is_skipped(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503, text="busy")
+
+        client = self.make_client(handler)
+        skipped_before = deadline.DEADLINE_EXCEEDED_TOTAL.value(scope="opencart_retry")
+
+        with deadline.budget(0.2):
+            with self.assertRaises(ApiUnavailableError):
+                await client._request("GET", params={"route": "x"})
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(deadline.DEADLINE_EXCEEDED_TOTAL.value(scope="opencart_retry"), skipped_before + 1)
+
+    async def test_expired_budget_sends_nothing_and_timeouts_are_trimmed(self):
+        calls = []
+        client = self.make_client(lambda request: calls.append(request) or httpx.Response(200, json={}))
+
+        with deadline.budget(0.0):
+            with self.assertRaises(DeadlineExceeded):
+                await client._request("GET", params={"route": "x"})
+        self.assertEqual(calls, [])
+
+        with deadline.budget(2.0):
+            timeout = client._attempt_timeout()
+        self.assertLessEqual(timeout.read, 2.0)
+        self.assertLessEqual(timeout.connect, 2.0)
+        self.assertIsNone(deadline.remaining())
+
+    async def test_nested_budget_cannot_extend_outer_one(self):
+        with deadline.budget(1.0):
+            with deadline.budget(10.0):
+                self.assertLessEqual(deadline.remaining(), 1.0)
+
+
+class WithDeadlineTests(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_handler_is_cancelled_and_counted(self):
+        replies = []
+        cancelled = asyncio.Event()
+
+        async def handle_location(update, context):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def reply_text(text, **kwargs):
+            replies.append(text)
+
+        logger = DummyLogger()
+        handler = deadline.with_deadline(SimpleNamespace(callback=handle_location), 0.05, logger)
+        message = SimpleNamespace(reply_text=reply_text)
+        update = SimpleNamespace(message=message, effective_message=message)
+        before = deadline.DEADLINE_EXCEEDED_TOTAL.value(scope="handler:handle_location")
+
+        await handler.callback(update, None)
+
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(replies, ["Временная ошибка связи."])
+        self.assertEqual(deadline.DEADLINE_EXCEEDED_TOTAL.value(scope="handler:handle_location"), before + 1)
+        self.assertTrue(logger.warnings[0].startswith("HANDLER_DEADLINE_EXCEEDED handler=handle_location"))
+
+    async def test_live_location_edit_gets_no_error_reply(self):
+        replies = []
+
+        async def handle_location(update, context):
+            await asyncio.sleep(5)
+
+        async def reply_text(text, **kwargs):
+            replies.append(text)
+
+        handler = deadline.with_deadline(SimpleNamespace(callback=handle_location), 0.05, DummyLogger())
+        message = SimpleNamespace(reply_text=reply_text)
+        update = SimpleNamespace(message=None, edited_message=message, effective_message=message)
+
+        await handler.callback(update, None)
+
+        self.assertEqual(replies, [])
+
+    async def test_timeout_raised_by_the_callback_is_not_swallowed(self):
+        async def handle_location(update, context):
+            raise TimeoutError("upstream")
+
+        handler = deadline.with_deadline(SimpleNamespace(callback=handle_location), 5.0, DummyLogger())
+
+        with self.assertRaises(TimeoutError):
+            await handler.callback(SimpleNamespace(message=None), None)
+
+    async def test_committing_call_finishes_past_the_budget(self):
+        steps = []
+
+        async def stop_shift(update, context):
+            with deadline.committing():
+                self.assertIsNone(deadline.remaining())
+                await asyncio.sleep(0.1)
+                steps.append("committed")
+            steps.append("session updated")
+            await asyncio.sleep(5)
+            steps.append("not reached")
+
+        handler = deadline.with_deadline(SimpleNamespace(callback=stop_shift), 0.05, DummyLogger())
+
+        await handler.callback(SimpleNamespace(message=None), None)
+
+        self.assertEqual(steps, ["committed", "session updated"])
+
+    async def test_detached_task_does_not_inherit_deadline(self):
+        async def read_remaining():
+            return deadline.remaining()
+
+        with deadline.budget(1.0):
+            inherited = await asyncio.create_task(read_remaining())
+            detached = await deadline.spawn_detached(read_remaining())
+
+        self.assertIsNotNone(inherited)
+        self.assertIsNone(detached)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from benchmarks.fake_opencart import POINT, FakeOpenCart, FaultProfile
+from shiftbot.opencart_client import ApiUnavailableError, OpenCartClient
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeOpenCartTests(unittest.IsolatedAsyncioTestCase):
+    def make_client(self, fake):
+        client = OpenCartClient("http://opencart.local", "secret", DummyLogger(), transport=fake.transport())
+        self.addAsyncCleanup(client.aclose)
+        return client
+
+    async def test_real_client_walks_a_shift_through_the_fake(self):
+        fake = FakeOpenCart(FaultProfile(latency_sec=0), admin_chat_ids=[9])
+        client = self.make_client(fake)
+
+        staff = await client.get_staff_by_telegram(77)
+        shift = await client.get_active_shift_by_staff(staff["staff_id"])
+        inside = await client.ping_add(
+            shift_id=shift["shift_id"], staff_id=staff["staff_id"], lat=POINT["point_lat"], lon=POINT["point_lon"], acc=5
+        )
+        outside = await client.ping_add(
+            shift_id=shift["shift_id"], staff_id=staff["staff_id"], lat=POINT["point_lat"] + 0.01, lon=POINT["point_lon"], acc=5
+        )
+        ticks = await client.violation_tick_many([shift["shift_id"], 1])
+        bulk = await client.get_active_shifts_bulk([staff["staff_id"]])
+        admins = await client.fetch_admin_chat_ids()
+        not_modified = await client.fetch_admin_chat_ids(etag=admins["etag"])
+        ended = await client.shift_end({"shift_id": shift["shift_id"], "end_reason": "manual"})
+
+        self.assertEqual(inside["status"], "IN")
+        self.assertEqual((outside["status"], outside["out_streak"]), ("OUT", 1))
+        self.assertTrue(ticks[shift["shift_id"]]["ok"])
+        self.assertEqual(ticks[1]["error"], "shift_not_active")
+        self.assertEqual(bulk[staff["staff_id"]]["shift_id"], shift["shift_id"])
+        self.assertEqual((admins["chat_ids"], not_modified["status"]), ([9], 304))
+        self.assertTrue(ended["ok"])
+        self.assertTrue(await client.health_check())
+        self.assertEqual(fake.calls["ping_add"], 2)
+
+    async def test_burst_answers_502_and_client_retries(self):
+        clock = FakeClock()
+        fake = FakeOpenCart(FaultProfile(latency_sec=0, burst_every_sec=10, burst_len_sec=2), clock=clock)
+        client = self.make_client(fake)
+
+        clock.now = 9.0
+        with patch("shiftbot.opencart_client.asyncio.sleep", AsyncMock()):
+            with self.assertRaises(ApiUnavailableError):
+                await client.get_points()
+        clock.now = 11.0
+        points = await client.get_points()
+
+        self.assertEqual(fake.statuses[502], 3)
+        self.assertEqual(points[0]["geo_lat"], POINT["point_lat"])
+
+
+if __name__ == "__main__":
+    unittest.main()
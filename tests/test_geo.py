@@ -0,0 +1,76 @@
+import math
+import random
+import unittest
+
+from shiftbot.geo import GeoArray, Geofence, PointsGeo, _np, haversine_m
+
+POINTS = [
+    {"id": 1, "short_name": "ДЛ 1", "geo_lat": 56.6285, "geo_lon": 47.8944, "geo_radius_m": 120},
+    {"id": 2, "short_name": "ДЛ 2", "geo_lat": 56.6300, "geo_lon": 47.9000, "geo_radius_m": None},
+    {"id": 3, "short_name": "ДЛ 3", "geo_lat": 56.7000, "geo_lon": 48.0000, "geo_radius_m": 500},
+    {"id": 4, "short_name": "Без координат", "geo_lat": None, "geo_lon": None},
+]
+
+
+class GeoBatchTests(unittest.TestCase):
+    def modes(self):
+        return [False, True] if _np is not None else [False]
+
+    def test_batch_matches_scalar_haversine(self):
+        lats = [p["geo_lat"] for p in POINTS[:3]]
+        lons = [p["geo_lon"] for p in POINTS[:3]]
+        expected = [haversine_m(56.629, 47.895, lat, lon) for lat, lon in zip(lats, lons)]
+        for use_numpy in self.modes():
+            with self.subTest(use_numpy=use_numpy):
+                got = GeoArray(lats, lons, use_numpy=use_numpy).distances_m(56.629, 47.895)
+                for value, reference in zip(got, expected):
+                    self.assertAlmostEqual(value, reference, delta=1e-6)
+
+    def test_nearest_and_within_radius(self):
+        for use_numpy in self.modes():
+            with self.subTest(use_numpy=use_numpy):
+                catalog = PointsGeo(POINTS, default_radius_m=100, use_numpy=use_numpy)
+                self.assertEqual(len(catalog), 3)
+
+                nearest = catalog.nearest(56.6286, 47.8945, k=2)
+                self.assertEqual([point["id"] for point, _ in nearest], [1, 2])
+                self.assertLess(nearest[0][1], nearest[1][1])
+
+                inside = catalog.within_radius(56.6286, 47.8945)
+                self.assertEqual([point["id"] for point, _ in inside], [1])
+
+                wide = catalog.within_radius(56.6286, 47.8945, radius_m=1000)
+                self.assertEqual([point["id"] for point, _ in wide], [1, 2])
+
+    def test_nearest_on_empty_catalog(self):
+        self.assertEqual(PointsGeo([], default_radius_m=100).nearest(0.0, 0.0, k=3), [])
+
+
+class GeofenceTests(unittest.TestCase):
+    def test_contains_agrees_with_haversine(self):
+        rnd = random.Random(5)
+        for center_lat in (0.0, 43.2, 56.63, 69.0):
+            fence = Geofence(center_lat, 47.89, 120)
+            for _ in range(2000):
+                bearing = rnd.uniform(0, 2 * math.pi)
+                dist = rnd.choice([rnd.uniform(0, 400), rnd.uniform(119.0, 121.0)])
+                lat = center_lat + dist * math.cos(bearing) / 111195.0
+                lon = 47.89 + dist * math.sin(bearing) / (111195.0 * math.cos(math.radians(center_lat)))
+                expected = haversine_m(lat, lon, center_lat, 47.89) <= 120
+                self.assertEqual(fence.contains(lat, lon), expected)
+                self.assertEqual(fence.measure(lat, lon)[1], expected)
+
+    def test_approx_distance_within_documented_bound(self):
+        fence = Geofence(56.63, 47.89, 120)
+        for lat, lon in [(56.631, 47.891), (56.6285, 47.8925), (56.632, 47.888)]:
+            reference = haversine_m(lat, lon, 56.63, 47.89)
+            self.assertLessEqual(abs(fence.approx_distance_m(lat, lon) - reference), fence.boundary_band_m)
+
+    def test_far_fix_is_rejected_and_distance_falls_back_to_haversine(self):
+        fence = Geofence(56.63, 47.89, 120)
+        self.assertFalse(fence.contains(55.75, 37.62))
+        self.assertAlmostEqual(fence.distance_m(55.75, 37.62), haversine_m(55.75, 37.62, 56.63, 47.89))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -162,6 +162,188 @@ class StaleJobTests(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(session.active_shift_id)
         self.assertEqual(len(context.bot.messages), 1)
 
+    async def test_bulk_reconcile_replaces_per_session_lookups(self):
+        now = time.time()
+        stale = ShiftSession(user_id=4, chat_id=103, active=True, staff_id=40)
+        stale.active_shift_id = 41
+        stale.last_ping_ts = now - (config.STALE_AFTER_SEC + 5)
+        closed = ShiftSession(user_id=5, chat_id=104, active=True, staff_id=50)
+        closed.active_shift_id = 51
+        closed.last_ping_ts = now
+
+        oc_client = BulkOcClient(
+            response={"ok": True, "decisions": {}},
+            bulk={40: {"shift_id": 41, "point_id": 7}, 50: None},
+        )
+        context = SimpleNamespace(
+            bot=DummyBot(),
+            application=SimpleNamespace(bot_data={ADMIN_NOTIFY_COOLDOWN_KEY: {}, "admin_chat_ids": []}),
+        )
+        stale_job = build_job_check_stale(DummySessionStore([stale, closed]), oc_client, DummyLogger())
+
+        original_notify_cd = config.STALE_NOTIFY_COOLDOWN_SEC
+        config.STALE_NOTIFY_COOLDOWN_SEC = 0
+        try:
+            await stale_job(context)
+        finally:
+            config.STALE_NOTIFY_COOLDOWN_SEC = original_notify_cd
+
+        self.assertEqual(oc_client.bulk_calls, [[40, 50]])
+        self.assertEqual(oc_client.staff_calls, [])
+        self.assertEqual(oc_client.active_shift_calls, [])
+        self.assertEqual(oc_client.calls, [41])
+        self.assertEqual(stale.active_point_id, 7)
+        self.assertFalse(closed.active)
+        self.assertEqual([chat_id for chat_id, _ in context.bot.messages], [104, 103])
+
+    async def test_unsupported_bulk_route_falls_back_to_per_session_refresh(self):
+        now = time.time()
+        session = ShiftSession(user_id=6, chat_id=105, active=True, staff_id=60)
+        session.active_shift_id = 61
+        session.last_ping_ts = now - (config.STALE_AFTER_SEC + 5)
+
+        oc_client = BulkOcClient(response={"ok": True, "decisions": {}}, bulk=None, active_shift={"shift_id": 61})
+        context = SimpleNamespace(
+            bot=DummyBot(),
+            application=SimpleNamespace(bot_data={ADMIN_NOTIFY_COOLDOWN_KEY: {}, "admin_chat_ids": []}),
+        )
+        stale_job = build_job_check_stale(DummySessionStore([session]), oc_client, DummyLogger())
+
+        original_notify_cd = config.STALE_NOTIFY_COOLDOWN_SEC
+        config.STALE_NOTIFY_COOLDOWN_SEC = 0
+        try:
+            await stale_job(context)
+        finally:
+            config.STALE_NOTIFY_COOLDOWN_SEC = original_notify_cd
+
+        self.assertEqual(oc_client.bulk_calls, [[60]])
+        # staff_id is known: no telegram -> staff lookup
+        self.assertEqual(oc_client.staff_calls, [])
+        self.assertEqual(oc_client.active_shift_calls, [60])
+        self.assertEqual(oc_client.calls, [61])
+
+    async def test_staff_omitted_from_bulk_reply_is_not_ended(self):
+        now = time.time()
+        fresh = ShiftSession(user_id=7, chat_id=106, active=True, staff_id=70)
+        fresh.active_shift_id = 71
+        fresh.last_ping_ts = now
+        stale = ShiftSession(user_id=8, chat_id=107, active=True, staff_id=80)
+        stale.active_shift_id = 81
+        stale.last_ping_ts = now - (config.STALE_AFTER_SEC + 5)
+
+        oc_client = BulkOcClient(response={"ok": True, "decisions": {}}, bulk={}, active_shift={"shift_id": 81})
+        context = SimpleNamespace(
+            bot=DummyBot(),
+            application=SimpleNamespace(bot_data={ADMIN_NOTIFY_COOLDOWN_KEY: {}, "admin_chat_ids": []}),
+        )
+        stale_job = build_job_check_stale(DummySessionStore([fresh, stale]), oc_client, DummyLogger())
+
+        original_notify_cd = config.STALE_NOTIFY_COOLDOWN_SEC
+        config.STALE_NOTIFY_COOLDOWN_SEC = 0
+        try:
+            await stale_job(context)
+        finally:
+            config.STALE_NOTIFY_COOLDOWN_SEC = original_notify_cd
+
+        self.assertTrue(fresh.active)
+        self.assertEqual(fresh.active_shift_id, 71)
+        # the stale one gets its own lookup, as without the bulk route
+        self.assertEqual(oc_client.active_shift_calls, [80])
+        self.assertEqual(stale.active_shift_id, 81)
+        self.assertEqual(oc_client.calls, [81])
+
+    async def test_expired_shifts_are_ticked_in_one_batch(self):
+        now = time.time()
+        sessions = []
+        for idx, shift_id in enumerate([81, 82, 83]):
+            session = ShiftSession(user_id=10 + idx, chat_id=200 + idx, active=True, staff_id=shift_id)
+            session.active_shift_id = shift_id
+            session.last_ping_ts = now - (config.STALE_AFTER_SEC + 5)
+            sessions.append(session)
+
+        oc_client = BatchTickOcClient(
+            batch={
+                81: {"ok": True, "decisions": {}},
+                82: {"ok": False, "error": "shift_not_active", "decisions": {}},
+                83: {"ok": True, "decisions": {}},
+            },
+        )
+        context = SimpleNamespace(
+            bot=DummyBot(),
+            application=SimpleNamespace(bot_data={ADMIN_NOTIFY_COOLDOWN_KEY: {}, "admin_chat_ids": []}),
+        )
+        stale_job = build_job_check_stale(DummySessionStore(sessions), oc_client, DummyLogger())
+
+        original_notify_cd = config.STALE_NOTIFY_COOLDOWN_SEC
+        config.STALE_NOTIFY_COOLDOWN_SEC = 0
+        try:
+            await stale_job(context)
+        finally:
+            config.STALE_NOTIFY_COOLDOWN_SEC = original_notify_cd
+
+        self.assertEqual(oc_client.batch_calls, [[81, 82, 83]])
+        self.assertEqual(oc_client.calls, [])
+        self.assertTrue(sessions[0].active)
+        self.assertFalse(sessions[1].active)
+        self.assertEqual(sessions[2].last_out_violation_notified_round, 1)
+
+    async def test_second_notice_sends_no_extra_tick(self):
+        now = time.time()
+        session = ShiftSession(user_id=10, chat_id=200, active=True, staff_id=81)
+        session.active_shift_id = 81
+        session.last_ping_ts = now - (config.STALE_AFTER_SEC + 5)
+
+        oc_client = BatchTickOcClient(batch={81: {"ok": True, "decisions": {}}})
+        context = SimpleNamespace(
+            bot=DummyBot(),
+            application=SimpleNamespace(bot_data={ADMIN_NOTIFY_COOLDOWN_KEY: {}, "admin_chat_ids": []}),
+        )
+        stale_job = build_job_check_stale(DummySessionStore([session]), oc_client, DummyLogger())
+
+        original_notify_cd = config.STALE_NOTIFY_COOLDOWN_SEC
+        config.STALE_NOTIFY_COOLDOWN_SEC = 0
+        try:
+            await stale_job(context)
+            await stale_job(context)
+        finally:
+            config.STALE_NOTIFY_COOLDOWN_SEC = original_notify_cd
+
+        self.assertEqual(session.last_out_violation_notified_round, 2)
+        self.assertEqual(oc_client.batch_calls, [[81], [81]])
+        self.assertEqual(oc_client.calls, [])
+        self.assertEqual(len(oc_client.shift_end_calls), 1)
+
+
+class BatchTickOcClient(DummyOcClient):
+    def __init__(self, batch=None, **kwargs):
+        super().__init__(**kwargs)
+        self.batch = batch
+        self.batch_calls = []
+        self.shift_end_calls = []
+
+    async def violation_tick_many(self, shift_ids):
+        self.batch_calls.append(list(shift_ids))
+        return self.batch
+
+    async def shift_end(self, payload: dict):
+        self.shift_end_calls.append(payload)
+        return {"ok": True}
+
+    async def get_active_shift_by_staff(self, staff_id: int):
+        self.active_shift_calls.append(staff_id)
+        return {"shift_id": staff_id}
+
+
+class BulkOcClient(DummyOcClient):
+    def __init__(self, bulk=None, **kwargs):
+        super().__init__(**kwargs)
+        self.bulk = bulk
+        self.bulk_calls = []
+
+    async def get_active_shifts_bulk(self, staff_ids):
+        self.bulk_calls.append(list(staff_ids))
+        return self.bulk
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,47 @@
+import json
+import logging
+import unittest
+
+from shiftbot.config import _parse_event_rates
+from shiftbot.logging_setup import EventSamplingFilter, JsonFormatter, event_name
+
+
+def make_record(msg: str, *args, level=logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("shiftbot", level, __file__, 1, msg, args, None)
+
+
+class EventSamplingFilterTests(unittest.TestCase):
+    def test_event_name_is_leading_caps_token(self):
+        self.assertEqual(event_name(make_record("PING_ADD shift_id=%s", 1)), "PING_ADD")
+        self.assertEqual(event_name(make_record("[GEO_GATE] result=IN")), "GEO_GATE")
+        self.assertEqual(event_name(make_record("Bot started")), "")
+
+    def test_sampling_keeps_every_nth_and_never_drops_warnings(self):
+        log_filter = EventSamplingFilter({"LOCATION_UPDATE": 0.25})
+
+        kept = [log_filter.filter(make_record("LOCATION_UPDATE user=%s", idx)) for idx in range(8)]
+        self.assertEqual(kept, [True, False, False, False, True, False, False, False])
+        self.assertTrue(log_filter.filter(make_record("LOCATION_UPDATE bad", level=logging.WARNING)))
+        self.assertTrue(log_filter.filter(make_record("PING_ADD shift_id=1")))
+        self.assertEqual(log_filter.dropped, {"LOCATION_UPDATE": 6})
+
+    def test_rate_limit_refills_over_time(self):
+        now = [0.0]
+        log_filter = EventSamplingFilter(rate_limits={"DEAD_SOUL_CHECK": 2}, clock=lambda: now[0])
+
+        kept = [log_filter.filter(make_record("DEAD_SOUL_CHECK x")) for _ in range(4)]
+        self.assertEqual(kept, [True, True, False, False])
+        now[0] = 0.5
+        self.assertTrue(log_filter.filter(make_record("DEAD_SOUL_CHECK x")))
+        self.assertFalse(log_filter.filter(make_record("DEAD_SOUL_CHECK x")))
+
+    def test_json_formatter_and_rate_parsing(self):
+        payload = json.loads(JsonFormatter().format(make_record("PING_ADD status=%s", "IN")))
+        self.assertEqual(payload["event"], "PING_ADD")
+        self.assertEqual(payload["message"], "PING_ADD status=IN")
+        self.assertEqual(payload["level"], "INFO")
+        self.assertEqual(_parse_event_rates("A=0.1, B=5,bad,C=x"), {"A": 0.1, "B": 5.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
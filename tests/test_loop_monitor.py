@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from shiftbot.call_budget import TARGET_OPENCART, capture_calls, track_calls
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.loop_monitor import LOOP_MONITOR, LoopLagMonitor
+from shiftbot.request_context import with_request_context
+from shiftbot.session_store import SessionStore
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def debug(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+def make_monitor(**kwargs):
+    log_root = logging.getLogger("test_loop_monitor")
+    log_root.setLevel(logging.DEBUG)
+    params = {"interval_sec": 0.01, "shed_lag_sec": 0.05, "recover_lag_sec": 0.01, "logger": DummyLogger()}
+    params.update(kwargs)
+    return LoopLagMonitor(log_root=log_root, **params)
+
+
+class LoopLagMonitorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_blocked_loop_is_measured_and_turns_shedding_on(self):
+        monitor = make_monitor()
+        task = asyncio.create_task(monitor.run())
+        self.addCleanup(task.cancel)
+        await asyncio.sleep(0.02)
+
+        time.sleep(0.1)  # a handler hogging the loop
+        await asyncio.sleep(0.01)
+
+        self.assertGreaterEqual(monitor.lag.max_sec, 0.08)
+        self.assertTrue(monitor.shedding)
+
+    async def test_hysteresis_counters_and_debug_logging(self):
+        monitor = make_monitor()
+
+        monitor.observe(0.06)
+        self.assertTrue(monitor.should_shed("companion_notify"))
+        self.assertEqual(monitor.log_root.level, logging.INFO)
+        monitor.observe(0.03)  # between thresholds: still shedding
+        self.assertTrue(monitor.should_shed("companion_notify"))
+        monitor.observe(0.005)
+
+        self.assertFalse(monitor.should_shed("companion_notify"))
+        self.assertEqual(monitor.log_root.level, logging.DEBUG)
+        self.assertEqual(monitor.snapshot()["shed"], {"companion_notify": 2})
+
+    async def test_zero_threshold_only_measures(self):
+        monitor = make_monitor(shed_lag_sec=0)
+
+        monitor.observe(5.0)
+
+        self.assertFalse(monitor.should_shed("dead_soul_enrich"))
+        self.assertEqual(monitor.lag.count, 1)
+
+
+class DummyOcClient:
+    async def get_staff_by_telegram(self, telegram_user_id: int):
+        return {"staff_id": 42, "telegram_user_id": telegram_user_id, "full_name": "Иван", "is_active": 1}
+
+    async def get_active_shift_by_staff(self, staff_id: int):
+        return {"shift_id": 500, "point_id": 7, "point_lat": 56.6, "point_lon": 47.9, "point_radius": 120}
+
+    async def ping_add(self, **kwargs):
+        return {
+            "ok": True,
+            "status": "IN",
+            "out_streak": 0,
+            "admin_alert": "admin_same_location_2",
+            "dead_souls_cluster": {"point_id": 7, "staff": [{"staff_id": 42}, {"staff_id": 43}]},
+        }
+
+    async def get_active_shifts_by_point(self, point_id: int):
+        return [{"staff_id": 43, "full_name": "Пётр"}]
+
+
+class DummyBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+
+class DummyMessage:
+    def __init__(self):
+        self.location = SimpleNamespace(latitude=56.6, longitude=47.9, horizontal_accuracy=10.0)
+        self.chat_id = 70
+
+    async def reply_text(self, text, **kwargs):
+        return None
+
+
+class LocationSheddingTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        session_store = SessionStore()
+        session = session_store.get_or_create(7, 70)
+        session.active = True
+        session.active_shift_id = 500
+        session.active_point_id = 7
+        detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+        handlers = build_location_handlers(
+            session_store, None, track_calls(DummyOcClient(), TARGET_OPENCART), detector, DummyLogger()
+        )
+        handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_location_message")
+        self.handle_location = with_request_context(handler).callback
+        self.context = SimpleNamespace(bot=DummyBot(), application=SimpleNamespace(bot_data={"admin_chat_ids": []}))
+
+    def make_update(self, update_id):
+        message = DummyMessage()
+        return SimpleNamespace(
+            update_id=update_id,
+            effective_message=message,
+            edited_message=message,
+            effective_user=SimpleNamespace(id=7),
+            effective_chat=SimpleNamespace(id=70),
+        )
+
+    async def test_dead_soul_enrichment_call_is_shed_but_ping_is_recorded(self):
+        with capture_calls() as calls:
+            await self.handle_location(self.make_update(1), self.context)
+        self.assertIn("get_active_shifts_by_point", calls.ops(TARGET_OPENCART))
+
+        with patch.object(LOOP_MONITOR, "shedding", True), capture_calls() as calls:
+            await self.handle_location(self.make_update(2), self.context)
+
+        self.assertEqual(calls.ops(TARGET_OPENCART), ["get_staff_by_telegram", "get_active_shift_by_staff", "ping_add"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from shiftbot.jobs import build_job_memory_report
+from shiftbot.memory_report import MEMORY_ENTRIES, MemoryGroup, MemoryInspector, deep_sizeof
+
+
+@dataclass
+class DummySession:
+    user_id: int
+    points_cache: list = field(default_factory=list)
+
+
+class DummyClient:
+    def __init__(self):
+        self.buffer = "x" * 1_000_000
+
+
+class DummyLogger:
+    def __init__(self):
+        self.infos = []
+
+    def info(self, *args, **kwargs):
+        self.infos.append(args)
+
+
+class DeepSizeTests(unittest.TestCase):
+    def test_walks_containers_and_dataclasses_only(self):
+        points = [{"id": idx, "name": f"точка {idx}"} for idx in range(100)]
+        empty, _ = deep_sizeof(DummySession(1))
+        with_points, complete = deep_sizeof(DummySession(1, points))
+        twice, _ = deep_sizeof([DummySession(1, points), DummySession(2, points)])
+        client, _ = deep_sizeof({"oc_client": DummyClient()})
+
+        self.assertTrue(complete)
+        self.assertGreater(with_points - empty, 10_000)
+        # the shared list is counted once
+        self.assertLess(twice, with_points * 1.5)
+        self.assertLess(client, 10_000)
+
+    def test_shared_seen_set_counts_each_object_once(self):
+        points = [{"id": idx, "name": f"точка {idx}"} for idx in range(100)]
+        seen = set()
+        catalog, _ = deep_sizeof(points, seen=seen)
+        session, _ = deep_sizeof(DummySession(1, points), seen=seen)
+        alone, _ = deep_sizeof(DummySession(1, points))
+
+        self.assertGreater(catalog, 10_000)
+        self.assertLess(session, alone - 10_000)
+
+    def test_walk_is_capped(self):
+        size, complete = deep_sizeof(list(range(1000)), max_objects=10)
+
+        self.assertFalse(complete)
+        self.assertGreater(size, 0)
+
+
+class MemoryInspectorTests(unittest.IsolatedAsyncioTestCase):
+    def make_inspector(self):
+        sessions = {1: DummySession(1, [{"id": 1}]), 2: DummySession(2)}
+        inspector = MemoryInspector()
+        inspector.add_source("sessions", lambda: list(sessions.values()))
+        inspector.add_source("bot_data", lambda: MemoryGroup({"cooldowns": {1: 1.0, 2: 2.0}, "oc_client": DummyClient()}))
+        return inspector
+
+    async def test_periodic_job_reports_and_exports_per_structure(self):
+        inspector = self.make_inspector()
+        logger = DummyLogger()
+
+        await build_job_memory_report(inspector, logger)(SimpleNamespace())
+
+        structures = inspector.last_report["structures"]
+        self.assertEqual(set(structures), {"sessions", "bot_data.cooldowns", "bot_data.oc_client"})
+        self.assertEqual(structures["sessions"]["entries"], 2)
+        self.assertEqual(structures["bot_data.cooldowns"]["entries"], 2)
+        self.assertEqual(MEMORY_ENTRIES.value(structure="bot_data.cooldowns"), 2)
+        self.assertEqual(logger.infos[0][0].split(" ", 1)[0], "MEMORY_REPORT")
+
+    def test_object_budget_covers_the_whole_report(self):
+        inspector = MemoryInspector(max_objects=50)
+        inspector.add_source("first", lambda: list(range(1000, 1100)))
+        inspector.add_source("second", lambda: [1.5, 2.5])
+
+        structures = inspector.report()["structures"]
+
+        self.assertFalse(structures["first"]["complete"])
+        self.assertEqual((structures["second"]["bytes"], structures["second"]["complete"]), (0, False))
+
+    def test_tracemalloc_diff_points_at_the_allocating_line(self):
+        inspector = self.make_inspector()
+        inspector.trace_start()
+        self.addCleanup(inspector.trace_stop)
+
+        leak = [str(idx) * 50 for idx in range(20_000)]
+        stats = inspector.trace_diff()
+
+        self.assertTrue(leak)
+        self.assertTrue(any(stat.traceback[0].filename == __file__ and stat.size_diff > 500_000 for stat in stats))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+
+from shiftbot.metrics import HANDLER_DURATION, MetricsRegistry, MetricsServer, instrument_handler
+from shiftbot.request_stats import LatencyHistogram
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def test_render_counters_gauges_and_cumulative_histogram(self):
+        registry = MetricsRegistry()
+        pings = registry.counter("pings_total", "Pings.", ("status",))
+        sessions = registry.gauge("sessions", "Sessions.")
+        latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+        pings.inc(status="IN")
+        pings.inc(2, status="OUT")
+        registry.add_collector(lambda: sessions.set(7))
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(3.0)
+
+        text = registry.render()
+
+        self.assertIn("# TYPE pings_total counter", text)
+        self.assertIn('pings_total{status="IN"} 1', text)
+        self.assertIn('pings_total{status="OUT"} 2', text)
+        self.assertIn("sessions 7", text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_seconds_count 3", text)
+
+    def test_same_name_with_other_kind_is_rejected(self):
+        registry = MetricsRegistry()
+        registry.counter("x", "X.")
+        self.assertIs(registry.counter("x", "X."), registry.counter("x", "X."))
+        with self.assertRaises(ValueError):
+            registry.gauge("x", "X.")
+
+    def test_collector_is_registered_once_and_can_be_removed(self):
+        registry = MetricsRegistry()
+        calls = []
+
+        def collector():
+            calls.append(True)
+
+        registry.add_collector(collector)
+        registry.add_collector(collector)
+        registry.render()
+        registry.remove_collector(collector)
+        registry.render()
+
+        self.assertEqual(len(calls), 1)
+
+    def test_latency_histogram_quantile_is_bucket_upper_bound(self):
+        hist = LatencyHistogram((0.01, 0.1, 1.0))
+        for value in (0.005, 0.05, 0.05, 0.5):
+            hist.observe(value)
+        self.assertEqual(hist.quantile(0.5), 0.1)
+        self.assertEqual(hist.quantile(1.0), 1.0)
+
+
+class MetricsServerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_metrics_and_404(self):
+        registry = MetricsRegistry()
+        registry.counter("hits_total", "Hits.").inc()
+        server = MetricsServer(registry, "127.0.0.1", 0, DummyLogger())
+        await server.start()
+        self.addAsyncCleanup(server.stop)
+
+        async def get(path):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.bound_port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+            await writer.drain()
+            data = await reader.read()
+            writer.close()
+            return data.decode()
+
+        body = await get("/metrics")
+        self.assertTrue(body.startswith("HTTP/1.1 200 OK"))
+        self.assertIn("hits_total 1", body)
+        self.assertTrue((await get("/other")).startswith("HTTP/1.1 404"))
+
+
+class InstrumentHandlerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_instrument_handler_times_callback(self):
+        class Handler:
+            def __init__(self, callback):
+                self.callback = callback
+
+        async def cmd_status(update, context):
+            return "done"
+
+        handler = instrument_handler(Handler(cmd_status))
+
+        self.assertEqual(await handler.callback(None, None), "done")
+        self.assertGreaterEqual(HANDLER_DURATION.child(handler="Handler:cmd_status").count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 from urllib.parse import parse_qs
 
 import asyncio
@@ -51,6 +52,21 @@ class OpenCartClientPingTests(unittest.IsolatedAsyncioTestCase):
         self.assertNotIn("ping_at", captured["body"])
         self.assertNotIn("timestamp", captured["body"])
 
+    async def test_ping_add_sends_replay_time_in_configured_field(self):
+        captured = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured["body"] = parse_qs(request.content.decode())
+            return httpx.Response(200, json={"ok": True})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        await client.ping_add(shift_id=100, lat=43.222, lon=76.851, time_field="ping_at", ping_ts=1700000000.5)
+
+        self.assertEqual(captured["body"]["ping_at"], ["1700000000"])
+
     async def test_violation_tick_handles_api_unavailable(self):
         client = OpenCartClient("https://example.com", "secret", DummyLogger())
         self.addAsyncCleanup(client.aclose)
@@ -141,6 +157,67 @@ class OpenCartClientPingTests(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(result, [])
 
+    async def test_get_active_shifts_bulk_maps_reported_staff_only(self):
+        captured = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured["query"] = parse_qs(request.url.query.decode())
+            captured["body"] = request.content.decode()
+            return httpx.Response(200, json={"ok": True, "shifts": {"7": {"shift_id": 70}, "8": None}})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        result = await client.get_active_shifts_bulk([9, 8, 7, 7])
+
+        self.assertEqual(captured["query"]["route"], ["dl/geo_api/active_shifts_bulk"])
+        self.assertEqual(captured["body"], '{"staff_ids":[7,8,9]}')
+        # 8 has no shift; 9 was not reported on, which says nothing about its shift
+        self.assertEqual(result, {7: {"shift_id": 70}, 8: None})
+
+    async def test_get_active_shifts_bulk_returns_none_when_route_unknown(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(404, json={"error": "route_not_found"})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        self.assertIsNone(await client.get_active_shifts_bulk([1]))
+
+    async def test_violation_tick_many_returns_decision_per_shift(self):
+        captured = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured["query"] = parse_qs(request.url.query.decode())
+            captured["body"] = request.content.decode()
+            return httpx.Response(
+                200,
+                json={"ok": True, "results": {"17": {"ok": True, "decisions": {"admin_notify": True}}}},
+            )
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        result = await client.violation_tick_many([18, 17])
+
+        self.assertEqual(captured["query"]["route"], ["dl/geo_api/violation_tick_many"])
+        self.assertEqual(captured["body"], '{"shift_ids":[17,18]}')
+        self.assertEqual(result[17], {"ok": True, "decisions": {"admin_notify": True}})
+        self.assertEqual(result[18]["error"], "missing_in_batch")
+
+    async def test_violation_tick_many_returns_none_when_route_unknown(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(404, json={"error": "route_not_found"})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        self.assertIsNone(await client.violation_tick_many([1]))
+
     async def test_health_check_logs_ok(self):
         def handler(request: httpx.Request) -> httpx.Response:
             return httpx.Response(200, json={"ok": True})
@@ -166,6 +243,89 @@ class OpenCartClientPingTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result["status"], 401)
         self.assertEqual(result["json"], {"error": "invalid_key"})
 
+    async def test_request_stats_count_retries_statuses_and_bytes(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, text="busy")
+            return httpx.Response(200, json={"ok": True})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        async def no_sleep(_delay):
+            return None
+
+        with patch("shiftbot.opencart_client.asyncio.sleep", no_sleep):
+            await client.ping_add(shift_id=1, lat=1.0, lon=2.0)
+
+        stats = client.snapshot()["routes"]["dl/geo_api/ping_add"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["retries"], 1)
+        self.assertEqual(stats["statuses"], {503: 1, 200: 1})
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["latency"]["count"], 1)
+        self.assertEqual(stats["bytes_out"], 2 * len(calls[0].content))
+        self.assertGreater(stats["bytes_in"], 0)
+
+    async def test_request_log_redacts_api_key(self):
+        lines = []
+
+        class CapturingLogger(DummyLogger):
+            def info(self, msg, *args, **kwargs):
+                lines.append(msg % args)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"ok": True})
+
+        client = OpenCartClient("https://example.com", "secret", CapturingLogger())
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        await client._request("GET", params={"route": "x"})
+
+        request_lines = [line for line in lines if line.startswith("API_REQUEST")]
+        self.assertTrue(request_lines)
+        self.assertNotIn("secret", request_lines[0])
+        self.assertIn("'key': '***'", request_lines[0])
+
+    async def test_interactive_lane_is_not_blocked_by_saturated_ping_lane(self):
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if parse_qs(request.url.query.decode())["route"] == ["dl/geo_api/ping_add"]:
+                await release.wait()
+            return httpx.Response(200, json={"ok": True})
+
+        client = OpenCartClient("https://example.com", "secret", DummyLogger(), lane_limits={"ping": 1})
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+
+        pings = [asyncio.create_task(client.ping_add(shift_id=1, lat=1.0, lon=2.0)) for _ in range(2)]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(client.shift_start({"staff_id": 1, "point_id": 2, "role": "baker"}), timeout=1)
+
+        lanes = client.snapshot()["lanes"]
+        self.assertEqual((lanes["ping"]["in_flight"], lanes["ping"]["waiting"]), (1, 1))
+        self.assertEqual(lanes["interactive"]["wait"]["count"], 1)
+
+        release.set()
+        await asyncio.gather(*pings)
+        self.assertEqual(client.snapshot()["lanes"]["ping"]["in_flight"], 0)
+
+    async def test_aclose_closes_lane_clients_replaced_by_setter(self):
+        client = OpenCartClient("https://example.com", "secret", DummyLogger())
+        originals = [lane.client for lane in client.lanes.values()]
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+
+        await client.aclose()
+
+        self.assertTrue(all(original.is_closed for original in originals))
+        self.assertTrue(client._client.is_closed)
+
 def test_init_accepts_admin_indexphp_in_base_url():
     cli = OpenCartClient("http://h:8080/admin/index.php", "secret", DummyLogger())
     try:
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from shiftbot.opencart_client import ApiUnavailableError
+from shiftbot.ping_journal import PingJournal, PingJournalReplayer, ping_record
+
+
+class DummyLogger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, msg, *args):
+        self.records.append(("info", msg % args if args else msg))
+
+    def warning(self, msg, *args):
+        self.records.append(("warning", msg % args if args else msg))
+
+
+class DummyOcClient:
+    def __init__(self, *, healthy=True, fail_after=None, ended_shifts=()):
+        self.healthy = healthy
+        self.fail_after = fail_after
+        self.ended_shifts = set(ended_shifts)
+        self.pings = []
+
+    async def health_check(self):
+        return self.healthy
+
+    async def ping_add(self, **kwargs):
+        if self.fail_after is not None and len(self.pings) >= self.fail_after:
+            raise ApiUnavailableError("down")
+        self.pings.append(kwargs)
+        if kwargs["shift_id"] in self.ended_shifts:
+            return {"ok": False, "error": "shift_not_active"}
+        return {"ok": True, "status": "IN"}
+
+
+def record(idx: int) -> dict:
+    return ping_record(shift_id=7, staff_id=3, lat=56.0 + idx / 1000, lon=47.0, acc=10.0, ts=1000.0 + idx)
+
+
+class PingJournalTests(unittest.TestCase):
+    def test_records_survive_reopen_and_rotate_segments(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory, segment_max_bytes=300, fsync_every=4)
+            for idx in range(10):
+                journal.append(record(idx))
+            journal.close()
+
+            segments = [name for name in os.listdir(directory) if name.endswith(".jsonl")]
+            self.assertGreater(len(segments), 1)
+
+            reopened = PingJournal(directory, segment_max_bytes=300)
+            batch = reopened.read_batch(100)
+            self.assertEqual([item["ts"] for _, item in batch], [1000.0 + idx for idx in range(10)])
+
+            reopened.commit(batch[5][0])
+            reopened.close()
+            again = PingJournal(directory, segment_max_bytes=300)
+            self.assertEqual(again.read_batch(100)[0][1]["ts"], 1006.0)
+            self.assertLess(len(os.listdir(directory)), len(segments) + 1)
+
+    def test_appends_from_threads_are_all_kept(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory, segment_max_bytes=2048, fsync_every=4)
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(journal.append, [record(idx) for idx in range(200)]))
+
+            self.assertEqual(journal.pending_bytes(), journal.disk_bytes())
+            self.assertEqual(sorted(item["ts"] for _, item in journal.read_batch(500)), [1000.0 + idx for idx in range(200)])
+            journal.close()
+
+    def test_torn_tail_is_not_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory)
+            journal.append(record(0))
+            journal.close()
+            with open(os.path.join(directory, "pings-00000001.jsonl"), "ab") as fh:
+                fh.write(b'{"shift_id":7,"la')
+
+            reopened = PingJournal(directory)
+            self.assertEqual(len(reopened.read_batch(10)), 1)
+
+
+class PingJournalReplayerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_drain_in_order_and_resume_after_outage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory)
+            for idx in range(5):
+                journal.append(record(idx))
+
+            oc_client = DummyOcClient(fail_after=2)
+            replayer = PingJournalReplayer(journal, oc_client, DummyLogger(), time_field="ping_ts", rate_per_sec=0, batch_size=10)
+            self.assertEqual(await replayer.drain(), 2)
+            self.assertTrue(journal.has_pending())
+
+            oc_client.fail_after = None
+            self.assertEqual(await replayer.drain(), 3)
+            self.assertFalse(journal.has_pending())
+            self.assertEqual([ping["lat"] for ping in oc_client.pings], [56.0 + idx / 1000 for idx in range(5)])
+            self.assertEqual(oc_client.pings[0]["status_fields"], {"source": "journal"})
+            self.assertEqual((oc_client.pings[0]["time_field"], oc_client.pings[0]["ping_ts"]), ("ping_ts", 1000.0))
+            journal.close()
+
+    async def test_pings_of_an_ended_shift_are_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory)
+            for idx in range(3):
+                journal.append(record(idx))
+            journal.append(ping_record(shift_id=8, staff_id=4, lat=56.0, lon=47.0, acc=None, ts=1003.0))
+            oc_client = DummyOcClient(ended_shifts={7})
+            logger = DummyLogger()
+            replayer = PingJournalReplayer(journal, oc_client, logger, time_field="ping_ts", rate_per_sec=0)
+
+            self.assertEqual(await replayer.drain(), 4)
+
+            # the first rejection tells the shift is over; its other pings are not sent
+            self.assertEqual([ping["shift_id"] for ping in oc_client.pings], [7, 8])
+            self.assertFalse(journal.has_pending())
+            self.assertIn(("info", "PING_JOURNAL_REPLAY_REJECTED shift_id=7 ts=1000.0 error=shift_not_active"), logger.records)
+            journal.close()
+
+    async def test_drain_waits_for_healthy_api(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = PingJournal(directory)
+            journal.append(record(0))
+            oc_client = DummyOcClient(healthy=False)
+            replayer = PingJournalReplayer(journal, oc_client, DummyLogger(), time_field="ping_ts", rate_per_sec=0)
+
+            self.assertEqual(await replayer.drain(), 0)
+            self.assertEqual(oc_client.pings, [])
+            self.assertTrue(journal.has_pending())
+            journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
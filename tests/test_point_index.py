@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from shiftbot import clock
+from shiftbot.geo import PointsGeo
+from shiftbot.handlers_shift import prepare_points
+from shiftbot.point_index import PointGridIndex, PointsCatalog
+
+
+def random_points(count: int) -> list[dict]:
+    rnd = random.Random(7)
+    return [
+        {
+            "id": idx,
+            "short_name": f"ДЛ {idx}",
+            "geo_lat": 56.63 + rnd.uniform(-0.05, 0.05),
+            "geo_lon": 47.89 + rnd.uniform(-0.05, 0.05),
+            "geo_radius_m": rnd.choice([None, 80, 150, 400]),
+        }
+        for idx in range(count)
+    ]
+
+
+class DummyOcClient:
+    def __init__(self, points):
+        self.points = points
+        self.calls = 0
+
+    async def get_points(self):
+        self.calls += 1
+        return self.points
+
+
+class PointGridIndexTests(unittest.TestCase):
+    def test_matches_brute_force_within_radius(self):
+        points = random_points(500)
+        index = PointGridIndex(points, default_radius_m=120, cell_m=250)
+        brute = PointsGeo(points, default_radius_m=120, use_numpy=False)
+        rnd = random.Random(3)
+
+        for _ in range(200):
+            lat = 56.63 + rnd.uniform(-0.05, 0.05)
+            lon = 47.89 + rnd.uniform(-0.05, 0.05)
+            expected = [point["id"] for point, _ in brute.within_radius(lat, lon)[:3]]
+            got = [point["id"] for point, _ in index.nearby(lat, lon, k=3)]
+            self.assertEqual(got, expected)
+
+    def test_skips_points_without_coordinates(self):
+        index = PointGridIndex([{"id": 1, "geo_lat": None, "geo_lon": 47.0}], default_radius_m=120)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.nearby(56.0, 47.0), [])
+
+
+class PointsCatalogTests(unittest.IsolatedAsyncioTestCase):
+    async def test_caches_points_and_suggests_nearest(self):
+        oc_client = DummyOcClient(
+            [
+                {"point_id": 2, "name": "ДЛ 2", "geo_lat": "56.6300", "geo_lng": "47.9000"},
+                {"point_id": 1, "name": "ДЛ 1", "geo_lat": "56.6285", "geo_lng": "47.8944", "radius": "200"},
+            ]
+        )
+        catalog = PointsCatalog(oc_client, ttl_sec=300, default_radius_m=120, prepare=prepare_points)
+
+        points = await catalog.get()
+        await catalog.get()
+        suggestions = await catalog.suggest(56.6286, 47.8945)
+
+        self.assertEqual(oc_client.calls, 1)
+        self.assertEqual([point["short_name"] for point in points], ["ДЛ 1", "ДЛ 2"])
+        self.assertEqual([point["id"] for point, _ in suggestions], [1])
+
+    async def test_empty_point_list_is_cached_too(self):
+        oc_client = DummyOcClient([])
+        catalog = PointsCatalog(oc_client, ttl_sec=300, default_radius_m=120, prepare=prepare_points)
+
+        await catalog.get()
+        suggestions = await catalog.suggest(56.6286, 47.8945)
+
+        self.assertEqual(oc_client.calls, 1)
+        self.assertEqual(suggestions, [])
+
+    async def test_ttl_follows_the_shared_clock(self):
+        oc_client = DummyOcClient([])
+        catalog = PointsCatalog(oc_client, ttl_sec=300, default_radius_m=120, prepare=prepare_points)
+
+        with clock.use_clock(clock.VirtualClock()) as virtual:
+            await catalog.get()
+            virtual.advance(299)
+            self.assertTrue(catalog.is_fresh())
+            virtual.advance(2)
+            await catalog.get()
+
+        self.assertEqual(oc_client.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from shiftbot.handlers_shift import build_shift_handlers
+from shiftbot.profiler import SamplingProfiler
+from shiftbot.session_store import SessionStore
+
+
+async def waits_on_backend():
+    await asyncio.sleep(0.3)
+
+
+async def spins_on_loop():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SamplingProfilerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_wall_time_per_coroutine_and_collapsed_file(self):
+        profiler = SamplingProfiler(interval_sec=0.002, modules=(__name__,))
+        waiter = asyncio.create_task(waits_on_backend())
+
+        profiler.start()
+        await asyncio.sleep(0.05)
+        await spins_on_loop()
+        await asyncio.sleep(0.05)
+        profiler.stop()
+        await waiter
+
+        wall = profiler.coroutine_wall_time()
+        # the sleeping coroutine is on a task's await chain for the whole run
+        self.assertGreater(wall[f"{__name__}:waits_on_backend"], 0.1)
+        self.assertIn(f"{__name__}:spins_on_loop", wall)
+        self.assertTrue(any(stack[-1] == f"{__name__}:spins_on_loop" for stack in profiler.loop_stacks))
+        summary = profiler.summary()
+        self.assertGreater(summary["loop_busy_share"], 0.2)
+        self.assertLess(summary["loop_busy_share"], 1.0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = profiler.write_collapsed(directory)
+            with open(path, encoding="utf-8") as handle:
+                lines = handle.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertIn(stack.split(";", 1)[0], {"loop", "tasks"})
+            self.assertGreater(int(count), 0)
+
+
+class DummyMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+
+class ProfileCommandTests(unittest.IsolatedAsyncioTestCase):
+    async def test_admin_gets_report_after_the_run(self):
+        handlers = build_shift_handlers(SessionStore(), None, None, None, DummyLogger())
+        cmd_profile = next(h for h in handlers if getattr(h, "commands", None) == frozenset({"profile"})).callback
+        context = SimpleNamespace(args=["0.2"], application=SimpleNamespace(bot_data={"admin_chat_ids": [900]}))
+
+        def make_update(chat_id):
+            message = DummyMessage()
+            return SimpleNamespace(
+                message=message,
+                effective_message=message,
+                effective_user=SimpleNamespace(id=7),
+                effective_chat=SimpleNamespace(id=chat_id),
+            )
+
+        denied = make_update(70)
+        await cmd_profile(denied, context)
+        self.assertEqual(denied.message.replies, [])
+
+        update = make_update(900)
+        with tempfile.TemporaryDirectory() as directory, patch("shiftbot.config.PROFILE_DIR", directory):
+            await cmd_profile(update, context)
+            await cmd_profile(make_update(900), context)
+            await asyncio.sleep(0.4)
+            files = os.listdir(directory)
+
+        self.assertEqual(len(files), 1)
+        self.assertEqual(update.message.replies[0], "Профилирую 0.2с…")
+        self.assertIn("Профиль за 0.2с", update.message.replies[1])
+        self.assertFalse(context.application.bot_data["profiler"].running)
+
+
+if __name__ == "__main__":
+    unittest.main()
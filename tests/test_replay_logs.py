@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.replay_logs import parse_log_lines, read_events, replay, write_events
+
+LOG = """\
+2026-10-18 10:00:00,000 | INFO | shiftbot | LOCATION_UPDATE tg=7 is_edited=True lat=56.6 lon=47.9 acc=10.0
+2026-10-18 10:00:00,020 | INFO | shiftbot | API_REQUEST attempt=1 method=POST params={} has_data=True
+2026-10-18 10:00:00,040 | INFO | shiftbot | PING_ADD shift_id=500 staff_id=42 -> status=IN reason= out_streak=0 rounds=0
+2026-10-18 10:00:01,000 | INFO | shiftbot | LOCATION_UPDATE tg=8 is_edited=False lat=56.7 lon=47.8 acc=None
+2026-10-18 10:00:01,010 | INFO | shiftbot | LOCATION_UPDATE no active shift staff_id=43
+2026-10-18 10:00:02,000 | INFO | shiftbot | LOCATION_UPDATE tg=9 is_edited=True lat=56.61 lon=47.91 acc=5.0
+2026-10-18 10:00:02,500 | INFO | shiftbot | LOCATION_UPDATE tg=7 is_edited=True lat=56.7 lon=47.9 acc=12.0
+2026-10-18 10:00:02,600 | INFO | shiftbot | PING_ADD shift_id=500 staff_id=42 -> status=OUT reason=far out_streak=1 rounds=0
+2026-10-18 10:00:02,700 | INFO | shiftbot | PING_ADD shift_id=501 staff_id=44 -> status=IN reason= out_streak=0 rounds=0
+"""
+
+
+class ParseLogTests(unittest.TestCase):
+    def test_updates_are_joined_with_their_decisions(self):
+        events, stats = parse_log_lines(LOG.splitlines())
+
+        self.assertEqual([(e["tg"], e["st"]) for e in events], [(7, "IN"), (8, None), (9, "IN"), (7, "OUT")])
+        self.assertEqual(events[3]["os"], 1)
+        self.assertEqual(events[2]["staff"], 44)
+        self.assertAlmostEqual(events[3]["ts"] - events[0]["ts"], 2.5)
+        self.assertEqual(stats, {"updates": 4, "decisions": 3})
+
+    def test_tg_in_ping_add_joins_interleaved_updates(self):
+        lines = [
+            "2026-10-18 10:00:00,000 | INFO | shiftbot | LOCATION_UPDATE tg=7 is_edited=True lat=1 lon=2 acc=3",
+            "2026-10-18 10:00:00,001 | INFO | shiftbot | LOCATION_UPDATE tg=8 is_edited=True lat=1 lon=2 acc=3",
+            "2026-10-18 10:00:00,050 | INFO | shiftbot | PING_ADD shift_id=5 staff_id=6 tg=7 -> status=OUT reason= out_streak=1 rounds=0",
+            "2026-10-18 10:00:00,060 | INFO | shiftbot | PING_ADD shift_id=9 staff_id=10 tg=8 -> status=IN reason= out_streak=0 rounds=0",
+        ]
+        events, _ = parse_log_lines(lines)
+
+        self.assertEqual([(e["tg"], e["staff"], e["st"]) for e in events], [(7, 6, "OUT"), (8, 10, "IN")])
+
+    def test_json_log_lines(self):
+        lines = [
+            json.dumps({"ts": "2026-10-18T10:00:00.000+00:00", "message": "LOCATION_UPDATE tg=7 is_edited=True lat=1 lon=2 acc=3"}),
+            json.dumps({"ts": "2026-10-18T10:00:00.100+00:00", "message": "PING_ADD shift_id=5 staff_id=6 -> status=IN reason= out_streak=0 rounds=0"}),
+        ]
+        events, _ = parse_log_lines(lines)
+
+        self.assertEqual((events[0]["tg"], events[0]["shift"], events[0]["st"]), (7, 5, "IN"))
+
+    def test_event_file_round_trip(self):
+        events, _ = parse_log_lines(LOG.splitlines())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl.gz")
+            write_events(path, events)
+            loaded = read_events(path)
+
+        self.assertEqual([e["t"] for e in loaded], [0, 1000, 2000, 2500])
+        self.assertEqual(loaded[1], {"tg": 8, "lat": 56.7, "lon": 47.8, "t": 1000})
+
+
+class ReplayTests(unittest.IsolatedAsyncioTestCase):
+    async def test_replay_answers_with_recorded_decisions(self):
+        events, _ = parse_log_lines(LOG.splitlines())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            write_events(path, events)
+            loaded = read_events(path)
+
+        result = await replay(loaded, speed=None, latency_sec=0.0, concurrency=8)
+
+        self.assertEqual(result["failed_updates"], 0)
+        self.assertEqual(result["pings"], {"IN": 2, "OUT": 1})
+        self.assertEqual(result["opencart_calls"]["active_shift_by_staff"], 4)
+        self.assertEqual(result["opencart_calls"]["ping_add"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from types import SimpleNamespace
+
+from shiftbot import request_context
+from shiftbot.guards import StaffService
+from shiftbot.handlers_shift import BTN_RESTART, BTN_START_SHIFT, BTN_STATUS, build_shift_handlers
+from shiftbot.request_context import with_request_context
+from shiftbot.session_store import SessionStore
+from shiftbot.staff_cache import StaffCache
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class DummyOcClient:
+    def __init__(self, active_shift=None):
+        self.active_shift = active_shift
+        self.staff_calls = []
+        self.active_shift_calls = []
+
+    async def get_staff(self, telegram_user_id: int):
+        self.staff_calls.append(telegram_user_id)
+        return {"staff_id": 42, "is_active": 1}
+
+    async def get_active_shift_by_staff(self, staff_id: int):
+        self.active_shift_calls.append(staff_id)
+        return self.active_shift
+
+
+class DummyMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def make_update(text, update_id=1):
+    message = DummyMessage(text)
+    return SimpleNamespace(
+        update_id=update_id,
+        message=message,
+        effective_message=message,
+        effective_user=SimpleNamespace(id=7),
+        effective_chat=SimpleNamespace(id=70),
+    )
+
+
+class RequestContextTests(unittest.IsolatedAsyncioTestCase):
+    async def test_memoize_outside_scope_calls_factory_every_time(self):
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(await request_context.memoize(("k",), factory), 1)
+        self.assertEqual(await request_context.memoize(("k",), factory), 2)
+
+    async def test_failures_are_not_memoized(self):
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("temporary")
+            return "ok"
+
+        with request_context.request_scope():
+            with self.assertRaises(RuntimeError):
+                await request_context.memoize(("k",), factory)
+            self.assertEqual(await request_context.memoize(("k",), factory), "ok")
+            self.assertEqual(await request_context.memoize(("k",), factory), "ok")
+        self.assertEqual(len(calls), 2)
+
+
+class BackendCallsPerCommandTests(unittest.IsolatedAsyncioTestCase):
+    def make_handle_text(self, oc_client):
+        # ttl -1: the staff cache never hits, every lookup would reach the backend
+        staff_service = StaffService(oc_client, StaffCache(ttl_sec=-1))
+        handlers = build_shift_handlers(SessionStore(), staff_service, oc_client, None, DummyLogger())
+        handler = next(h for h in handlers if getattr(h.callback, "__name__", "") == "handle_text")
+        return with_request_context(handler).callback
+
+    async def assert_backend_calls(self, text, *, active_shift, staff_calls, active_shift_calls):
+        oc_client = DummyOcClient(active_shift=active_shift)
+        handle_text = self.make_handle_text(oc_client)
+        context = SimpleNamespace(application=SimpleNamespace(bot_data={}))
+
+        await handle_text(make_update(text), context)
+
+        self.assertEqual(len(oc_client.staff_calls), staff_calls, text)
+        self.assertEqual(len(oc_client.active_shift_calls), active_shift_calls, text)
+
+    async def test_status_resolves_staff_and_shift_once(self):
+        await self.assert_backend_calls(
+            BTN_STATUS,
+            active_shift={"shift_id": 5, "point_name": "ДЛ 1"},
+            staff_calls=1,
+            active_shift_calls=1,
+        )
+
+    async def test_start_shift_resolves_staff_and_shift_once(self):
+        await self.assert_backend_calls(
+            BTN_START_SHIFT,
+            active_shift={"shift_id": 5, "started_at": "10:00"},
+            staff_calls=1,
+            active_shift_calls=1,
+        )
+
+    async def test_restart_resolves_staff_and_shift_once(self):
+        await self.assert_backend_calls(BTN_RESTART, active_shift=None, staff_calls=1, active_shift_calls=1)
+
+    async def test_each_update_gets_its_own_context(self):
+        oc_client = DummyOcClient(active_shift=None)
+        handle_text = self.make_handle_text(oc_client)
+        context = SimpleNamespace(application=SimpleNamespace(bot_data={}))
+
+        await handle_text(make_update(BTN_RESTART, update_id=1), context)
+        await handle_text(make_update(BTN_RESTART, update_id=2), context)
+
+        self.assertEqual(len(oc_client.staff_calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from shiftbot.app import ShiftBotApp
+from shiftbot.memory_report import MemoryInspector
+from shiftbot.point_index import PointsCatalog
+from shiftbot.session_store import SessionStore
+from shiftbot.shared_state import SHARED_COOLDOWNS_KEY, call_shared, claim_shared_cooldown
+from shiftbot.sharding import SharedStateManager, ShardSupervisor, build_shared_state, shard_for_update
+
+
+class ShardRoutingTests(unittest.TestCase):
+    def test_routes_by_sender_user_id(self):
+        message = {"update_id": 1, "message": {"from": {"id": 13}, "chat": {"id": 13}}}
+        edited = {"update_id": 2, "edited_message": {"from": {"id": 14}, "chat": {"id": 14}}}
+        callback = {"update_id": 3, "callback_query": {"from": {"id": 15}}}
+
+        self.assertEqual(shard_for_update(message, 4), 1)
+        self.assertEqual(shard_for_update(edited, 4), 2)
+        self.assertEqual(shard_for_update(callback, 4), 3)
+
+    def test_updates_without_user_go_to_first_shard(self):
+        self.assertEqual(shard_for_update({"update_id": 1}, 4), 0)
+        self.assertEqual(shard_for_update({"update_id": 1, "message": {"from": {"id": 7}}}, 1), 0)
+
+
+class SharedStateTests(unittest.IsolatedAsyncioTestCase):
+    async def test_detector_and_cooldowns_are_shared_proxies(self):
+        manager = SharedStateManager()
+        manager.start()
+        self.addCleanup(manager.shutdown)
+
+        shared = build_shared_state(manager, [1001])
+
+        self.assertEqual(shared.admin_chat_ids, [1001])
+        bot_data = {SHARED_COOLDOWNS_KEY: shared.cooldowns}
+        key = ("admin_same_location_2", "point", 9)
+        self.assertTrue(await claim_shared_cooldown(bot_data, key, 100.0, 120))
+        # another shard asking for the same point inside the cooldown is refused
+        self.assertFalse(await claim_shared_cooldown(bot_data, key, 150.0, 120))
+        self.assertTrue(await claim_shared_cooldown(bot_data, key, 221.0, 120))
+
+        detector = shared.dead_soul_detector
+        alerts = await call_shared(detector.register_ping, shift_id=1, staff_id=1, point_id=9, coord_key="a")
+        self.assertEqual(alerts, [])
+
+    async def test_memory_report_skips_the_shared_detector(self):
+        manager = SharedStateManager()
+        manager.start()
+        self.addCleanup(manager.shutdown)
+        shared = build_shared_state(manager, [])
+
+        app = object.__new__(ShiftBotApp)
+        app.memory_inspector = MemoryInspector()
+        app.session_store = SessionStore()
+        app.points_catalog = PointsCatalog(None, ttl_sec=60, default_radius_m=120)
+        app.staff_cache = SimpleNamespace(_cache={})
+        app.dead_soul_detector = shared.dead_soul_detector
+        app.application = SimpleNamespace(bot_data={})
+        app._add_memory_sources()
+
+        report = app.memory_inspector.report()
+
+        self.assertIn("sessions", report["structures"])
+        self.assertFalse(any(name.startswith("dead_soul") for name in report["structures"]))
+
+    async def test_single_process_cooldown_claims_always_pass(self):
+        self.assertTrue(await claim_shared_cooldown({}, ("x",), 1.0, 60))
+
+
+class DummyLogger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, *args, **kwargs):
+        self.errors.append(args[0])
+
+
+class DummyProcess:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.exitcode = None if alive else -9
+
+    def is_alive(self):
+        return self.alive
+
+
+class DummyQueue:
+    def qsize(self):
+        return 3
+
+
+class WorkerLivenessTests(unittest.TestCase):
+    def test_dead_worker_is_restarted_then_supervisor_gives_up(self):
+        supervisor = ShardSupervisor(2, DummyLogger())
+        supervisor._queues = [DummyQueue(), DummyQueue()]
+        supervisor._workers = [DummyProcess(), DummyProcess(alive=False)]
+
+        with patch.object(ShardSupervisor, "_spawn_worker", side_effect=lambda index: DummyProcess(alive=False)), patch(
+            "shiftbot.sharding.config.SHARD_WORKER_MAX_RESTARTS", 2
+        ):
+            supervisor.check_workers()
+            supervisor.check_workers()
+            with self.assertRaises(RuntimeError):
+                supervisor.check_workers()
+
+        self.assertEqual(supervisor.restarts, [0, 2])
+        self.assertEqual(len(supervisor.logger.errors), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from shiftbot.dead_soul_detector import DeadSoulDetector
+from shiftbot.handlers_location import build_location_handlers
+from shiftbot.session_store import SessionStore
+from shiftbot.side_effects import SideEffectExecutor
+
+
+class DummyLogger:
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def debug(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        self.warnings.append(args[0])
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class SideEffectExecutorTests(unittest.IsolatedAsyncioTestCase):
+    async def start(self, **kwargs):
+        params = {"max_concurrency": 2, "timeout_sec": 1.0, "max_pending": 100}
+        params.update(kwargs)
+        executor = SideEffectExecutor(DummyLogger(), **params)
+        runner = asyncio.create_task(executor.run())
+        await asyncio.sleep(0)
+        return executor, runner
+
+    async def test_jobs_run_in_background_in_order_under_concurrency_cap(self):
+        executor, runner = await self.start()
+        events = []
+        peak = {"running": 0}
+
+        def step(label):
+            async def effect():
+                peak["running"] = max(peak["running"], executor.running)
+                await asyncio.sleep(0.01)
+                events.append(label)
+
+            return effect
+
+        for job in range(4):
+            await executor.submit("test", [step(f"{job}a"), step(f"{job}b")])
+        self.assertEqual(events, [])
+        self.assertEqual(executor.pending, 4)
+
+        executor.stop()
+        await runner
+
+        self.assertEqual(len(events), 8)
+        for job in range(4):
+            self.assertLess(events.index(f"{job}a"), events.index(f"{job}b"))
+        self.assertEqual(peak["running"], 2)
+        self.assertEqual(executor.snapshot()["outcomes"], {"ok": 4})
+
+    async def test_jobs_of_one_key_run_in_submission_order(self):
+        executor, runner = await self.start(max_concurrency=4)
+        events = []
+
+        def step(label, delay):
+            async def effect():
+                await asyncio.sleep(delay)
+                events.append(label)
+
+            return effect
+
+        await executor.submit("out_warning", [step("courier:out", 0.05)], key=7)
+        await executor.submit("other", [step("other", 0.0)], key=8)
+        await executor.submit("shift_ended", [step("courier:ended", 0.0)], key=7)
+        executor.stop()
+        await runner
+
+        self.assertEqual(events, ["other", "courier:out", "courier:ended"])
+        self.assertEqual(executor._tails, {})
+
+    async def test_failures_and_timeouts_are_captured(self):
+        executor, runner = await self.start(timeout_sec=0.05)
+        after_failure = []
+
+        async def fail():
+            raise RuntimeError("telegram down")
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def record():
+            after_failure.append(True)
+
+        await executor.submit("fail", [fail, record])
+        await executor.submit("hang", [hang])
+        executor.stop()
+        await runner
+
+        snapshot = executor.snapshot()
+        self.assertEqual(snapshot["outcomes"], {"error": 1, "timeout": 1})
+        self.assertEqual(snapshot["errors"], [("fail", "RuntimeError('telegram down')")])
+        self.assertEqual(after_failure, [])
+
+    async def test_full_queue_and_stopped_executor_run_inline(self):
+        executor, runner = await self.start(max_pending=1)
+        done = []
+
+        async def effect():
+            done.append(True)
+
+        await executor.submit("queued", [effect])
+        await executor.submit("inline", [effect])
+        self.assertEqual((len(done), executor.overflow), (1, 1))
+
+        executor.stop()
+        await runner
+        await executor.submit("after_stop", [effect])
+
+        self.assertEqual(len(done), 3)
+
+    async def test_queued_job_waits_for_an_inline_job_of_the_same_key(self):
+        executor, runner = await self.start(max_pending=1)
+        events = []
+
+        def step(label, delay):
+            async def effect():
+                await asyncio.sleep(delay)
+                events.append(label)
+
+            return effect
+
+        await executor.submit("filler", [step("other", 0.01)], key=8)
+        inline = asyncio.create_task(executor.submit("out_warning", [step("courier:inline", 0.05)], key=7))
+        await asyncio.sleep(0.02)
+        self.assertEqual((events, executor.overflow, executor.pending), (["other"], 1, 0))
+        await executor.submit("shift_ended", [step("courier:queued", 0.0)], key=7)
+        await inline
+        executor.stop()
+        await runner
+
+        self.assertEqual(events, ["other", "courier:inline", "courier:queued"])
+        self.assertEqual(executor._tails, {})
+
+
+class DummyOcClient:
+    async def get_staff_by_telegram(self, telegram_user_id: int):
+        return {"staff_id": 42, "telegram_user_id": telegram_user_id, "full_name": "Иван", "is_active": 1}
+
+    async def get_active_shift_by_staff(self, staff_id: int):
+        return {"shift_id": 500, "point_id": 7, "point_lat": 56.6, "point_lon": 47.9, "point_radius": 120}
+
+    async def ping_add(self, **kwargs):
+        return {"ok": True, "status": "OUT", "out_streak": 3, "dist_m": 400, "radius_m": 120}
+
+
+class DummyBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+
+class SlowMessage:
+    def __init__(self):
+        self.location = SimpleNamespace(latitude=56.7, longitude=47.9, horizontal_accuracy=10.0)
+        self.chat_id = 70
+        self.release = asyncio.Event()
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        await self.release.wait()
+        self.replies.append(text)
+
+
+class PingHandlerSideEffectTests(unittest.IsolatedAsyncioTestCase):
+    async def test_out_warning_is_sent_after_the_handler_returns(self):
+        session_store = SessionStore()
+        session = session_store.get_or_create(7, 70)
+        session.active = True
+        session.active_shift_id = 500
+        executor = SideEffectExecutor(DummyLogger(), max_concurrency=4, timeout_sec=1.0, max_pending=100)
+        runner = asyncio.create_task(executor.run())
+        await asyncio.sleep(0)
+        detector = DeadSoulDetector(bucket_sec=10, window_sec=25, streak_threshold=5, alert_cooldown_sec=900)
+        handlers = build_location_handlers(
+            session_store, None, DummyOcClient(), detector, DummyLogger(), side_effects=executor
+        )
+        handle_location = next(h for h in handlers if h.callback.__name__ == "handle_location_message").callback
+        message = SlowMessage()
+        update = SimpleNamespace(
+            update_id=1,
+            effective_message=message,
+            edited_message=message,
+            effective_user=SimpleNamespace(id=7),
+            effective_chat=SimpleNamespace(id=70),
+        )
+        context = SimpleNamespace(bot=DummyBot(), application=SimpleNamespace(bot_data={"admin_chat_ids": []}))
+
+        await asyncio.wait_for(handle_location(update, context), timeout=0.5)
+
+        # state is updated before the Telegram message goes out
+        self.assertEqual((session.last_status, session.out_streak), ("OUT", 3))
+        self.assertEqual(message.replies, [])
+        self.assertEqual(executor.pending, 1)
+
+        message.release.set()
+        executor.stop()
+        await runner
+        self.assertEqual(len(message.replies), 1)
+        self.assertIn("вне рабочей зоны", message.replies[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
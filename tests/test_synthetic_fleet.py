@@ -0,0 +1,183 @@
+import asyncio
+import random
+import time
+import unittest
+from types import SimpleNamespace
+
+from shiftbot.geo import haversine_m
+from shiftbot.handlers_shift import build_shift_handlers
+from shiftbot.opencart_client import ApiUnavailableError
+from shiftbot.session_store import SessionStore
+from shiftbot.synthetic_fleet import (
+    DRIFT_OUT,
+    FROZEN,
+    INSIDE,
+    POOR_ACCURACY,
+    SyntheticFleet,
+    VirtualShift,
+    build_virtual_shifts,
+)
+
+LAT, LON = 56.6, 47.9
+
+
+class DummyLogger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+    def exception(self, *args, **kwargs):
+        pass
+
+
+class DummyOcClient:
+    def __init__(self, fail_every=0):
+        self.pings = []
+        self.fail_every = fail_every
+
+    async def ping_add(self, **kwargs):
+        self.pings.append(kwargs)
+        if self.fail_every and len(self.pings) % self.fail_every == 0:
+            raise ApiUnavailableError("temporary_api_error")
+        return {"ok": True, "status": "IN"}
+
+    async def get_staff_by_telegram(self, telegram_user_id):
+        return {"staff_id": 43, "is_active": 1}
+
+
+class TrajectoryTests(unittest.TestCase):
+    def fixes(self, trajectory, count=20):
+        shift = VirtualShift(1, 2, trajectory, LAT, LON, 120.0)
+        rng = random.Random(1)
+        return [shift.next_fix(rng) for _ in range(count)]
+
+    def test_frozen_repeats_identical_coordinates(self):
+        self.assertEqual(len(set(self.fixes(FROZEN))), 1)
+
+    def test_drift_out_leaves_the_radius_and_comes_back(self):
+        distances = [haversine_m(lat, lon, LAT, LON) for lat, lon, _ in self.fixes(DRIFT_OUT, 30)]
+        self.assertLess(distances[0], 120)
+        self.assertGreater(max(distances), 120)
+        self.assertLess(distances[-1], max(distances))
+
+    def test_inside_and_poor_accuracy(self):
+        inside = self.fixes(INSIDE)
+        poor = self.fixes(POOR_ACCURACY)
+        self.assertTrue(all(haversine_m(lat, lon, LAT, LON) < 120 and acc <= 20 for lat, lon, acc in inside))
+        self.assertTrue(all(acc >= 150 for _, _, acc in poor))
+
+    def test_trajectories_are_assigned_round_robin(self):
+        shifts = build_virtual_shifts(5, 100, 7, LAT, LON, 120.0)
+        self.assertEqual([s.shift_id for s in shifts], [100, 101, 102, 103, 104])
+        self.assertEqual([s.trajectory for s in shifts], [INSIDE, DRIFT_OUT, FROZEN, POOR_ACCURACY, INSIDE])
+
+
+class SyntheticFleetTests(unittest.IsolatedAsyncioTestCase):
+    async def test_global_rate_cap_and_aggregated_stats(self):
+        oc_client = DummyOcClient(fail_every=5)
+        shifts = build_virtual_shifts(50, 100, 7, LAT, LON, 120.0)
+        # all 50 shifts are due within 0.01s, the cap spreads 20 pings over ~0.19s
+        fleet = SyntheticFleet(oc_client, DummyLogger(), shifts, interval_sec=0.01, rate_per_sec=100)
+
+        started = time.monotonic()
+        await fleet.run(max_pings=20)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.18)
+        self.assertEqual(len(oc_client.pings), 20)
+        self.assertEqual(fleet.stats.statuses, {"IN": 16, "unavailable": 4})
+        self.assertEqual(fleet.stats.errors, 4)
+        self.assertEqual(oc_client.pings[0]["status_fields"]["source"], "synthetic")
+        self.assertIn("Отправлено 20 пингов", fleet.format_report())
+
+
+class DummyBot:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+class DummyMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class DummyStaffService:
+    async def get_staff(self, telegram_user_id, *, force_refresh=False):
+        return {"staff_id": 42, "is_active": 1}
+
+
+class FleetCommandTests(unittest.IsolatedAsyncioTestCase):
+    def make_command(self, name):
+        handlers = build_shift_handlers(
+            SessionStore(), DummyStaffService(), self.oc_client, None, DummyLogger(), fleet_oc_client=self.fleet_client
+        )
+        return next(h for h in handlers if getattr(h, "commands", None) == frozenset({name})).callback
+
+    def setUp(self):
+        self.oc_client = DummyOcClient()
+        self.fleet_client = DummyOcClient()
+        self.context = SimpleNamespace(
+            bot=DummyBot(), args=[], application=SimpleNamespace(bot_data={"admin_chat_ids": [900]})
+        )
+
+    def make_update(self, chat_id):
+        message = DummyMessage()
+        return SimpleNamespace(
+            update_id=1,
+            message=message,
+            effective_message=message,
+            effective_user=SimpleNamespace(id=7),
+            effective_chat=SimpleNamespace(id=chat_id),
+        )
+
+    async def test_fleet_is_admin_only(self):
+        self.context.args = ["fleet", "10", "100", str(LAT), str(LON)]
+        update = self.make_update(chat_id=70)
+
+        await self.make_command("test_ping_start")(update, self.context)
+
+        self.assertEqual(update.message.replies, [])
+        self.assertNotIn("test_ping_tasks", self.context.application.bot_data)
+
+    async def test_fleet_runs_in_one_task_and_stops_with_summary(self):
+        self.context.args = ["fleet", "10", "100", str(LAT), str(LON), "0.05", "20"]
+        start = self.make_update(chat_id=900)
+
+        await self.make_command("test_ping_start")(start, self.context)
+        await asyncio.sleep(0.2)
+        stop = self.make_update(chat_id=900)
+        await self.make_command("test_ping_stop")(stop, self.context)
+
+        self.assertIn("Запущен тестовый флот", start.message.replies[0])
+        self.assertEqual(len(self.context.application.bot_data["test_ping_tasks"]), 0)
+        self.assertGreater(len(self.fleet_client.pings), 0)
+        self.assertEqual({ping["staff_id"] for ping in self.fleet_client.pings}, {43})
+        self.assertEqual(self.oc_client.pings, [])
+        self.assertIn("Тестовый флот остановлен", stop.message.replies[0])
+        # no message per ping
+        self.assertEqual(self.context.bot.messages, [])
+
+    async def test_fleet_is_refused_without_a_staging_api(self):
+        self.fleet_client = None
+        self.context.args = ["fleet", "10", "100", str(LAT), str(LON)]
+        update = self.make_update(chat_id=900)
+
+        await self.make_command("test_ping_start")(update, self.context)
+
+        self.assertIn("TEST_FLEET_OC_API_BASE", update.message.replies[0])
+        self.assertNotIn("test_ping_tasks", self.context.application.bot_data)
+        self.assertEqual(self.oc_client.pings, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
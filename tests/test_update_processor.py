@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update, User
+
+from shiftbot.update_processor import PerUserUpdateProcessor
+
+
+def make_update(update_id: int, user_id: int) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=user_id, type=Chat.PRIVATE),
+        from_user=User(id=user_id, first_name="courier", is_bot=False),
+        text="x",
+    )
+    return Update(update_id=update_id, message=message)
+
+
+class PerUserUpdateProcessorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_same_user_updates_run_in_order(self):
+        processor = PerUserUpdateProcessor(4)
+        events = []
+
+        async def work(tag, delay):
+            events.append(("start", tag))
+            await asyncio.sleep(delay)
+            events.append(("end", tag))
+
+        await asyncio.gather(
+            processor.process_update(make_update(1, 10), work("a", 0.03)),
+            processor.process_update(make_update(2, 10), work("b", 0.0)),
+        )
+
+        self.assertEqual(events, [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")])
+        self.assertEqual(processor.snapshot()["active_keys"], 0)
+
+    async def test_different_users_run_in_parallel_up_to_limit(self):
+        processor = PerUserUpdateProcessor(2)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(make_update(i, 100 + i), work()) for i in range(5)))
+
+        self.assertEqual(peak, 2)
+        snapshot = processor.snapshot()
+        self.assertEqual(snapshot["processing"]["count"], 5)
+        self.assertGreater(snapshot["queue_wait"]["max_sec"], 0.0)
+
+    async def test_waiting_on_user_lock_does_not_hold_worker_slot(self):
+        processor = PerUserUpdateProcessor(2, max_pending=10)
+        release = asyncio.Event()
+        other_user_done = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+
+        async def noop():
+            pass
+
+        async def other_user():
+            other_user_done.set()
+
+        tasks = [
+            asyncio.create_task(processor.process_update(make_update(1, 1), slow())),
+            asyncio.create_task(processor.process_update(make_update(2, 1), noop())),
+            asyncio.create_task(processor.process_update(make_update(3, 2), other_user())),
+        ]
+        await asyncio.wait_for(other_user_done.wait(), timeout=1)
+        release.set()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(processor.snapshot()["processing"]["count"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()